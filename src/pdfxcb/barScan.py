@@ -1,5 +1,8 @@
-import imp
+import importlib
+import importlib.util
+import math
 import sys
+import time
 
 import logging
 
@@ -9,33 +12,86 @@ import pdfxcb.json1 as json1
 lg=logging
 
 
-try:
-    imp.find_module('zbar')
-except ImportError:
-    msg = json1.json_msg_module_not_accessible('zbar')
-    lg.error(msg)
-    lg.info(json1.json_last_log_msg())
-    sys.exit(msg)
-import zbar
-
-
+# zbar and Image are imported on first use (see SCANNING_MODULES) so
+# that importing this module, e.g., to split every N pages, is cheap.
+zbar = None
 # Image is provided by PIL (python 2) or pillow (python 3; debian
 # supplies this as python3-pil)
-try:
-    imp.find_module('PIL')
-except ImportError:
-    msg = json1.json_msg_module_not_accessible('PIL')
-    lg.error(msg)
-    lg.info(json1.json_last_log_msg())
-    sys.exit(msg)
-from PIL import Image
+Image = None
+
+
+# pre-filter parameters (see BARCODE_LIKE_P)
+#   standard deviation of pixel values below which an image is blank
+PREFILTER_BLANK_STD = 8
+#   minimum difference between neighboring pixel values at a bar edge
+PREFILTER_EDGE_DELTA = 64
+#   number of rows over which a bar edge is expected to persist
+PREFILTER_BAR_ROWS = 8
+#   default THRESHOLD for BARCODE_LIKE_P
+PREFILTER_THRESHOLD = 20
+
+# adaptive region parameters (see LEARN_REGION)
+#   number of barcodes located before the learned box is fixed
+ADAPTIVE_REGION_SAMPLES = 3
+#   margin added on each side of the located barcodes, as a fraction
+#   of their width and height
+ADAPTIVE_REGION_MARGIN = 0.5
+#   minimum width and height of the located barcodes, as a fraction of
+#   the scanned image
+ADAPTIVE_REGION_MIN_SIZE = 0.1
 
+# the zbar scanner reused by every scan in this process (see
+# ZBAR_SCANNER)
+_scanner = None
 
+# configuration applied to _SCANNER (see CONFIGURE_SCANNER)
+_scanner_config = {
+    'symbologies': None,
+    'x_density': None,
+    'y_density': None,
+    'scales': [1.0, 0.5],
+    'adaptive_scales_p': False,
+    'adaptive_region_p': False
+}
 
-def barcodeScan(imagePNGPath, scan_region):
+# in adaptive mode, the scale factor most recently yielding a barcode
+# in this process (see SCALE_LADDER); each scan worker process keeps
+# its own
+_last_successful_scale = None
+
+# in adaptive region mode, the bounding box of the barcodes located so
+# far, the number of such barcodes, and the box scanned first (see
+# LEARN_REGION); these are maintained by the process which hands out
+# images to be scanned, not by scan worker processes
+_located_box = None
+_located_samples = 0
+_learned_box = None
+
+# symbology names accepted by zbar's parse_config
+zbar_symbologies = [
+    'codabar',
+    'code128',
+    'code39',
+    'code93',
+    'composite',
+    'databar',
+    'databar-exp',
+    'ean13',
+    'ean8',
+    'i25',
+    'isbn10',
+    'isbn13',
+    'pdf417',
+    'qrcode',
+    'upca',
+    'upce'
+]
+
+
+def barcodeScan(imagePNGPath, scan_region, prefilter_threshold=None):
     """
     imagePNGPath should be a string defining the location of a PNG
-    file. Return None if a barcode was not found. If a barcode was
+    file or a PIL image already in memory. Return None if a barcode was not found. If a barcode was
     found, return a string corresponding to the barcode-encoded data.
 
     Search within the region defined by SCAN_REGION when SCAN_REGION
@@ -48,7 +104,33 @@ def barcodeScan(imagePNGPath, scan_region):
     If SCAN_REGION is not a list, the full image is analyzed. If
     analysis of the full image is desirable, do not set SCAN_REGION to
     [0,0,1,1] but instead set it to None or some other non-list value.
+
+    If PREFILTER_THRESHOLD is an integer, images which do not pass
+    BARCODE_LIKE_P are not handed to zbar.
     """
+    return barcode_scan_image(imagePNGPath,
+                              scan_region,
+                              prefilter_threshold)['barcode']
+
+def barcode_scan_image(imagePNGPath, scan_region, prefilter_threshold=None,
+                       learned_box=None):
+    """
+    See BARCODESCAN. In adaptive region mode, LEARNED_BOX, if
+    specified, is scanned first (see LEARNED_REGION); the whole region
+    is scanned only if no barcode is found within it.
+
+    Return a dictionary describing the scan: barcode is the barcode
+    string or None, skipped is True if the image was rejected by the
+    pre-filter, scale is the scale factor at which the barcode was
+    decoded, zbar_calls is the number of zbar scans performed, of
+    which learned_zbar_calls were scans of LEARNED_BOX, seconds is the
+    duration of the scan, learned is True if the barcode was found
+    within LEARNED_BOX, and box is the location (see
+    ZBAR_SCAN_LOCATED) of a barcode found by scanning the whole region
+    (to be passed to LEARN_REGION) or None.
+    """
+    start = time.perf_counter()
+    scanning_modules()
     # sanity check(s)
     if not isinstance(scan_region,list):
         scan_region = None
@@ -62,7 +144,12 @@ def barcodeScan(imagePNGPath, scan_region):
     # obtain image data either via PIL or CV2/numpy
     #   1. using pil
     # PIL origin (0,0) is top left corner
-    pil = Image.open(imagePNGPath).convert('L') # 'L' is "black and white mode": converts to 8-bit pixels B/W
+    if isinstance(imagePNGPath,Image.Image):
+        pil = imagePNGPath.convert('L')
+        diagnostic_files = []
+    else:
+        pil = Image.open(imagePNGPath).convert('L') # 'L' is "black and white mode": converts to 8-bit pixels B/W
+        diagnostic_files = [imagePNGPath]
     #   2. using cv2/numpy
     #pil_1 = Image.open(imagePNGPath)
     #frame = pil_1.convert("RGB")
@@ -78,47 +165,222 @@ def barcodeScan(imagePNGPath, scan_region):
         y_crop_max = max(scan_region[1],scan_region[3])
         cropTop=int(height*y_crop_min)
         cropBottom=int(height*y_crop_max)
-        cropLeft=int(height*x_crop_min)
-        cropRight=int(height*x_crop_max)
+        cropLeft=int(width*x_crop_min)
+        cropRight=int(width*x_crop_max)
         # crop box is 4-tuple: left,upper,right,lower
         pilCropBox = [cropLeft,cropTop,cropRight,cropBottom]
         pilCropped = pil.crop(pilCropBox)
     #  zbar sometimes catches a barcode at a lower resolution but
     #  misses it at a higher resolution. Scan for barcode with several
     #  variants of image specified by IMAGE_FILE_SPEC.
-    barcodeString = barcode_scan_at_resolutions(pilCropped,None)
-    if ( not barcodeString ):
-            lg.warn(json1.json_barcode_not_found_msg([imagePNGPath],""))
-    return barcodeString
+    if (prefilter_threshold is not None and
+        not barcode_like_p(pilCropped,prefilter_threshold)):
+        if lg.getLogger().isEnabledFor(logging.DEBUG):
+            lg.debug(json1.json_skipped_image_msg(diagnostic_files))
+        return {'barcode': None, 'skipped': True, 'scale': None, 'zbar_calls': 0,
+                'learned_zbar_calls': 0, 'seconds': time.perf_counter() - start,
+                'learned': False, 'box': None}
+    barcodeString, scale_value, learned_attempts, box = None, None, 0, None
+    # in adaptive region mode, scan the learned box first and fall
+    # back to the whole region
+    if _scanner_config['adaptive_region_p'] and learned_box:
+        barcodeString, scale_value, learned_attempts, box = barcode_scan_ladder(
+            crop_box(pilCropped,learned_box),None)
+    learned_p = bool(barcodeString)
+    attempts = learned_attempts
+    if learned_p:
+        # the box is relative to LEARNED_BOX
+        box = None
+    else:
+        barcodeString, scale_value, region_attempts, box = barcode_scan_ladder(pilCropped,None)
+        attempts = attempts + region_attempts
+    if ( not barcodeString and lg.getLogger().isEnabledFor(logging.WARNING) ):
+            lg.warning(json1.json_barcode_not_found_msg(diagnostic_files,""))
+    return {'barcode': barcodeString,
+            'skipped': False,
+            'scale': scale_value,
+            'zbar_calls': attempts,
+            'learned_zbar_calls': learned_attempts,
+            'seconds': time.perf_counter() - start,
+            'learned': learned_p,
+            'box': box}
+
+def barcode_like_p (pil,threshold):
+    """
+    Return True if the grayscale PIL image PIL might contain a 1D
+    barcode. This is a cheap test intended to reject blank pages and
+    pages without barcode-like structure before they reach zbar.
+
+    Bars of a barcode produce sharp intensity transitions which persist
+    over many rows (or, for a barcode rotated by 90 degrees, columns).
+    The image passes if some row or column crosses at least THRESHOLD
+    such transitions (see BAR_EDGES_MAX). CODE-128 encoding a single
+    character has 26 edges.
+    """
+    # NumPy is only needed for pre-filtering
+    import numpy
+    pixels = numpy.asarray(pil,dtype=numpy.int16)
+    if pixels.ndim != 2 or pixels.size < 2:
+        return False
+    # blank (or nearly uniform) image
+    if pixels.std() < PREFILTER_BLANK_STD:
+        return False
+    return (bar_edges_max(pixels) >= threshold or
+            bar_edges_max(pixels.T) >= threshold)
+
+def bar_edges_max (pixels):
+    """
+    Return the largest number of bar edges crossed by a row of PIXELS,
+    a two-dimensional NumPy array of pixel values: sharp horizontal
+    intensity transitions which recur in the same column (+/- 1 pixel)
+    PREFILTER_BAR_ROWS rows below.
+    """
+    import numpy
+    if pixels.shape[0] < 1 or pixels.shape[1] < 2:
+        return 0
+    edges = numpy.abs(numpy.diff(pixels,axis=1)) > PREFILTER_EDGE_DELTA
+    bar_rows = min(PREFILTER_BAR_ROWS,edges.shape[0]-1)
+    if bar_rows > 0:
+        below = edges[bar_rows:]
+        # tolerate slight skew
+        below_widened = below.copy()
+        below_widened[:,1:] |= below[:,:-1]
+        below_widened[:,:-1] |= below[:,1:]
+        edges = edges[:-bar_rows] & below_widened
+    return int(edges.sum(axis=1).max())
 
 def barcode_scan_at_resolutions (pil,scale_values):
     """
     Try scans at multiple image resolutions since zbar sometimes is
-    befuddled by high resolution images.
+    befuddled by high resolution images. SCALE_VALUES is a list of
+    scale factors to try, in order; if it is None, use the configured
+    scale ladder (see CONFIGURE_SCANNER). Return the barcode string or
+    None.
+    """
+    barcodeString, scale_value, attempts, box = barcode_scan_ladder(pil,scale_values)
+    return barcodeString
+
+def barcode_scan_ladder (pil,scale_values):
+    """
+    See BARCODE_SCAN_AT_RESOLUTIONS. Return multiple values: the
+    barcode string (or None), the scale factor at which the barcode was
+    decoded (or None), the number of zbar scans performed, and the
+    location of the barcode (see ZBAR_SCAN_LOCATED) or None.
     """
-    if scale_values == [] :
-        # done - empty array indicates all scale values have been tried
-        return None;
-    elif ( not scale_values ):
+    global _last_successful_scale
+    if scale_values is None:
+        scale_values = scale_ladder()
+    attempts = 0
+    for scale_value in scale_values:
+        if scale_value == 1:
+            pil_scaled = pil
+        else:
+            resize_x = max(1,int(round(scale_value * pil.size[0])))
+            resize_y = max(1,int(round(scale_value * pil.size[1])))
+            pil_scaled = pil.resize( (resize_x, resize_y) )
         # Options for leveraging zbar:
         # (1) via shell invocation and (2) via python zbar library
-        #barcodeString = barcodeScan_zbarimg (pil)
-        barcodeString = barcodeScan_python_zbar_sub (pil)
+        #barcodeString = barcodeScan_zbarimg (pil_scaled)
+        barcodeString, box = zbar_scan_located (pil_scaled)
+        attempts = attempts + 1
         if ( barcodeString ):
-            return barcodeString
-        else:
-            scale_values = [ 0.5 ]
-            return barcode_scan_at_resolutions(pil,scale_values)
+            _last_successful_scale = scale_value
+            return barcodeString, scale_value, attempts, box
+    return None, None, attempts, None
+
+def scale_ladder ():
+    """
+    Return the list of scale factors to try, in order. In adaptive
+    mode, the scale factor which most recently yielded a barcode in
+    this process is tried first. When images are scanned by several
+    worker processes (see pdfxcb.scan_images), each adapts to the
+    images it happened to scan, so that the scale factors tried, unlike
+    the barcodes found, depend on the number of workers.
+    """
+    scale_values = list(_scanner_config['scales'])
+    if (_scanner_config['adaptive_scales_p'] and
+        _last_successful_scale in scale_values):
+        scale_values.remove(_last_successful_scale)
+        scale_values.insert(0,_last_successful_scale)
+    return scale_values
+
+def reset_scale_history ():
+    """
+    Forget the scale factor which most recently yielded a barcode
+    (e.g., at the start of a run).
+    """
+    global _last_successful_scale
+    _last_successful_scale = None
+
+def learn_region (box):
+    """
+    In adaptive region mode, learn where barcodes are found: extend
+    the bounding box of the barcodes located so far by BOX, the
+    location (see ZBAR_SCAN_LOCATED) of a barcode found by scanning
+    the whole region, until ADAPTIVE_REGION_SAMPLES barcodes have been
+    located. The learned box (see LEARNED_REGION), to be scanned first
+    by subsequent scans, is that bounding box enlarged to at least
+    ADAPTIVE_REGION_MIN_SIZE and by ADAPTIVE_REGION_MARGIN on each
+    side. Log the learned box whenever it changes.
+
+    Scan results are learned from in the order of the images, by the
+    process handing them out, so that the learned box does not depend
+    on which worker process scanned which image.
+    """
+    global _located_box, _located_samples, _learned_box
+    if (not _scanner_config['adaptive_region_p'] or
+        box is None or _located_samples >= ADAPTIVE_REGION_SAMPLES):
+        return
+    _located_samples = _located_samples + 1
+    if _located_box is None:
+        _located_box = box
     else:
-        scale_value = scale_values.pop()
-        resize_x = int(round(scale_value * pil.size[0]))
-        resize_y = int(round(scale_value * pil.size[1]))
-        pil_scaled = pil.resize( (resize_x, resize_y) )
-        barcodeString = barcodeScan_python_zbar_sub (pil_scaled)
-        if ( barcodeString ):
-            return barcodeString
-        else:
-            return barcode_scan_at_resolutions(pil,scale_values)
+        _located_box = (min(_located_box[0],box[0]),
+                        min(_located_box[1],box[1]),
+                        max(_located_box[2],box[2]),
+                        max(_located_box[3],box[3]))
+    x_center = (_located_box[0] + _located_box[2])/2
+    y_center = (_located_box[1] + _located_box[3])/2
+    half_width = (0.5 + ADAPTIVE_REGION_MARGIN)*max(_located_box[2] - _located_box[0],
+                                                    ADAPTIVE_REGION_MIN_SIZE)
+    half_height = (0.5 + ADAPTIVE_REGION_MARGIN)*max(_located_box[3] - _located_box[1],
+                                                     ADAPTIVE_REGION_MIN_SIZE)
+    learned_box = (round(max(0.0,x_center - half_width),4),
+                   round(max(0.0,y_center - half_height),4),
+                   round(min(1.0,x_center + half_width),4),
+                   round(min(1.0,y_center + half_height),4))
+    if learned_box != _learned_box:
+        _learned_box = learned_box
+        lg.info(json1.json_learned_scan_region(list(learned_box),_located_samples))
+
+def learned_region ():
+    """
+    Return the learned box (see LEARN_REGION), (x1,y1,x2,y2) as
+    fractions of the dimensions of the scanned image, or None.
+    """
+    return _learned_box
+
+def reset_learned_region ():
+    """
+    Forget the learned box (see LEARN_REGION), e.g., at the start of
+    a run.
+    """
+    global _located_box, _located_samples, _learned_box
+    _located_box = None
+    _located_samples = 0
+    _learned_box = None
+
+def crop_box (pil,box):
+    """
+    Return the part of the PIL image PIL within BOX, (x1,y1,x2,y2) as
+    fractions of the dimensions of PIL.
+    """
+    width, height = pil.size
+    left = int(width*box[0])
+    upper = int(height*box[1])
+    right = max(left+1,min(width,math.ceil(width*box[2])))
+    lower = max(upper+1,min(height,math.ceil(height*box[3])))
+    return pil.crop((left,upper,right,lower))
 
 def barcodeScan_zbarimg (pil):
     """
@@ -136,24 +398,141 @@ def barcodeScan_zbarimg (pil):
     return barcodeString
 
 def barcodeScan_python_zbar_sub (pilCropped):
+    barcodeString, box = zbar_scan_located(pilCropped)
+    return barcodeString
+
+def zbar_scan_located (pilCropped):
+    """
+    Scan the grayscale PIL image PILCROPPED with zbar. Return multiple
+    values: the barcode string (or None) and the bounding box
+    (x1,y1,x2,y2) of the points zbar reports as the barcode's
+    location, as fractions of the dimensions of PILCROPPED, or None.
+    """
+    scanning_modules()
     pilCroppedWidth,pilCroppedHeight = pilCropped.size
     raw = pilCropped.tobytes()
     # wrap raw image data in zbar.Image
     image = zbar.Image(pilCroppedWidth, pilCroppedHeight, 'Y800', raw)
-    # create and configure a reader
-    scanner = zbar.ImageScanner()
-    scanner.parse_config('enable')
+    scanner = zbar_scanner()
     # scan the image for barcodes
     scanner.scan(image)
     # extract results
     barcodeString = None
+    box = None
     # image.symbols should hold a zbar.SymbolSet object
     for symbol in image:
         barcodeString = symbol.data
+        points = list(symbol.location)
+        if points:
+            box = (min(x for x, y in points)/pilCroppedWidth,
+                   min(y for x, y in points)/pilCroppedHeight,
+                   (max(x for x, y in points)+1)/pilCroppedWidth,
+                   (max(y for x, y in points)+1)/pilCroppedHeight)
+        else:
+            box = None
     # clean up (destroy the image object to free up references to the data and symbols)
     # - note: if another image will be scanned, it's also possible to simply recycle the image object
     del(image)
-    return barcodeString
+    return barcodeString, box
+
+def configure_scanner (symbologies=None,x_density=None,y_density=None,
+                       scales=None,adaptive_scales_p=False,
+                       adaptive_region_p=False):
+    """
+    Configure the zbar scanner used by subsequent scans in this
+    process. SYMBOLOGIES is a list of symbology names (see
+    ZBAR_SYMBOLOGIES), e.g. ['code128']; only those symbologies are
+    decoded. If SYMBOLOGIES is None, all symbologies are enabled.
+    X_DENSITY and Y_DENSITY, if specified, are the intervals, in
+    pixels, between the columns and rows zbar scans (1 scans every
+    column/row).
+
+    SCALES is the list of scale factors at which an image is scanned,
+    in order, until a barcode is found (default: [1.0, 0.5]). If
+    ADAPTIVE_SCALES_P is true, the scale factor which most recently
+    yielded a barcode in this process is tried first (see
+    SCALE_LADDER). If ADAPTIVE_REGION_P is true,
+    the part of the scan region where barcodes have been found is
+    scanned first (see LEARN_REGION).
+    """
+    global _scanner
+    if symbologies:
+        for symbology in symbologies:
+            if symbology not in zbar_symbologies:
+                msg = json1.json_msg(999,"unknown symbology: {}".format(symbology),False,None)
+                lg.error(msg)
+                lg.info(json1.json_last_log_msg())
+                sys.exit(msg)
+        symbologies = list(symbologies)
+    _scanner_config['symbologies'] = symbologies
+    _scanner_config['x_density'] = x_density
+    _scanner_config['y_density'] = y_density
+    if scales:
+        for scale_value in scales:
+            if (scale_value <= 0 or scale_value > 1):
+                msg = json1.json_msg(999,"insane scale value",False,None)
+                lg.error(msg)
+                lg.info(json1.json_last_log_msg())
+                sys.exit(msg)
+        _scanner_config['scales'] = list(scales)
+    else:
+        _scanner_config['scales'] = [1.0, 0.5]
+    _scanner_config['adaptive_scales_p'] = adaptive_scales_p
+    _scanner_config['adaptive_region_p'] = adaptive_region_p
+    # the scanner is rebuilt, with the new configuration, on next use
+    _scanner = None
+
+def scanner_config ():
+    """
+    Return the current scanner configuration as a dictionary suitable
+    as keyword arguments for CONFIGURE_SCANNER.
+    """
+    config = dict(_scanner_config)
+    config['scales'] = list(config['scales'])
+    return config
+
+def require_module (module_name):
+    """
+    Import and return the module MODULE_NAME (e.g., 'PIL.Image'). If
+    the module is not accessible, log the failure and exit.
+    """
+    top_level_name = module_name.partition('.')[0]
+    if importlib.util.find_spec(top_level_name) is None:
+        msg = json1.json_msg_module_not_accessible(top_level_name)
+        lg.error(msg)
+        lg.info(json1.json_last_log_msg())
+        sys.exit(msg)
+    return importlib.import_module(module_name)
+
+def scanning_modules ():
+    """Import zbar and Image (see REQUIRE_MODULE) on first use."""
+    global zbar, Image
+    if zbar is None:
+        zbar = require_module('zbar')
+    if Image is None:
+        Image = require_module('PIL.Image')
+
+def zbar_scanner ():
+    """
+    Return the zbar.ImageScanner used by this process, creating and
+    configuring it (see CONFIGURE_SCANNER) on first use.
+    """
+    global _scanner
+    if _scanner is None:
+        scanning_modules()
+        scanner = zbar.ImageScanner()
+        if _scanner_config['symbologies']:
+            scanner.parse_config('disable')
+            for symbology in _scanner_config['symbologies']:
+                scanner.parse_config(symbology + '.enable')
+        else:
+            scanner.parse_config('enable')
+        if _scanner_config['x_density']:
+            scanner.parse_config('x-density={}'.format(_scanner_config['x_density']))
+        if _scanner_config['y_density']:
+            scanner.parse_config('y-density={}'.format(_scanner_config['y_density']))
+        _scanner = scanner
+    return _scanner
 
 def zbarimgWithPopen (path):
     """
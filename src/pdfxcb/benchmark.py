@@ -0,0 +1,338 @@
+import argparse
+import importlib.util
+import json
+import os
+import os.path
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+import logging
+
+from PIL import Image, ImageDraw
+
+import pdfxcb.pdf as pdf
+import pdfxcb.pdfxcb as pdfxcb
+
+
+lg=logging
+
+# CODE-128 symbols: widths, in modules, of alternating bars and spaces
+# (beginning with a bar) indexed by symbol value
+code128_patterns = [
+    '212222', '222122', '222221', '121223', '121322', '131222', '122213', '122312', '132212', '221213',
+    '221312', '231212', '112232', '122132', '122231', '113222', '123122', '123221', '223211', '221132',
+    '221231', '213212', '223112', '312131', '311222', '321122', '321221', '312212', '322112', '322211',
+    '212123', '212321', '232121', '111323', '131123', '131321', '112313', '132113', '132311', '211313',
+    '231113', '231311', '112133', '112331', '132131', '113123', '113321', '133121', '313121', '211331',
+    '231131', '213113', '213311', '213131', '311123', '311321', '331121', '312113', '312311', '332111',
+    '314111', '221411', '431111', '111224', '111422', '121124', '121421', '141122', '141221', '112214',
+    '112412', '122114', '122411', '142112', '142211', '241211', '221114', '413111', '241112', '134111',
+    '111242', '121142', '121241', '114212', '124112', '124211', '411212', '421112', '421211', '212141',
+    '214121', '412121', '111143', '111341', '131141', '114113', '114311', '411113', '411311', '113141',
+    '114131', '311141', '411131', '211412', '211214', '211232'
+]
+code128_start_b = 104
+code128_stop = '2331112'
+# quiet zone on either side of a barcode, in modules
+code128_quiet_zone = 10
+
+# default benchmark parameters (see MAIN)
+default_parameters = {
+    'pages': 40,
+    'document_pages': 5,
+    'dpi': 150,
+    'blank_fraction': 0.2,
+    'noise': 0.0,
+    'skew': 0.0,
+    'module_width': 3,
+    'bar_height': 0.05,
+    'barcode_position': [0.1, 0.1],
+    'region': [0, 0, 0.7, 0.5],
+    'jobs': None,
+    'seed': 0
+}
+
+
+def code128_modules (text):
+    """
+    Return the CODE-128 (code set B) symbol encoding the string TEXT,
+    composed of printable ASCII characters, as a string of module
+    widths alternating between bars and spaces.
+    """
+    values = [ord(character) - 32 for character in text]
+    if any(value < 0 or value > 95 for value in values):
+        raise ValueError(f'{text!r} cannot be encoded with code set B')
+    checksum = code128_start_b
+    for position, value in enumerate(values,1):
+        checksum = checksum + position*value
+    symbols = [code128_start_b] + values + [checksum % 103]
+    return ''.join(code128_patterns[symbol] for symbol in symbols) + code128_stop
+
+def draw_code128 (image,text,position,module_width,bar_height):
+    """
+    Draw a CODE-128 barcode encoding TEXT on the PIL image IMAGE with
+    its top left corner (excluding the quiet zone) at POSITION, a pair
+    of fractions of the image width and height. Each module is
+    MODULE_WIDTH pixels wide; bars are BAR_HEIGHT (a fraction of the
+    image height) high. Return the bounding box of the barcode, in
+    pixels.
+    """
+    draw = ImageDraw.Draw(image)
+    x = int(position[0]*image.width) + code128_quiet_zone*module_width
+    y = int(position[1]*image.height)
+    height = max(1,int(bar_height*image.height))
+    left = x
+    for i, width in enumerate(code128_modules(text)):
+        width = int(width)*module_width
+        if i % 2 == 0:
+            draw.rectangle([x,y,x+width-1,y+height-1],fill=0)
+        x = x + width
+    return (left,y,x,y+height)
+
+def synthetic_page (width,height,text=None,blank_p=False,parameters=None,rng=None):
+    """
+    Return a grayscale PIL image WIDTH by HEIGHT pixels representing a
+    scanned page: a cover sheet with a barcode encoding TEXT, if TEXT
+    is specified, a blank page, if BLANK_P is true, or otherwise a page
+    of text-like lines. PARAMETERS specifies noise, skew, and the
+    barcode's placement (see DEFAULT_PARAMETERS). RNG is a
+    random.Random.
+    """
+    parameters = parameters or default_parameters
+    rng = rng or random.Random(0)
+    image = Image.new('L',(width,height),255)
+    if text:
+        draw_code128(image,text,parameters['barcode_position'],
+                     parameters['module_width'],parameters['bar_height'])
+    elif not blank_p:
+        draw = ImageDraw.Draw(image)
+        margin = width//10
+        line_height = max(2,height//60)
+        for y in range(height//8,height-height//8,2*line_height):
+            line_end = width - margin - rng.randrange(0,width//3)
+            draw.rectangle([margin,y,line_end,y+line_height//2],fill=64)
+    if parameters['skew']:
+        image = image.rotate(rng.uniform(-parameters['skew'],parameters['skew']),
+                             resample=Image.BILINEAR,fillcolor=255)
+    if parameters['noise']:
+        pixels = image.load()
+        for i in range(int(parameters['noise']*width*height)):
+            pixels[rng.randrange(width),rng.randrange(height)] = rng.choice((0,255))
+    return image
+
+def synthetic_pdf (pdf_file,parameters=None):
+    """
+    Write a synthetic scanned PDF to PDF_FILE, one image per page, as
+    described by PARAMETERS (see DEFAULT_PARAMETERS): a cover sheet
+    begins every document_pages pages and a blank_fraction of the
+    remaining pages is blank. Return a list of (<barcode>, <page
+    number>) tuples describing the cover sheets.
+    """
+    parameters = dict(default_parameters,**(parameters or {}))
+    rng = random.Random(parameters['seed'])
+    dpi = parameters['dpi']
+    # US letter
+    width, height = int(8.5*dpi), int(11*dpi)
+    cover_sheets = []
+    pages = []
+    for page_number in range(1,parameters['pages']+1):
+        text = None
+        blank_p = False
+        if (page_number-1) % parameters['document_pages'] == 0:
+            text = f'BENCH{len(cover_sheets):04d}'
+            cover_sheets.append((text,page_number))
+        else:
+            blank_p = rng.random() < parameters['blank_fraction']
+        pages.append(synthetic_page(width,height,text,blank_p,parameters,rng))
+    pages[0].save(pdf_file,'PDF',resolution=dpi,save_all=True,append_images=pages[1:])
+    return cover_sheets
+
+def timed (stages,stage,function,*args,pages=None,**kwargs):
+    """
+    Call FUNCTION with ARGS and KWARGS, record its duration (and, if
+    PAGES is specified, throughput) as the member STAGE of the
+    dictionary STAGES, and return its value.
+    """
+    start = time.perf_counter()
+    value = function(*args,**kwargs)
+    seconds = time.perf_counter() - start
+    stages[stage] = {'seconds': seconds}
+    if pages:
+        stages[stage]['pages_per_second'] = pages/seconds if seconds else None
+    return value
+
+def skip (skipped,stage,reason):
+    """
+    Record, in the dictionary SKIPPED, that STAGE was skipped for
+    REASON and say so on standard error.
+    """
+    skipped[stage] = reason
+    print(f'skipping {stage}: {reason}',file=sys.stderr)
+
+def run_benchmark (work_dir,parameters=None):
+    """
+    Generate a synthetic PDF (see SYNTHETIC_PDF) in the directory
+    WORK_DIR and time each stage of processing it. Return a dictionary
+    with the parameters, the duration of each stage, the result of
+    checking each stage's output against the synthetic PDF, and the
+    stages skipped since a tool they require (pdftoppm, pdfimages, or
+    the zbar module) is not installed, with the reason.
+    """
+    parameters = dict(default_parameters,**(parameters or {}))
+    stages = {}
+    checks = {}
+    skipped = {}
+    pdf_file = os.path.join(work_dir,'synthetic.pdf')
+    cover_sheets = timed(stages,'generate',synthetic_pdf,pdf_file,parameters)
+    number_of_pages = parameters['pages']
+    expected_barcodes = [barcode for barcode, page_number in cover_sheets]
+    expected_indices = [page_number-1 for barcode, page_number in cover_sheets]
+    jobs = parameters['jobs']
+    region = parameters['region']
+    # rasterization
+    png_dir = os.path.join(work_dir,'png')
+    os.makedirs(png_dir)
+    png_file_tuples = None
+    if shutil.which('pdftoppm'):
+        png_file_tuples = timed(stages,'pdf_to_pngs',pdf.pdf_to_pngs,pdf_file,png_dir,jobs,region,
+                                pages=number_of_pages)
+        checks['pdf_to_pngs'] = (len(png_file_tuples) == number_of_pages)
+    else:
+        skip(skipped,'pdf_to_pngs','pdftoppm is not installed')
+    # embedded image extraction
+    def extract_images ():
+        with pdf.PdfSession(pdf_file) as session:
+            return list(pdf.pdf_images(session,pdf.pdf_image_xobjects(session)))
+    images = timed(stages,'pdf_images',extract_images,pages=number_of_pages)
+    checks['pdf_images'] = (len(images) == number_of_pages)
+    if shutil.which('pdfimages'):
+        pdfimages_dir = os.path.join(work_dir,'pdfimages')
+        os.makedirs(pdfimages_dir)
+        pdfimages_tuples = timed(stages,'pdfimages',pdf.pdfimages,pdf_file,pdfimages_dir,
+                                 pages=number_of_pages)
+        checks['pdfimages'] = (len(pdfimages_tuples) == number_of_pages)
+    else:
+        skip(skipped,'pdfimages','pdfimages is not installed')
+    # barcode scanning (only the region was rendered)
+    if importlib.util.find_spec('zbar') is None:
+        skip(skipped,'locate_cover_sheets','the zbar module is not installed')
+    elif png_file_tuples is None:
+        skip(skipped,'locate_cover_sheets','pdftoppm is not installed')
+    else:
+        barcodes, indices = timed(stages,'locate_cover_sheets',pdfxcb.locate_cover_sheets,
+                                  png_file_tuples,png_dir,None,None,jobs=jobs,
+                                  pages=number_of_pages)
+        checks['locate_cover_sheets'] = (barcodes == expected_barcodes and
+                                         indices == expected_indices)
+    # splitting at the expected cover sheets
+    split_dir = os.path.join(work_dir,'split')
+    os.makedirs(split_dir)
+    page_ranges = [(page_number,next_page_number-1)
+                   for (barcode, page_number), (next_barcode, next_page_number)
+                   in zip(cover_sheets,cover_sheets[1:]+[(None,number_of_pages+1)])]
+    output_files = [os.path.join(split_dir,f'{barcode}.pdf') for barcode, page_number in cover_sheets]
+    timed(stages,'pdf_split',pdf.pdf_split,pdf_file,output_files,page_ranges,jobs,
+          pages=number_of_pages)
+    checks['pdf_split'] = all(
+        pdf.pdf_number_of_pages(output_file) == last_page - first_page + 1
+        for output_file, (first_page, last_page) in zip(output_files,page_ranges))
+    split_after_dir = os.path.join(work_dir,'split_after')
+    os.makedirs(split_after_dir)
+    burst_completed = timed(stages,'pdfxcb_split_after',pdfxcb.pdfxcb_split_after,
+                            pdf_file,split_after_dir,parameters['document_pages'],
+                            jobs=jobs,pages=number_of_pages)
+    checks['pdfxcb_split_after'] = (
+        sum(pdf.pdf_number_of_pages(output_file) for output_file in burst_completed['files']) ==
+        number_of_pages)
+    return {
+        'parameters': parameters,
+        'pdf_bytes': os.path.getsize(pdf_file),
+        'stages': stages,
+        'checks': checks,
+        'skipped': skipped
+    }
+
+def main():
+    """Handle command-line invocation of the benchmark."""
+    parser = argparse.ArgumentParser(
+        description="Time pdfxcb's processing stages on a synthetic scanned PDF")
+    parser.add_argument("--pages",
+                        help="number of pages (default: %d)" % default_parameters['pages'],
+                        default=default_parameters['pages'],
+                        type=int)
+    parser.add_argument("--document-pages",
+                        help="a cover sheet begins every N pages (default: %d)" % default_parameters['document_pages'],
+                        default=default_parameters['document_pages'],
+                        dest="document_pages",
+                        type=int)
+    parser.add_argument("--dpi",
+                        help="resolution of the page images (default: %d)" % default_parameters['dpi'],
+                        default=default_parameters['dpi'],
+                        type=int)
+    parser.add_argument("--blank-fraction",
+                        help="fraction of non-cover pages which are blank (default: %g)" % default_parameters['blank_fraction'],
+                        default=default_parameters['blank_fraction'],
+                        dest="blank_fraction",
+                        type=float)
+    parser.add_argument("--noise",
+                        help="fraction of pixels replaced by black or white noise (default: 0)",
+                        default=default_parameters['noise'],
+                        type=float)
+    parser.add_argument("--skew",
+                        help="maximum page skew in degrees (default: 0)",
+                        default=default_parameters['skew'],
+                        type=float)
+    parser.add_argument("--module-width",
+                        help="width, in pixels, of a barcode module (default: %d)" % default_parameters['module_width'],
+                        default=default_parameters['module_width'],
+                        dest="module_width",
+                        type=int)
+    parser.add_argument("--barcode-position",
+                        help="position of the barcode as fractions of the page width and height (default: 0.1 0.1)",
+                        default=default_parameters['barcode_position'],
+                        dest="barcode_position",
+                        nargs=2,
+                        type=float)
+    parser.add_argument("-r",
+                        help="region of the page to be scanned (default: 0 0 0.7 0.5)",
+                        default=default_parameters['region'],
+                        dest="region",
+                        nargs=4,
+                        type=float)
+    parser.add_argument("--jobs",
+                        help="maximum number of concurrent worker processes (default: one per core)",
+                        default=None,
+                        type=int)
+    parser.add_argument("--seed",
+                        help="random seed (default: 0)",
+                        default=default_parameters['seed'],
+                        type=int)
+    parser.add_argument("-o",
+                        help="write the results to this file rather than to standard output",
+                        dest="output_file",
+                        type=str)
+    args = parser.parse_args()
+    parameters = dict(default_parameters,
+                      **{key: getattr(args,key) for key in default_parameters
+                         if hasattr(args,key)})
+    lg.getLogger().setLevel(logging.WARNING)
+    work_dir = tempfile.mkdtemp(prefix='pdfxcb-benchmark-')
+    try:
+        results = run_benchmark(work_dir,parameters)
+    finally:
+        shutil.rmtree(work_dir,ignore_errors=True)
+    results['time'] = int(time.time())
+    if args.output_file:
+        with open(args.output_file,'w') as f:
+            json.dump(results,f,indent=1)
+    else:
+        json.dump(results,sys.stdout,indent=1)
+        print()
+    if not all(results['checks'].values()):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
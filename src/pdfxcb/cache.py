@@ -0,0 +1,103 @@
+import hashlib
+import json
+import time
+
+import logging
+
+
+lg=logging
+
+# default maximum number of entries in a scan cache
+default_max_entries = 100000
+
+
+class ScanCache:
+    """
+    An on-disk cache of barcode scan results (see
+    barScan.barcode_scan_image) keyed by strings (see SCAN_CACHE_KEY),
+    stored in the SQLite database at PATH. Once the cache holds more
+    than MAX_ENTRIES entries, the least recently used entries are
+    evicted. HITS and MISSES count lookups since the cache was opened.
+    """
+    def __init__(self, path, max_entries=default_max_entries):
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        # imported here since the cache is optional
+        import sqlite3
+        self.connection = sqlite3.connect(path,timeout=30)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS scans "
+            "(key TEXT PRIMARY KEY, result TEXT, last_used REAL)")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS scans_last_used ON scans (last_used)")
+        self.connection.commit()
+        (self.count,) = self.connection.execute("SELECT COUNT(*) FROM scans").fetchone()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Write pending changes and close the database."""
+        self.connection.commit()
+        self.connection.close()
+
+    def get(self, key):
+        """
+        Return the scan result cached for KEY or None if KEY is not
+        cached.
+        """
+        row = self.connection.execute(
+            "SELECT result FROM scans WHERE key = ?",(key,)).fetchone()
+        if row is None:
+            self.misses = self.misses + 1
+            return None
+        self.hits = self.hits + 1
+        self.connection.execute(
+            "UPDATE scans SET last_used = ? WHERE key = ?",(time.time(),key))
+        return json.loads(row[0])
+
+    def put(self, key, result):
+        """Cache the scan result RESULT, a dictionary, for KEY."""
+        cursor = self.connection.execute(
+            "UPDATE scans SET result = ?, last_used = ? WHERE key = ?",
+            (json.dumps(result),time.time(),key))
+        if cursor.rowcount == 0:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO scans (key, result, last_used) VALUES (?, ?, ?)",
+                (key,json.dumps(result),time.time()))
+            self.count = self.count + 1
+        if self.count > self.max_entries:
+            self.evict()
+        self.connection.commit()
+
+    def evict(self):
+        """Remove least recently used entries beyond MAX_ENTRIES."""
+        # other processes may share the database
+        (count,) = self.connection.execute("SELECT COUNT(*) FROM scans").fetchone()
+        if count > self.max_entries:
+            self.connection.execute(
+                "DELETE FROM scans WHERE key IN "
+                "(SELECT key FROM scans ORDER BY last_used LIMIT ?)",
+                (count-self.max_entries,))
+        self.count = min(count,self.max_entries)
+
+    def stats(self):
+        """Return the hit and miss counts as a dictionary."""
+        return {'cache_hits': self.hits, 'cache_misses': self.misses}
+
+
+def scan_cache_key (page_digest,scan_parameters):
+    """
+    Return the cache key for the scan of an image derived from the page
+    with digest PAGE_DIGEST (see pdf.PdfSession.page_digest) using the
+    JSON-serializable SCAN_PARAMETERS (e.g., the scan region, the
+    resolution, and the scanner configuration).
+    """
+    digest = hashlib.sha256(page_digest.encode('ascii'))
+    digest.update(json.dumps(scan_parameters,sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
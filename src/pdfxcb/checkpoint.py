@@ -0,0 +1,255 @@
+import json
+import os
+import threading
+
+import logging
+
+import pdfxcb.pdf as pdf
+
+
+lg=logging
+
+# the name of the journal file in the output directory
+journal_file_name = '.pdfxcb-journal'
+# the name of the incremental state file in the output directory
+state_file_name = '.pdfxcb-state'
+
+
+class Journal:
+    """
+    A checkpoint journal of the processing of the PDF file
+    PDF_FILE_SPEC with the scan parameters PARAMETERS (a
+    JSON-serializable dictionary), stored as JSON lines in the file
+    JOURNAL_FILE_NAME in the directory OUTPUT_DIR: the scan result of
+    each image (see RECORD_SCAN), the output files planned (see
+    RECORD_OUTPUTS), and the output files written (see
+    RECORD_WRITTEN). Each entry is written as soon as it is recorded.
+
+    If RESUME_P is true and the journal describes the same PDF file
+    (path, size, and modification time) and the same PARAMETERS, its
+    entries are kept (see SCAN_RESULTS and PLANNED_OUTPUT); otherwise
+    the journal is begun anew. RESUMED is true if entries were kept.
+    """
+    def __init__(self, output_dir, pdf_file_spec, parameters, resume_p=False):
+        self.path = os.path.join(output_dir,journal_file_name)
+        stat = os.stat(pdf_file_spec)
+        # normalized (e.g., tuples to lists) as if read from the journal
+        self.header = json.loads(json.dumps({
+            'type': 'header',
+            'pdffile': os.path.abspath(pdf_file_spec),
+            'size': stat.st_size,
+            'mtime': stat.st_mtime_ns,
+            'parameters': parameters
+        }))
+        self.scans = {}
+        self.outputs = {}
+        self.written = set()
+        self.lock = threading.Lock()
+        entries = self.load() if resume_p else []
+        self.resumed = bool(entries)
+        # rewrite the journal since the last entry may have been cut
+        # short when the process was terminated
+        self.stream = open(self.path,'w',buffering=1)
+        for entry in [self.header] + entries:
+            self.append(entry)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the journal file."""
+        self.stream.close()
+
+    def remove(self):
+        """Close and remove the journal file."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+    def load(self):
+        """
+        Read the entries of the existing journal file. Return the
+        entries, other than the header, or an empty list if there is
+        no journal file or it describes another PDF file or other
+        parameters.
+        """
+        entries = []
+        try:
+            with open(self.path) as stream:
+                for line in stream:
+                    try:
+                        entries.append(json.loads(line))
+                    except ValueError:
+                        break
+        except FileNotFoundError:
+            return []
+        if not entries or entries[0] != self.header:
+            lg.info("Checkpoint journal {} does not match; starting anew".format(self.path))
+            return []
+        for entry in entries[1:]:
+            if entry['type'] == 'scan':
+                self.scans[entry['index']] = (entry['page'],entry['result'])
+            elif entry['type'] == 'output':
+                self.outputs[tuple(entry['pages'])] = entry['file']
+            elif entry['type'] == 'written':
+                self.written.add(entry['file'])
+        return entries[1:]
+
+    def append(self, entry):
+        """Write the dictionary ENTRY to the journal file."""
+        with self.lock:
+            self.stream.write(json.dumps(entry) + '\n')
+
+    def record_scan(self, index, page_number, scan_result):
+        """
+        Record SCAN_RESULT (see barScan.barcode_scan_image), the result
+        of scanning the image at INDEX, derived from page PAGE_NUMBER.
+        """
+        self.scans[index] = (page_number,scan_result)
+        self.append({'type': 'scan',
+                     'index': index,
+                     'page': page_number,
+                     'result': scan_result})
+
+    def record_outputs(self, output_files, page_ranges):
+        """
+        Record the output files OUTPUT_FILES planned for the
+        corresponding PAGE_RANGES.
+        """
+        for output_file, page_range in zip(output_files,page_ranges):
+            self.outputs[tuple(page_range)] = output_file
+            self.append({'type': 'output',
+                         'file': output_file,
+                         'pages': list(page_range)})
+
+    def record_written(self, output):
+        """
+        Record OUTPUT, a dictionary describing an output file which
+        has been written (see pdf.pdf_split).
+        """
+        self.written.add(output['file'])
+        self.append({'type': 'written',
+                     'file': output['file'],
+                     'bytes': output['bytes']})
+
+    def scan_results(self, png_file_page_number_tuples):
+        """
+        Return a dictionary mapping the index of each member of
+        PNG_FILE_PAGE_NUMBER_TUPLES whose scan result is recorded to a
+        (<tuple>, <scan result>) pair (see
+        pdfxcb.locate_cover_sheets).
+        """
+        known_results = {}
+        for i, png_file_tuple in enumerate(png_file_page_number_tuples):
+            if i in self.scans and self.scans[i][0] == png_file_tuple[1]:
+                known_results[i] = (png_file_tuple,self.scans[i][1])
+        return known_results
+
+    def planned_output(self, page_range):
+        """
+        Return the output file planned for PAGE_RANGE or None if none
+        is recorded.
+        """
+        return self.outputs.get(tuple(page_range))
+
+    def written_p(self, output_file, page_range):
+        """
+        Return True if OUTPUT_FILE is recorded as planned for
+        PAGE_RANGE and as written and if it still exists.
+        """
+        return (self.outputs.get(tuple(page_range)) == output_file and
+                output_file in self.written and
+                os.path.exists(output_file))
+
+
+class IncrementalState:
+    """
+    The state of the previous incremental run, stored as JSON in the
+    file STATE_FILE_NAME in the directory OUTPUT_DIR, on the PDF file
+    of the pdf.PdfSession SESSION with the scan parameters PARAMETERS
+    (a JSON-serializable dictionary): the number of pages, the digest
+    of the last page, the scan result of each image, and the output
+    files with their page ranges.
+
+    The state is kept only if it describes the same PDF file and
+    PARAMETERS and if its last page is unchanged, i.e., if pages have
+    at most been appended to the PDF since; otherwise it is empty.
+    PAGES is the number of pages described by the state kept (0 if
+    it is empty).
+    """
+    def __init__(self, output_dir, session, parameters):
+        self.path = os.path.join(output_dir,state_file_name)
+        self.pdffile = os.path.abspath(session.path)
+        # normalized (e.g., tuples to lists) as if read from the state file
+        self.parameters = json.loads(json.dumps(parameters))
+        self.pages = 0
+        self.scans = {}
+        self.outputs = {}
+        try:
+            with open(self.path) as stream:
+                state = json.load(stream)
+        except (FileNotFoundError,ValueError):
+            return
+        if (state['pdffile'] == self.pdffile and
+            state['parameters'] == self.parameters and
+            0 < state['pages'] <= session.number_of_pages() and
+            session.page_digest(state['pages']) == state['page_digest']):
+            self.pages = state['pages']
+            self.scans = dict((scan['index'],(scan['page'],scan['result']))
+                              for scan in state['scans'])
+            # first page -> (<output file>,<page range>)
+            self.outputs = dict((output['pages'][0],(output['file'],tuple(output['pages'])))
+                                for output in state['outputs'])
+        else:
+            lg.info("Incremental state {} does not match; processing every page".format(self.path))
+
+    def save(self, session, scan_results, output_files, page_ranges):
+        """
+        Write the state of this run given SESSION, SCAN_RESULTS, a
+        dictionary mapping the index of each image to a (<page
+        number>, <scan result>) pair, and the OUTPUT_FILES written for
+        the corresponding PAGE_RANGES.
+        """
+        number_of_pages = session.number_of_pages()
+        state = {
+            'pdffile': self.pdffile,
+            'parameters': self.parameters,
+            'pages': number_of_pages,
+            'page_digest': session.page_digest(number_of_pages),
+            'scans': [{'index': i, 'page': page_number, 'result': scan_result}
+                      for i, (page_number, scan_result) in sorted(scan_results.items())],
+            'outputs': [{'file': output_file, 'pages': list(page_range)}
+                        for output_file, page_range in zip(output_files,page_ranges)]
+        }
+        with pdf.atomic_output(self.path) as stream:
+            stream.write(json.dumps(state).encode('utf-8'))
+
+    def scan_results(self, png_file_page_number_tuples):
+        """See Journal.scan_results."""
+        known_results = {}
+        for i, png_file_tuple in enumerate(png_file_page_number_tuples):
+            if (png_file_tuple[1] <= self.pages and
+                i in self.scans and self.scans[i][0] == png_file_tuple[1]):
+                known_results[i] = (png_file_tuple,self.scans[i][1])
+        return known_results
+
+    def planned_output(self, page_range):
+        """
+        Return the output file written for the page range beginning
+        with the first page of PAGE_RANGE or None if there is none.
+        The file is rewritten if the page range has since grown.
+        """
+        if page_range[0] in self.outputs:
+            return self.outputs[page_range[0]][0]
+        return None
+
+    def written_p(self, output_file, page_range):
+        """
+        Return True if OUTPUT_FILE was written for PAGE_RANGE and if
+        it still exists.
+        """
+        return (self.outputs.get(page_range[0]) == (output_file,tuple(page_range)) and
+                os.path.exists(output_file))
@@ -1,5 +1,4 @@
 import json
-import datetime
 import time
 
 
@@ -41,8 +40,10 @@ def json_msg_obj(code,message,
     obj = {}
     obj['code'] = code
     obj['message'] = message
-    obj['time'] = int(time.time())
-    obj['microsec'] = datetime.datetime.now().microsecond
+    # a single clock reading for both slots
+    now = time.time()
+    obj['time'] = int(now)
+    obj['microsec'] = int((now % 1)*1000000)
     if data:
         obj['data'] = data
     if file:
@@ -71,12 +72,48 @@ def json_barcode_not_found_msg(files,msg):
         message.append(msg);
     return json_msg(135, message, False,None)
 
+def json_batch_completed(files,failed_files):
+    """
+    Return a string. Use once all PDF files in a batch have been
+    processed. FILES and FAILED_FILES are arrays of strings specifying
+    the PDF files processed successfully and unsuccessfully.
+    """
+    return json_msg(41,
+                    ['Batch completed'],
+                    False,
+                    files=files,
+                    data={'failed': failed_files})
+
 def json_blank_page_on_deskew(file):
     """Return a string"""
     return json_msg(121,
                     "encountered blank page on attempt to deskew",
                     False,file=file)
 
+def json_burst_completed_obj(files,pdffile,data):
+    """
+    Return an object. Use once the PDF file PDFFILE has been analyzed
+    and split into the files FILES. DATA describes the analysis
+    (e.g., barcodes and indices).
+    """
+    return json_msg_obj(40,
+                        ['Analysis and burst completed'],
+                        data=data,
+                        files=files,
+                        pdffile=pdffile)
+
+def json_burst_timing(pdffile,timing):
+    """
+    Return a string. Use once the PDF file PDFFILE has been split.
+    TIMING is a dictionary describing the duration of each stage and
+    the resulting throughput (see pdfxcb.pdfxcb).
+    """
+    return json_msg(42,
+                    'Burst timing',
+                    False,
+                    data=timing,
+                    pdffile=pdffile)
+
 def json_completed_pdf_to_ppm(page_number,number_of_pages):
     """Return a string"""
     return json_msg(11,
@@ -101,6 +138,18 @@ def json_first_log_msg(identifier,files=None):
     obj['files'] = files
     return json.dumps(obj)
 
+def json_learned_scan_region(box,samples):
+    """
+    Return a string. Use once the box scanned first in adaptive region
+    mode (see barScan.learn_region) has been learned from the location
+    of SAMPLES barcodes. BOX is [x1,y1,x2,y2] as fractions of the
+    dimensions of the scanned image.
+    """
+    return json_msg(52,
+                    'Learned scan region',
+                    False,
+                    data={'box': box, 'samples': samples})
+
 def json_last_log_msg():
     """Return a string. Use for the last log message."""
     return json_msg(2,
@@ -135,6 +184,12 @@ def json_failed_to_deskew(pngFile,pageNumber,comments):
                     False,
                     files=[pngFile])
 
+def json_failed_to_process_pdf(exception,PDFFileSpec):
+    return json_msg(111,
+                    ['Failed to process PDF file', str(exception)],
+                    False,
+                    pdffile=PDFFileSpec)
+
 def json_failed_to_parse_file(exception,someFile):
     return json_msg(131,
                     ['Failed to parse file', str(exception)],
@@ -181,6 +236,36 @@ def json_msg_module_not_accessible(module_name):
                     'The python module ' + module_name + ' is not accessible. Is it installed?',
                     False,None)
 
+def json_page_engines(pdffile,page_engines):
+    """
+    Return a string. PAGE_ENGINES is a dictionary mapping each engine
+    (e.g., 'extract' or 'rasterize') to the list of page numbers
+    processed by that engine.
+    """
+    return json_msg(71,
+                    "Page engines",
+                    False,
+                    data=page_engines,
+                    pdffile=pdffile)
+
+def json_page_scanned(page_number,scan_result,cached_p=False):
+    """
+    Return a string. Use once the image of page PAGE_NUMBER has been
+    scanned for a barcode. SCAN_RESULT is the dictionary returned by
+    barScan.barcode_scan_image. CACHED_P is true if SCAN_RESULT was
+    retrieved from a cache rather than scanned.
+    """
+    return json_msg(51,
+                    'Page scanned',
+                    False,
+                    data={'page': page_number,
+                          'seconds': scan_result.get('seconds'),
+                          'scale': scan_result.get('scale'),
+                          'zbar_calls': scan_result.get('zbar_calls'),
+                          'skipped': scan_result.get('skipped'),
+                          'learned': scan_result.get('learned'),
+                          'cached': cached_p})
+
 # File size (kB), resolution, file name, etc. might also be of interest at some point.
 def json_pdf_info(number_of_pages):
     """Provide description of the PDF under consideration."""
@@ -206,6 +291,31 @@ def json_progress(progress_message):
     """
     return json_msg(50, progress_message, False)
 
+def json_rasterization_completed(pdffile,timing):
+    """
+    Return a string. Use once the pages of the PDF file PDFFILE have
+    been rasterized or their images extracted. TIMING is a dictionary
+    with the number of pages, the duration in seconds, and the number
+    of pages per second.
+    """
+    return json_msg(12,
+                    'Rasterization completed',
+                    False,
+                    data=timing,
+                    pdffile=pdffile)
+
+def json_request_completed(path,timing):
+    """
+    Return a string. Use once a split service request (see
+    server.serve) for PATH has been handled. TIMING is a dictionary of
+    durations in seconds.
+    """
+    return json_msg(60,
+                    'Request completed',
+                    False,
+                    file=path,
+                    data=timing)
+
 def json_scanset(scanSet):
     return json_msg(30,
                     'scanset',
@@ -214,6 +324,16 @@ def json_scanset(scanSet):
 def json_scansets(scanSets):
     return json.dumps(scanSets)
 
+def json_skipped_image_msg(files):
+    """
+    FILES is an array where each member is a string specifying the
+    location of an image file which was not scanned for a barcode
+    since it lacks barcode-like structure.
+    """
+    return json_msg(137,
+                    "Skipped image without barcode-like structure",
+                    False,files=files)
+
 def json_successful_deskew(file):
     """Return a string"""
     return json_msg(20,
@@ -0,0 +1,178 @@
+import atexit
+import logging
+import logging.handlers
+import multiprocessing
+import threading
+import time
+
+
+lg=logging
+
+# JSON log messages are written as is
+json_log_format = '%(message)s'
+
+# codes of the records flushed as soon as they are written (see
+# BatchingFileHandler): the summary of a run (code 40) and the last
+# record of a run (code 2)
+FLUSH_CODES = (2, 40)
+# JSON log messages begin with their code (see json1.json_msg_obj)
+_flush_prefixes = tuple('{"code": %d,' % code for code in FLUSH_CODES)
+
+# default interval, in seconds, between progress messages (see
+# PROGRESS_DUE)
+PROGRESS_INTERVAL = 5.0
+# default fraction of the work, as a percentage, between progress
+# messages
+PROGRESS_PERCENT = 10.0
+
+# the queue from which the background writer (see START_LOGGING)
+# writes log records; None if the writer has not been started (e.g.,
+# if records are written directly)
+_log_queue = None
+
+# progress rate limits (see CONFIGURE_PROGRESS)
+_progress_config = {
+    'interval': PROGRESS_INTERVAL,
+    'percent': PROGRESS_PERCENT
+}
+
+
+class BatchingFileHandler(logging.FileHandler):
+    """
+    A FileHandler which, rather than flushing after each record,
+    flushes once FLUSH_RECORDS records have been written or
+    FLUSH_INTERVAL seconds after the first record not yet flushed,
+    even if no further record arrives, and when closed. Records of
+    level WARNING or above and records with one of the FLUSH_CODES are
+    flushed at once.
+    """
+    def __init__(self, filename, mode='a', flush_records=256, flush_interval=1.0):
+        # the pending timed flush, if any
+        self.timer = None
+        super().__init__(filename,mode)
+        self.flush_records = flush_records
+        self.flush_interval = flush_interval
+        self.unflushed = 0
+        self.last_flush = time.monotonic()
+
+    def emit(self, record):
+        try:
+            message = self.format(record)
+            self.stream.write(message + self.terminator)
+        except Exception:
+            self.handleError(record)
+            return
+        self.unflushed = self.unflushed + 1
+        if (record.levelno >= logging.WARNING or
+            message.startswith(_flush_prefixes) or
+            self.unflushed >= self.flush_records or
+            time.monotonic() - self.last_flush >= self.flush_interval):
+            self.flush()
+        elif self.timer is None:
+            self.timer = threading.Timer(self.flush_interval,self.flush)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def flush(self):
+        with self.lock:
+            if self.timer is not None:
+                self.timer.cancel()
+                self.timer = None
+            super().flush()
+            self.unflushed = 0
+            self.last_flush = time.monotonic()
+
+
+def start_logging (logfile,log_level,flush_interval=1.0,jobs=None):
+    """
+    Send log records of level LOG_LEVEL or above to the file LOGFILE
+    (overwritten), written in batches (see BatchingFileHandler). JOBS
+    is the maximum number of worker processes which will log (None
+    indicates one per core). If JOBS is 1, records are written
+    directly by the logging process. Otherwise, records are sent via a
+    queue, shared with worker processes (see WORKER_INIT), and
+    formatted and written by a background thread so that logging does
+    not block the caller. Pending records are written, and the writer,
+    if any, stopped, when the process exits.
+    """
+    global _log_queue
+    root = lg.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    file_handler = BatchingFileHandler(logfile,'w',flush_interval=flush_interval)
+    file_handler.setFormatter(logging.Formatter(json_log_format))
+    root.setLevel(log_level)
+    if jobs == 1:
+        _log_queue = None
+        root.addHandler(file_handler)
+        atexit.register(file_handler.close)
+        return None
+    # a multiprocessing queue also serves worker processes (see
+    # WORKER_INIT)
+    _log_queue = multiprocessing.Queue(-1)
+    listener = logging.handlers.QueueListener(_log_queue,file_handler)
+    root.addHandler(logging.handlers.QueueHandler(_log_queue))
+    listener.start()
+    def stop ():
+        listener.stop()
+        file_handler.close()
+    atexit.register(stop)
+    return listener
+
+def configure_progress (interval=None,percent=None):
+    """
+    Log progress messages (see PROGRESS_DUE) at most every INTERVAL
+    seconds or every PERCENT percent of the work, whichever comes
+    first. None selects the default (PROGRESS_INTERVAL or
+    PROGRESS_PERCENT).
+    """
+    _progress_config['interval'] = PROGRESS_INTERVAL if interval is None else interval
+    _progress_config['percent'] = PROGRESS_PERCENT if percent is None else percent
+
+def progress_due (state,done,total):
+    """
+    Return True if a progress message is due given that DONE of TOTAL
+    units of work are complete. STATE is a dictionary, initially
+    empty, recording the previous progress message.
+    """
+    if not lg.getLogger().isEnabledFor(logging.INFO):
+        return False
+    now = time.monotonic()
+    if ('time' not in state or
+        done >= total or
+        now - state['time'] >= _progress_config['interval'] or
+        (total and 100.0*(done - state['done'])/total >= _progress_config['percent'])):
+        state['time'] = now
+        state['done'] = done
+        return True
+    return False
+
+def worker_config ():
+    """
+    Return the logging configuration of this process as a value
+    suitable as the argument of WORKER_INIT.
+    """
+    return {
+        'queue': _log_queue,
+        'level': lg.getLogger().level,
+        'progress': dict(_progress_config)
+    }
+
+def worker_init (config):
+    """
+    Configure logging in a worker process given CONFIG, the value of
+    WORKER_CONFIG in the parent process: log records are sent to the
+    parent's background writer, if started.
+    """
+    global _log_queue
+    if config is None:
+        return
+    _progress_config.update(config['progress'])
+    if config['queue'] is None:
+        return
+    _log_queue = config['queue']
+    root = lg.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(logging.handlers.QueueHandler(_log_queue))
+    root.setLevel(config['level'])
@@ -1,36 +1,257 @@
+import collections
+import concurrent.futures
+import contextlib
+import hashlib
 import io
+import itertools
+import math
 import os
 import pathlib
 import re
+import struct
 import subprocess
+import threading
+import time
+import uuid
 import PyPDF2
 
 import logging
 
 #import pdfxcb.json1
 import pdfxcb.json1 as json1
+import pdfxcb.jsonlog as jsonlog
 
 
 lg=logging
 
+# pdftoppm's default resolution (DPI)
+PDFTOPPM_RESOLUTION = 150
 
-def pdf_number_of_pages(pdf_file):
+# content stream operators which neither paint nor show anything
+# (paths may be constructed, e.g., for clipping, but not painted)
+IMAGE_ONLY_OPERATORS = {
+    b'q', b'Q', b'cm', b'Do', b'gs', b'w', b'J', b'j', b'M', b'd', b'ri', b'i',
+    b'm', b'l', b'c', b'v', b'y', b'h', b're', b'n', b'W', b'W*',
+    b'CS', b'cs', b'SC', b'SCN', b'sc', b'scn', b'G', b'g', b'RG', b'rg', b'K', b'k',
+    b'BX', b'EX', b'MP', b'DP', b'BMC', b'BDC', b'EMC'
+}
+# minimum fraction of the page covered by the image of an image-only
+# page (see PAGE_IMAGE_ONLY)
+IMAGE_ONLY_COVERAGE = 0.9
+
+# page attributes which a page inherits from its ancestors in the page
+# tree (see PAGE_TREE_PAGE)
+INHERITED_PAGE_ATTRIBUTES = ('/Resources','/MediaBox','/CropBox','/Rotate')
+
+# the number of outputs written by each PDF_SPLIT_STREAMING job
+SPLIT_OUTPUTS_PER_JOB = 16
+
+# the PdfSession of a PDF_SPLIT_STREAMING worker process; reused by
+# subsequent jobs for the same PDF file
+_split_session = None
+
+
+class PdfSession:
     """
-    Determine the number of pages in a PDF document. Return an integer.
+    A PDF document opened and parsed once. The page count, page
+    objects, and page sizes are computed on first use and cached. The
+    functions in this module which accept a PDF file accept either a
+    path or a PdfSession. Close the session with CLOSE or use it as a
+    context manager.
     """
-    pdf_path = pathlib.Path(pdf_file)
-    with open(pdf_path,"rb") as f:
-        reader = PyPDF2.PdfFileReader(f)
-        # getNumPages can fail if the PDF, or an object therein, is
-        # corrupt
+    def __init__(self, pdf_file):
+        self.path = str(pdf_file)
+        self.stream = open(pathlib.Path(pdf_file),"rb")
         try:
-            return reader.getNumPages()
+            self.reader = PyPDF2.PdfFileReader(self.stream)
         except Exception as e:
+            self.stream.close()
             lg.error(json1.json_msg(109,
                                     "Failure to open or parse a PDF file - possible indication of a corrupt PDF",
                                     None,
-                                    file=pdf_file))
+                                    file=self.path))
             raise e
+        self._number_of_pages = None
+        self._page_sizes = None
+        self._page_digests = {}
+        self._page_tree_index = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.close()
+
+    def close(self):
+        """Close the underlying file."""
+        self.stream.close()
+
+    def number_of_pages(self):
+        """Return the number of pages in the document."""
+        if self._number_of_pages is None:
+            # getNumPages can fail if the PDF, or an object therein, is
+            # corrupt
+            try:
+                self._number_of_pages = self.reader.getNumPages()
+            except Exception as e:
+                lg.error(json1.json_msg(109,
+                                        "Failure to open or parse a PDF file - possible indication of a corrupt PDF",
+                                        None,
+                                        file=self.path))
+                raise e
+        return self._number_of_pages
+
+    def page(self, page_number):
+        """
+        Return the PyPDF2 page object for page PAGE_NUMBER (page
+        numbering begins at 1).
+        """
+        return self.reader.getPage(page_number-1)
+
+    def page_digest(self, page_number):
+        """
+        Return a hexadecimal SHA-256 digest of the content of page
+        PAGE_NUMBER: the page dictionary (excluding its parent) and
+        every object it refers to, including content streams and
+        resources such as images.
+        """
+        if page_number not in self._page_digests:
+            digest = hashlib.sha256()
+            pdf_object_digest(self.page(page_number),digest,set())
+            self._page_digests[page_number] = digest.hexdigest()
+        return self._page_digests[page_number]
+
+    def page_tree_index(self):
+        """
+        Return a list with, for each page, a tuple: the reference to
+        the page object and a dictionary of the attributes (see
+        INHERITED_PAGE_ATTRIBUTES) the page inherits from its
+        ancestors in the page tree. The page tree is walked once and
+        the objects resolved in doing so released (see
+        RELEASE_RESOLVED_OBJECTS), so that, unlike PAGE, the page
+        objects are not retained.
+        """
+        if self._page_tree_index is None:
+            index = []
+            root = self.reader.trailer['/Root'].raw_get('/Pages')
+            # (<node reference>,<attributes inherited by the node>)
+            pending = [(root,{})]
+            while pending:
+                reference, inherited = pending.pop()
+                node = reference.getObject()
+                if '/Kids' not in node:
+                    index.append((reference,inherited))
+                    continue
+                inherited = dict(inherited)
+                for name in INHERITED_PAGE_ATTRIBUTES:
+                    if name in node:
+                        inherited[PyPDF2.generic.NameObject(name)] = node.raw_get(name)
+                # in reverse so that pages are popped in order
+                for kid in reversed(node.raw_get('/Kids').getObject()):
+                    pending.append((kid,inherited))
+            release_resolved_objects(self.reader)
+            self._page_tree_index = index
+        return self._page_tree_index
+
+    def page_sizes(self):
+        """See PDF_PAGE_SIZES."""
+        if self._page_sizes is None:
+            page_sizes = []
+            for page_number in range(1,self.number_of_pages()+1):
+                page = self.page(page_number)
+                width = float(page.mediaBox.getWidth())
+                height = float(page.mediaBox.getHeight())
+                rotation = page.get('/Rotate',0)
+                if isinstance(rotation,PyPDF2.generic.IndirectObject):
+                    rotation = rotation.getObject()
+                if int(rotation) % 180:
+                    width, height = height, width
+                page_sizes.append((width,height))
+            self._page_sizes = page_sizes
+        return self._page_sizes
+
+def pdf_object_digest(obj, digest, visited):
+    """
+    Update DIGEST, a hashlib object, with the PyPDF2 object OBJ and
+    the objects to which it refers. VISITED is the set of (object
+    number, generation) pairs of indirect objects already included.
+    """
+    if isinstance(obj,PyPDF2.generic.IndirectObject):
+        reference = (obj.idnum,obj.generation)
+        if reference in visited:
+            digest.update(b'R')
+            return
+        visited.add(reference)
+        obj = obj.getObject()
+    if isinstance(obj,dict):
+        digest.update(b'<<')
+        for key in sorted(obj.keys()):
+            if key == '/Parent':
+                continue
+            digest.update(str(key).encode('utf-8'))
+            # dict.__getitem__ avoids PyPDF2 resolving indirect objects
+            pdf_object_digest(dict.__getitem__(obj,key),digest,visited)
+        digest.update(b'>>')
+        if isinstance(obj,PyPDF2.generic.StreamObject):
+            digest.update(obj._data)
+    elif isinstance(obj,list):
+        digest.update(b'[')
+        for member in obj:
+            pdf_object_digest(member,digest,visited)
+        digest.update(b']')
+    else:
+        digest.update(repr(obj).encode('utf-8'))
+
+@contextlib.contextmanager
+def pdf_session(pdf_file):
+    """
+    Context manager providing a PdfSession for PDF_FILE, either a path
+    or a PdfSession. A session created here is closed on exit; a
+    session passed in is left open.
+    """
+    if isinstance(pdf_file,PdfSession):
+        yield pdf_file
+    else:
+        with PdfSession(pdf_file) as session:
+            yield session
+
+def pdf_path(pdf_file):
+    """
+    Return the path, as a string, of PDF_FILE, either a path or a
+    PdfSession.
+    """
+    if isinstance(pdf_file,PdfSession):
+        return pdf_file.path
+    return str(pdf_file)
+
+def pdf_number_of_pages(pdf_file):
+    """
+    Determine the number of pages in a PDF document. Return an integer.
+    """
+    with pdf_session(pdf_file) as session:
+        return session.number_of_pages()
+
+def pdf_page_count(pdf_file):
+    """
+    Return the number of pages in the PDF document PDF_FILE as recorded
+    by the root of its page tree. Unlike PDF_NUMBER_OF_PAGES, the page
+    objects are not loaded.
+    """
+    with pdf_session(pdf_file) as session:
+        try:
+            return int(session.reader.trailer['/Root']['/Pages']['/Count'])
+        except Exception:
+            return session.number_of_pages()
+
+def pdf_page_sizes(pdf_file):
+    """
+    Return a list of (<width>,<height>) tuples, one for each page of
+    the PDF document PDF_FILE, describing the size of the page media
+    box in points as the page is displayed (i.e., after applying the
+    page's /Rotate value).
+    """
+    with pdf_session(pdf_file) as session:
+        return session.page_sizes()
 
 def pdf_page_to_png(src_pdf, pagenum = 0, resolution = 72):
     """
@@ -50,21 +271,78 @@ def pdf_page_to_png(src_pdf, pagenum = 0, resolution = 72):
     img.convert("png")
     return img
 
-def pdf_split(input_pdf_file,output_files,page_ranges):
+def pdf_split(input_pdf_file,output_files,page_ranges,jobs=None,
+              written=None):
     """
     INPUT_PDF_FILE is a string representing the path to a PDF file.
     OUTPUT_FILES is a list of strings representing paths to output
     files corresponding to the specified page ranges. PAGE_RANGES is
     an array of tuples where each tuple specifies the first page and
-    the last page of a given set of pages.
+    the last page of a given set of pages. INPUT_PDF_FILE may instead
+    be a PdfSession. The input is parsed once and shared by up to JOBS
+    (None indicates one per core) threads: each output is built from
+    it in turn, and only the writing of the files (e.g., to a network
+    file system) overlaps (see PDF_SPLIT_OUTPUT). Return a list of dictionaries, one per output
+    file, with the file name (file), the number of bytes written
+    (bytes), and the durations, in seconds, of building
+    (build_seconds) and writing (write_seconds) the file. If WRITTEN
+    is specified, it is called with each such dictionary as soon as
+    the output file is written.
+    """
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    with pdf_session(input_pdf_file) as session:
+        reader_lock = threading.Lock()
+        def split_output (output):
+            output = pdf_split_output(session.reader,reader_lock,*output)
+            if written:
+                written(output)
+            return output
+        with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+            return list(executor.map(split_output,zip(output_files,page_ranges)))
+
+def pdf_split_output(reader,reader_lock,output_file,page_range):
+    """
+    Write the pages of the document read by the PyPDF2 reader READER
+    specified by PAGE_RANGE (see PDF_SPLIT_INTERNAL) to the file
+    OUTPUT_FILE (see ATOMIC_OUTPUT). Since READER reads from a single
+    stream, the output is built in memory while holding the lock
+    READER_LOCK; the file itself is written without it. Return a
+    dictionary describing the output file (see PDF_SPLIT).
     """
-    reader = PyPDF2.PdfFileReader(input_pdf_file)
-    for output_file, page_range in zip(output_files,page_ranges):
+    with reader_lock:
+        build_start = time.perf_counter()
         writer = PyPDF2.PdfFileWriter()
         pdf_split_internal(reader,writer,page_range)
-        output_file = open(output_file,"wb")
-        writer.write(output_file)
-        output_file.close()
+        content = io.BytesIO()
+        writer.write(content)
+    write_start = time.perf_counter()
+    with atomic_output(output_file) as stream:
+        stream.write(content.getvalue())
+    return {'file': output_file,
+            'bytes': content.tell(),
+            'build_seconds': write_start - build_start,
+            'write_seconds': time.perf_counter() - write_start}
+
+@contextlib.contextmanager
+def atomic_output(output_file):
+    """
+    Context manager providing a binary file object to which the
+    content of the file OUTPUT_FILE is written. The content is written
+    to a temporary file in the same directory which, on exit, is
+    renamed to OUTPUT_FILE or, if an exception was raised, removed. A
+    partially written OUTPUT_FILE is thus never visible.
+    """
+    directory, file_name = os.path.split(os.path.abspath(output_file))
+    temp_file = os.path.join(directory,'.{}.{}.tmp'.format(file_name,uuid.uuid4().hex))
+    try:
+        with open(temp_file,"xb") as stream:
+            yield stream
+        os.replace(temp_file,output_file)
+    except BaseException:
+        if os.path.exists(temp_file):
+            os.remove(temp_file)
+        raise
 
 def pdf_split_internal (pdf_file_reader,pdf_file_writer,page_range):
     """
@@ -79,13 +357,203 @@ def pdf_split_internal (pdf_file_reader,pdf_file_writer,page_range):
     for page_index in pages:
         pdf_file_writer.addPage(pdf_file_reader.getPage(page_index))
 
-def pdf_to_pngs(pdf_file,output_dir):
+def pdf_split_streaming(pdf_file,output_files,page_ranges,jobs=None,
+                        outputs_per_job=SPLIT_OUTPUTS_PER_JOB):
+    """
+    Like PDF_SPLIT but in memory bounded by the size of the largest
+    output rather than by the size of PDF_FILE: pages are located via
+    the page tree (see PAGE_TREE_PAGE) and the objects resolved while
+    writing an output are released once it is written. OUTPUT_FILES
+    and PAGE_RANGES may be iterators; they are consumed
+    OUTPUTS_PER_JOB outputs at a time. Outputs are written by up to
+    JOBS (None indicates one per core) worker processes, each with its
+    own reader, with no more than two jobs per worker pending. If JOBS
+    is 1, outputs are written by this process. Return multiple values:
+    a list of the number of bytes written to each output file and the
+    peak resident set size (see PEAK_RSS) of the process(es) which
+    wrote them.
+    """
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    outputs = zip(output_files,page_ranges)
+    split_jobs = iter(lambda: list(itertools.islice(outputs,outputs_per_job)),[])
+    bytes_written = []
+    if jobs == 1:
+        with pdf_session(pdf_file) as session:
+            for split_job in split_jobs:
+                for output_file, page_range in split_job:
+                    bytes_written.append(
+                        pdf_split_page_tree(session,output_file,page_range))
+        return bytes_written, peak_rss()
+    pdf_file = pdf_path(pdf_file)
+    peak_worker_rss = None
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=jobs,
+            initializer=jsonlog.worker_init,
+            initargs=(jsonlog.worker_config(),)) as executor:
+        pending = collections.deque()
+        for split_job in itertools.islice(split_jobs,2*jobs):
+            pending.append(executor.submit(pdf_split_job,pdf_file,split_job))
+        while pending:
+            future = pending.popleft()
+            next_split_job = next(split_jobs,None)
+            if next_split_job:
+                pending.append(executor.submit(pdf_split_job,pdf_file,next_split_job))
+            job_bytes_written, worker_rss = future.result()
+            bytes_written.extend(job_bytes_written)
+            if worker_rss is not None:
+                peak_worker_rss = max(peak_worker_rss or 0,worker_rss)
+    return bytes_written, peak_worker_rss
+
+def pdf_split_job(pdf_file,outputs):
+    """
+    Write OUTPUTS, a list of (<output file>,<page range>) tuples, of
+    the PDF file PDF_FILE (a path) in a PDF_SPLIT_STREAMING worker
+    process. Return multiple values: a list of the number of bytes
+    written to each output file and the peak resident set size of the
+    worker process.
+    """
+    global _split_session
+    if _split_session is None or _split_session.path != pdf_file:
+        if _split_session is not None:
+            _split_session.close()
+        _split_session = PdfSession(pdf_file)
+    bytes_written = [pdf_split_page_tree(_split_session,output_file,page_range)
+                     for output_file, page_range in outputs]
+    return bytes_written, peak_rss()
+
+def pdf_split_page_tree(session,output_file,page_range):
+    """
+    Write the pages of the document of the PdfSession SESSION
+    specified by PAGE_RANGE (see PDF_SPLIT_INTERNAL) to the file
+    OUTPUT_FILE (see ATOMIC_OUTPUT). Release the objects resolved in
+    doing so (see RELEASE_RESOLVED_OBJECTS). Return the number of
+    bytes written.
+    """
+    writer = PyPDF2.PdfFileWriter()
+    for page_number in range(page_range[0],page_range[1]+1):
+        writer.addPage(page_tree_page(session,page_number))
+    with atomic_output(output_file) as stream:
+        writer.write(stream)
+        bytes_written = stream.tell()
+    release_resolved_objects(session.reader)
+    return bytes_written
+
+def page_tree_page(session,page_number):
+    """
+    Return a new PyPDF2 page object for page PAGE_NUMBER (page
+    numbering begins at 1) of the document of the PdfSession SESSION.
+    Rather than loading every page object (cf. PdfSession.page), look
+    up the page in the page tree index (see
+    PdfSession.page_tree_index) and copy the attributes the page
+    inherits from its ancestors into the page object, unless the page
+    defines them. The page object is not retained by SESSION.
+    """
+    reference, inherited = session.page_tree_index()[page_number-1]
+    page = PyPDF2.pdf.PageObject(session.reader,reference)
+    for key, value in inherited.items():
+        # copied since the writer replaces references in place
+        page[key] = detached_copy(value)
+    for key, value in reference.getObject().items():
+        page[key] = value
+    return page
+
+def detached_copy(obj):
+    """
+    Return a copy of the PyPDF2 object OBJ in which direct
+    dictionaries and arrays are copied; references to indirect
+    objects and other values are shared.
+    """
+    if isinstance(obj,PyPDF2.generic.DictionaryObject):
+        copy = PyPDF2.generic.DictionaryObject()
+        for key, value in obj.items():
+            copy[key] = detached_copy(value)
+        return copy
+    if isinstance(obj,PyPDF2.generic.ArrayObject):
+        return PyPDF2.generic.ArrayObject(detached_copy(value) for value in obj)
+    return obj
+
+def release_resolved_objects(reader):
+    """
+    Discard the objects which the PyPDF2 reader READER has resolved
+    and cached (e.g., the page objects, content streams, and images of
+    pages already written) so that they may be garbage collected.
+    Objects are resolved anew when next accessed.
+    """
+    reader.resolvedObjects.clear()
+
+def peak_rss():
+    """
+    Return the peak resident set size of this process in kilobytes
+    (as reported by getrusage on Linux) or None if it cannot be
+    determined.
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def pdf_to_images(pdf_file,number_of_pages,jobs=None,chunk_size=8,
+                  region=None,resolution=None,page_numbers=None):
+    """
+    Rasterize each page of the PDF file PDF_FILE without writing any
+    image files. Yield tuples of the form (<image>,<page number>),
+    ordered by page number, where <image> is a grayscale PIL image and
+    page numbering begins at one.
+
+    Pages are rendered in chunks of CHUNK_SIZE pages, each chunk by a
+    single pdftoppm process writing PGM data to a pipe. Up to JOBS
+    chunks (None indicates one per core) are rendered ahead of the
+    consumer, bounding the number of page images held in memory.
+
+    If REGION is a list [x1,y1,x2,y2] (see barScan.barcodeScan), only
+    that region of each page is rendered. RESOLUTION is the rendering
+    resolution in DPI. If PAGE_NUMBERS, an ascending list of page
+    numbers, is specified, only those pages are rendered.
+    """
+    pdf_file_path = pdf_path(pdf_file)
+    def render_chunk (page_range,crop):
+        return pdftoppm_page_range_images(pdf_file_path,page_range,crop,resolution)
+    return pdftoppm_render_ahead(pdf_file,number_of_pages,render_chunk,
+                                 jobs,chunk_size,region,resolution,page_numbers)
+
+def pdf_to_pngs_iter(pdf_file,output_dir,number_of_pages,jobs=None,chunk_size=8,
+                     region=None,resolution=None,page_numbers=None):
+    """
+    Like PDF_TO_PNGS but return an iterator yielding (<file
+    name>,<page number>) tuples, ordered by page number, as pages are
+    rendered. Pages are rendered in chunks of CHUNK_SIZE pages, up to
+    JOBS chunks ahead of the consumer, bounding the number of PNG files
+    present at any time to those the consumer has not yet removed plus
+    JOBS*CHUNK_SIZE.
+    """
+    pdf_file_path = pdf_path(pdf_file)
+    input_file_sans_suffix, input_file_suffix = os.path.splitext(pdf_file_path)
+    maybe_dir, outfile_root = os.path.split(input_file_sans_suffix)
+    output_dir_and_filename = os.path.join(output_dir,outfile_root)
+    def render_chunk (page_range,crop):
+        returncode = pdftoppm_page_range(pdf_file_path,output_dir_and_filename,
+                                         page_range,crop,resolution)
+        return returncode, [pdftoppm_png_file_name(outfile_root,page_number,number_of_pages)
+                            for page_number in range(page_range[0],page_range[1]+1)]
+    return pdftoppm_render_ahead(pdf_file,number_of_pages,render_chunk,
+                                 jobs,chunk_size,region,resolution,page_numbers)
+
+def pdf_to_pngs(pdf_file,output_dir,jobs=None,region=None,resolution=None,
+                page_numbers=None):
     """
     Generate PNG files, one corresponding to each page of the PDF file
     PDF_FILE. Write files to directory specified by OUTPUT_DIR. Return
-    a list of the PNG file names.
+    a list of the PNG file names. JOBS is the maximum number of
+    concurrent rasterization processes (None indicates one per core).
+    If REGION is a list [x1,y1,x2,y2] (see barScan.barcodeScan), only
+    that region of each page is rendered. RESOLUTION is the rendering
+    resolution in DPI. PDF_FILE may be a path or a PdfSession. If
+    PAGE_NUMBERS, an ascending list of page numbers, is specified, only
+    those pages are rendered (and returned).
     """
-    input_file_sans_suffix, input_file_suffix = os.path.splitext(pdf_file)
+    input_file_sans_suffix, input_file_suffix = os.path.splitext(pdf_path(pdf_file))
     maybe_dir, input_file_name_only = os.path.split(input_file_sans_suffix)
     number_of_pages = None
     outfile_root = input_file_name_only
@@ -94,7 +562,11 @@ def pdf_to_pngs(pdf_file,output_dir):
     return pdf_to_pngs__pdftoppm(pdf_file,
                                  number_of_pages,
                                  outfile_root,
-                                 output_dir)
+                                 output_dir,
+                                 jobs,
+                                 region,
+                                 resolution,
+                                 page_numbers)
 
 def pdf_to_pngs__gs (pdf_file, number_of_pages, outfile_root, output_dir):
     """
@@ -144,53 +616,287 @@ def pdf_to_pngs__gs_file_names (number_of_pages,outfile_root):
         png_files.append(png_infile)
     return png_files
 
-def pdf_to_pngs__pdftoppm (pdf_file, number_of_pages, outfile_root, output_dir):
+def pdf_to_pngs__pdftoppm (pdf_file, number_of_pages, outfile_root, output_dir,
+                           jobs=None, region=None, resolution=None,
+                           page_numbers=None):
     """
     Helper relying on pdftoppm. OUTFILE_ROOT is the filename only (no
     directory information). Return a list where each member has the
     form (<file name>,<page number>) with page numbering beginning at
     one.
+
+    The document is rendered in contiguous page-range chunks, one
+    pdftoppm process per chunk, with up to JOBS chunks rendered
+    concurrently. If JOBS is None, use the number of available cores.
+    If REGION is specified, only that region of each page is rendered.
+    If PAGE_NUMBERS is specified, only those pages are rendered.
     """
     output_dir_and_filename = os.path.join(output_dir,outfile_root)
-    # Q: what is the point of calling pdftoppm repeatedly on each page, one at a time? doesn't this generate the exact same set of files as calling it just once w/o the -f and -l options?
-    for page_number in range(number_of_pages):
-        returncode = subprocess.call(
-            ["pdftoppm", "-f", str(page_number+1),
-             "-l", str(page_number+1),
-             "-gray",
-             "-png",
-             pdf_file,
-             output_dir_and_filename],
-            shell=False)
-        if (returncode == 0):
-            lg.info(json1.json_completed_pdf_to_ppm(page_number,number_of_pages))
-        else:
-            lg.error(json1.json_failed_to_convert_pdf(None,pdf_file))
+    if page_numbers is None:
+        page_numbers = range(1,number_of_pages+1)
+        page_ranges = pdftoppm_page_ranges(number_of_pages,jobs)
+    else:
+        page_ranges = contiguous_page_ranges(
+            page_numbers,
+            max(1,math.ceil(len(page_numbers)/(jobs or os.cpu_count() or 1))))
+    render_jobs = pdftoppm_render_jobs(pdf_file,page_ranges,region,resolution)
+    pdf_file = pdf_path(pdf_file)
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max(1,min(len(page_ranges),jobs or os.cpu_count() or 1))) as executor:
+        futures = {}
+        for page_range, crop in render_jobs:
+            future = executor.submit(pdftoppm_page_range,
+                                     pdf_file,
+                                     output_dir_and_filename,
+                                     page_range,
+                                     crop,
+                                     resolution)
+            futures[future] = page_range
+        progress = {}
+        pages_done = 0
+        for future in concurrent.futures.as_completed(futures):
+            page_range = futures[future]
+            if (future.result() == 0):
+                pages_done = pages_done + page_range[1] - page_range[0] + 1
+                if jsonlog.progress_due(progress,pages_done,len(page_numbers)):
+                    lg.info(json1.json_completed_pdf_to_ppm(page_range[1],number_of_pages))
+            else:
+                lg.error(json1.json_failed_to_convert_pdf(None,pdf_file))
     # Return an array where each member has the form
     # (<file name>,<page number>)
-    return_value = []
+    return [(pdftoppm_png_file_name(outfile_root,page_number,number_of_pages),
+             page_number)
+            for page_number in page_numbers]
+
+def pdftoppm_arguments (page_range, crop, resolution):
+    """
+    Return the pdftoppm arguments selecting the pages specified by
+    PAGE_RANGE, the crop rectangle CROP (see PDFTOPPM_RENDER_JOBS),
+    and the resolution RESOLUTION.
+    """
+    arguments = ["-f", str(page_range[0]),
+                 "-l", str(page_range[1]),
+                 "-gray"]
+    if resolution:
+        arguments = arguments + ["-r", str(resolution)]
+    if crop:
+        arguments = arguments + ["-x", str(crop[0]),
+                                 "-y", str(crop[1]),
+                                 "-W", str(crop[2]),
+                                 "-H", str(crop[3])]
+    return arguments
+
+def pdftoppm_crop (page_size, region, resolution):
+    """
+    Return the pdftoppm crop rectangle, a tuple (x,y,width,height) in
+    pixels, corresponding to REGION (see barScan.barcodeScan) on a page
+    of size PAGE_SIZE (points) rendered at RESOLUTION DPI.
+    """
+    width = page_size[0]*resolution/72.0
+    height = page_size[1]*resolution/72.0
+    x_min = int(width*min(region[0],region[2]))
+    x_max = int(width*max(region[0],region[2]))
+    y_min = int(height*min(region[1],region[3]))
+    y_max = int(height*max(region[1],region[3]))
+    return (x_min,y_min,max(1,x_max-x_min),max(1,y_max-y_min))
+
+def pdftoppm_page_range (pdf_file, output_dir_and_filename, page_range,
+                         crop=None, resolution=None):
+    """
+    Render the pages specified by PAGE_RANGE, a tuple specifying the
+    first and last page (inclusive), with a single pdftoppm
+    process. Return the pdftoppm return code.
+    """
+    return subprocess.call(
+        ["pdftoppm"] +
+        pdftoppm_arguments(page_range,crop,resolution) +
+        ["-png",
+         pdf_file,
+         output_dir_and_filename],
+        shell=False)
+
+def contiguous_page_ranges (page_numbers, max_length):
+    """
+    Divide the ascending sequence of page numbers PAGE_NUMBERS into
+    ranges of consecutive pages, each with at most MAX_LENGTH
+    pages. Return a list of (<first page>,<last page>) tuples.
+    """
+    page_ranges = []
+    for page_number in page_numbers:
+        if (page_ranges and
+            page_ranges[-1][1] == page_number-1 and
+            page_ranges[-1][1]-page_ranges[-1][0]+1 < max_length):
+            page_ranges[-1] = (page_ranges[-1][0],page_number)
+        else:
+            page_ranges.append((page_number,page_number))
+    return page_ranges
+
+def pdftoppm_page_ranges (number_of_pages, jobs):
+    """
+    Divide pages 1 through NUMBER_OF_PAGES into at most JOBS
+    contiguous page ranges of similar length. Return a list of
+    (<first page>,<last page>) tuples.
+    """
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    number_of_chunks = max(1,min(jobs,number_of_pages))
+    chunk_size, remainder = divmod(number_of_pages,number_of_chunks)
+    page_ranges = []
+    first_page = 1
+    for chunk_index in range(number_of_chunks):
+        last_page = first_page + chunk_size - 1
+        if chunk_index < remainder:
+            last_page = last_page + 1
+        if last_page >= first_page:
+            page_ranges.append((first_page,last_page))
+        first_page = last_page + 1
+    return page_ranges
+
+def pdftoppm_render_ahead (pdf_file, number_of_pages, render_chunk,
+                           jobs, chunk_size, region, resolution,
+                           page_numbers=None):
+    """
+    Yield (<item>,<page number>) tuples, ordered by page number, for
+    each page of the PDF file PDF_FILE. RENDER_CHUNK is a function
+    accepting a page range and a crop rectangle (see
+    PDFTOPPM_RENDER_JOBS) and returning multiple values: the pdftoppm
+    return code and a list of items, one per page. Chunks of CHUNK_SIZE
+    pages are rendered by up to JOBS (None indicates one per core)
+    threads, ahead of the consumer by no more than JOBS chunks. If
+    PAGE_NUMBERS, an ascending list of page numbers, is specified, only
+    those pages are rendered.
+    """
+    if not jobs:
+        jobs = os.cpu_count() or 1
+    if page_numbers is None:
+        page_numbers = range(1,number_of_pages+1)
+    page_ranges = contiguous_page_ranges(page_numbers,chunk_size)
+    render_jobs = pdftoppm_render_jobs(pdf_file,page_ranges,region,resolution)
+    pdf_file = pdf_path(pdf_file)
+    progress = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=jobs) as executor:
+        pending = collections.deque()
+        render_jobs_iter = iter(render_jobs)
+        for page_range, crop in itertools.islice(render_jobs_iter,jobs):
+            pending.append((page_range,
+                            executor.submit(render_chunk,page_range,crop)))
+        while pending:
+            page_range, future = pending.popleft()
+            next_render_job = next(render_jobs_iter,None)
+            if next_render_job:
+                next_page_range, next_crop = next_render_job
+                pending.append((next_page_range,
+                                executor.submit(render_chunk,next_page_range,next_crop)))
+            returncode, items = future.result()
+            if (returncode == 0):
+                if jsonlog.progress_due(progress,page_range[1],number_of_pages):
+                    lg.info(json1.json_completed_pdf_to_ppm(page_range[1],number_of_pages))
+            else:
+                lg.error(json1.json_failed_to_convert_pdf(None,pdf_file))
+            for item, page_number in zip(items,range(page_range[0],page_range[1]+1)):
+                yield item, page_number
+
+def pdftoppm_render_jobs (pdf_file, page_ranges, region, resolution):
+    """
+    Return a list of (<page range>,<crop>) tuples describing the
+    pdftoppm invocations needed to render the pages in PAGE_RANGES.
+    If REGION is not a list, CROP is None and PAGE_RANGES is used as
+    is. Otherwise, since pdftoppm accepts a single crop rectangle per
+    invocation, page ranges are further divided wherever the page size
+    changes and CROP is the pixel rectangle corresponding to REGION on
+    those pages.
+    """
+    if not isinstance(region,list):
+        return [(page_range,None) for page_range in page_ranges]
+    if not resolution:
+        resolution = PDFTOPPM_RESOLUTION
+    page_sizes = pdf_page_sizes(pdf_file)
+    render_jobs = []
+    for page_range in page_ranges:
+        first_page = page_range[0]
+        crop = pdftoppm_crop(page_sizes[first_page-1],region,resolution)
+        for page_number in range(page_range[0]+1,page_range[1]+1):
+            page_crop = pdftoppm_crop(page_sizes[page_number-1],region,resolution)
+            if page_crop != crop:
+                render_jobs.append(((first_page,page_number-1),crop))
+                first_page = page_number
+                crop = page_crop
+        render_jobs.append(((first_page,page_range[1]),crop))
+    return render_jobs
+
+def pdftoppm_png_file_name (outfile_root, page_number, number_of_pages):
+    """
+    Return the name of the file pdftoppm writes for page PAGE_NUMBER
+    of a document with NUMBER_OF_PAGES pages.
+    """
     # Due to the inability to configure the output file name format
-    # for pdftoppm, plan ahead for the file names, anticipating
-    # pdftoppm's default non-configurable behavior.
-    index_format_string = ""
-    if ( number_of_pages < 10 ):
-        index_format_string = "{1:d}"
-    elif ( number_of_pages < 100 ):
-        index_format_string = "{1:0>02d}"
-    elif ( number_of_pages < 1000 ):
-        index_format_string = "{1:0>03d}"
-    else:
-        raise Exception('no support (at this point) for page count exceeding 1000 pages')
+    # for pdftoppm, anticipate pdftoppm's default non-configurable
+    # behavior: the page number is zero-padded to the number of digits
+    # in the page count of the document (regardless of -f and -l).
+    index_format_string = "{1:0>0" + str(len(str(number_of_pages))) + "d}"
     string_format_string = "{0}-" + index_format_string + ".png"
-    for pagenumber in range(number_of_pages):
-        png_file = str.format(
-            string_format_string,
-            outfile_root, # output_dir_and_filename
-            pagenumber+1);
-        return_value.append((png_file,
-                             pagenumber+1
-                             ))
-    return return_value
+    return str.format(string_format_string,outfile_root,page_number)
+
+def pdftoppm_page_range_images (pdf_file, page_range, crop=None, resolution=None):
+    """
+    Render the pages specified by PAGE_RANGE, a tuple specifying the
+    first and last page (inclusive), with a single pdftoppm process
+    writing to a pipe. Return multiple values: the pdftoppm return code
+    and a list of grayscale PIL images, one per page.
+    """
+    # PIL is only needed when rasterizing to memory
+    from PIL import Image
+    process = subprocess.Popen(
+        ["pdftoppm"] +
+        pdftoppm_arguments(page_range,crop,resolution) +
+        [pdf_file],
+        shell=False,
+        stdout=subprocess.PIPE)
+    images = []
+    while True:
+        pgm = read_pgm(process.stdout)
+        if not pgm:
+            break
+        width, height, data = pgm
+        images.append(Image.frombytes('L',(width,height),data))
+    returncode = process.wait()
+    return returncode, images
+
+def read_pgm (stream):
+    """
+    Read a single binary (P5) PGM image from the file object
+    STREAM. Return None at the end of STREAM. Otherwise, return
+    multiple values: the width, the height, and the 8-bit pixel data
+    as bytes.
+    """
+    magic = stream.read(2)
+    if not magic:
+        return None
+    if magic != b'P5':
+        raise Exception('unexpected data in PGM stream: {}'.format(magic))
+    # width, height, and maximum gray value are whitespace-separated
+    # ASCII integers, possibly interspersed with comments
+    fields = []
+    field = b''
+    while len(fields) < 3:
+        char = stream.read(1)
+        if not char:
+            raise Exception('truncated PGM header')
+        if char == b'#':
+            stream.readline()
+        elif char.isspace():
+            if field:
+                fields.append(int(field))
+                field = b''
+        else:
+            field = field + char
+    width, height, maxval = fields
+    if maxval > 255:
+        raise Exception('no support for 16-bit PGM data')
+    data = stream.read(width*height)
+    if len(data) != width*height:
+        raise Exception('truncated PGM data')
+    return width, height, data
 
 def pdfimages(pdf_file,output_dir):
     """
@@ -202,6 +908,7 @@ def pdfimages(pdf_file,output_dir):
     of the file and page-number represents the page number in the
     corresponding PDF file. Page numbering begins at 1.
     """
+    pdf_file = pdf_path(pdf_file)
     input_file_sans_suffix, input_file_suffix = os.path.splitext(pdf_file)
     maybe_dir, input_file_name_only = os.path.split(input_file_sans_suffix)
     outfile_root = input_file_name_only
@@ -230,3 +937,329 @@ def pdfimages(pdf_file,output_dir):
                 )
             )
     return png_file_page_number_tuples
+
+def pdf_image_xobjects(pdf_file):
+    """
+    Return a list of (<image>, <page number>) tuples, one for each
+    image XObject drawn, directly or via form XObjects, by a page of
+    the PDF document PDF_FILE (a path or a PdfSession), in page
+    order. Each image is a PyPDF2 stream object. Page numbering begins
+    at 1.
+    """
+    with pdf_session(pdf_file) as session:
+        image_xobjects = []
+        for page_number in range(1,session.number_of_pages()+1):
+            for image in page_image_xobjects(session.page(page_number)):
+                image_xobjects.append((image,page_number))
+        return image_xobjects
+
+def page_image_xobjects(page):
+    """
+    Yield the image XObjects in the resources of the PyPDF2 page (or
+    form XObject) PAGE and in the resources of the form XObjects it
+    refers to. An image used more than once is yielded once.
+    """
+    visited = set()
+    def walk (resources):
+        if resources is None:
+            return
+        xobjects = resources.getObject().get('/XObject')
+        if xobjects is None:
+            return
+        xobjects = xobjects.getObject()
+        for name in sorted(xobjects.keys()):
+            reference = xobjects.raw_get(name)
+            if isinstance(reference,PyPDF2.generic.IndirectObject):
+                if (reference.idnum,reference.generation) in visited:
+                    continue
+                visited.add((reference.idnum,reference.generation))
+            xobject = reference.getObject()
+            subtype = xobject.get('/Subtype')
+            if subtype == '/Image':
+                yield xobject
+            elif subtype == '/Form':
+                yield from walk(xobject.get('/Resources'))
+    yield from walk(page_resources(page))
+
+def page_image_only(page):
+    """
+    Determine whether the PyPDF2 page PAGE is drawn solely by a single
+    image XObject covering (most of) the page, as is typical of
+    scanner output: no text, no painted paths, no inline images, and
+    no other XObjects. If so, return multiple values: the image XObject
+    and the counterclockwise rotation, a multiple of 90 degrees,
+    which displays the image as the page is displayed. Otherwise,
+    return None.
+    """
+    content = page.getContents()
+    if content is None:
+        return None
+    resources = page_resources(page)
+    xobjects = resources.getObject().get('/XObject') if resources is not None else None
+    xobjects = xobjects.getObject() if xobjects is not None else {}
+    content = PyPDF2.pdf.ContentStream(content,page.pdf)
+    ctm = (1,0,0,1,0,0)
+    ctm_stack = []
+    image = None
+    for operands, operator in content.operations:
+        if operator == b'q':
+            ctm_stack.append(ctm)
+        elif operator == b'Q':
+            if ctm_stack:
+                ctm = ctm_stack.pop()
+        elif operator == b'cm':
+            ctm = matrix_multiply([float(operand) for operand in operands],ctm)
+        elif operator == b'Do':
+            xobject = xobjects.get(operands[0])
+            if (image is not None or xobject is None or
+                xobject.getObject().get('/Subtype') != '/Image'):
+                return None
+            image = xobject.getObject()
+            image_ctm = ctm
+        elif operator not in IMAGE_ONLY_OPERATORS:
+            return None
+    if image is None:
+        return None
+    a, b, c, d, e, f = image_ctm
+    # a mirrored image is left to the rasterizer
+    if a*d - b*c <= 0:
+        return None
+    # the image's unit square in user space
+    corners = [(a*u + c*v + e, b*u + d*v + f) for u, v in [(0,0),(1,0),(0,1),(1,1)]]
+    xs = [x for x, y in corners]
+    ys = [y for x, y in corners]
+    box = page.mediaBox
+    left, bottom = float(box.getLowerLeft_x()), float(box.getLowerLeft_y())
+    right, top = float(box.getUpperRight_x()), float(box.getUpperRight_y())
+    overlap = (max(0,min(max(xs),right)-max(min(xs),left)) *
+               max(0,min(max(ys),top)-max(min(ys),bottom)))
+    if overlap < IMAGE_ONLY_COVERAGE*(right-left)*(top-bottom):
+        return None
+    page_rotation = page.get('/Rotate',0)
+    if isinstance(page_rotation,PyPDF2.generic.IndirectObject):
+        page_rotation = page_rotation.getObject()
+    # the page is displayed rotated clockwise by /Rotate
+    rotation = 90*round(math.degrees(math.atan2(b,a))/90) - int(page_rotation)
+    return image, rotation % 360
+
+def matrix_multiply(m1,m2):
+    """
+    Return the product of the PDF transformation matrices M1 and M2,
+    each a sequence of six numbers [a b c d e f].
+    """
+    a1, b1, c1, d1, e1, f1 = m1
+    a2, b2, c2, d2, e2, f2 = m2
+    return (a1*a2 + b1*c2, a1*b2 + b1*d2,
+            c1*a2 + d1*c2, c1*b2 + d1*d2,
+            e1*a2 + f1*c2 + e2, e1*b2 + f1*d2 + f2)
+
+def page_resources(page):
+    """
+    Return the resource dictionary of the PyPDF2 page PAGE, which may
+    be inherited from an ancestor in the page tree, or None.
+    """
+    node = page
+    while node is not None:
+        node = node.getObject()
+        if '/Resources' in node:
+            return node['/Resources']
+        node = node.get('/Parent')
+    return None
+
+def pdf_images(pdf_file,image_xobjects,draft_scale=None,resolution=None,
+               region=None,rotations=None):
+    """
+    Decode, in process, the members of IMAGE_XOBJECTS, a sequence of
+    (<image>, <page number>) tuples as returned by PDF_IMAGE_XOBJECTS
+    for the PDF document PDF_FILE (a path or a PdfSession). Yield,
+    lazily and in order, a tuple for each member of IMAGE_XOBJECTS: a
+    grayscale or bilevel PIL image and the page number.
+
+    DCT (JPEG) images are decoded in draft mode, directly to grayscale
+    and, if DRAFT_SCALE (0 to 1.0) is specified, downscaled by the
+    JPEG decoder to no less than DRAFT_SCALE times their size. Flate
+    and CCITT images are decoded to their native resolution. An image
+    which cannot be decoded (e.g., an unsupported filter or color
+    space) is replaced by the page rendered at RESOLUTION by pdftoppm.
+
+    If REGION is specified, each image is assumed to cover its page
+    and is cropped to REGION (see pdfxcb.pdfxcb). ROTATIONS, if
+    specified, maps page numbers to the counterclockwise rotation, in
+    degrees, which displays the image as the page is displayed (see
+    PAGE_IMAGE_ONLY); images are rotated prior to cropping.
+    """
+    pdf_file_path = pdf_path(pdf_file)
+    for image_xobject, page_number in image_xobjects:
+        try:
+            image = decode_image_xobject(image_xobject,draft_scale)
+        except Exception as e:
+            lg.debug(str(e))
+            image = None
+        if image is None:
+            lg.debug(json1.json_progress(
+                f'rasterizing page {page_number} in place of an undecodable image'))
+            crop = None
+            if region:
+                crop = pdftoppm_crop(pdf_page_sizes(pdf_file)[page_number-1],region,resolution)
+            returncode, images = pdftoppm_page_range_images(
+                pdf_file_path,(page_number,page_number),crop,resolution)
+            if returncode != 0 or not images:
+                raise Exception(f'pdftoppm failed to render page {page_number}')
+            yield images[0], page_number
+            continue
+        rotation = (rotations or {}).get(page_number,0)
+        if rotation:
+            image = image.rotate(rotation,expand=True)
+        if region:
+            # as for PDFTOPPM_CROP, the corners may be given in any order
+            width, height = image.size
+            x_min = int(width*min(region[0],region[2]))
+            x_max = int(width*max(region[0],region[2]))
+            y_min = int(height*min(region[1],region[3]))
+            y_max = int(height*max(region[1],region[3]))
+            image = image.crop((x_min,y_min,max(x_min+1,x_max),max(y_min+1,y_max)))
+        yield image, page_number
+
+def decode_image_xobject(image_xobject,draft_scale=None):
+    """
+    Decode the PyPDF2 image XObject IMAGE_XOBJECT to a PIL image in
+    mode L or 1 (see PDF_IMAGES). Return None if the image's encoding
+    is not supported.
+    """
+    # PIL is only needed when decoding images in process
+    from PIL import Image, ImageOps
+    filters = image_xobject.get('/Filter',[])
+    if not isinstance(filters,list):
+        filters = [filters]
+    filters = [f.getObject() for f in filters]
+    decode_parms = image_xobject.get('/DecodeParms',[])
+    if not isinstance(decode_parms,list):
+        decode_parms = [decode_parms]
+    decode_parms = [(parms.getObject() if parms else {}) for parms in decode_parms]
+    width = int(image_xobject['/Width'])
+    height = int(image_xobject['/Height'])
+    if filters and filters[-1] in ('/DCTDecode','/DCT','/CCITTFaxDecode','/CCF'):
+        # the encoded data is handed to PIL as is
+        if len(filters) > 1:
+            return None
+        data = image_xobject._data
+        parms = decode_parms[0] if decode_parms else {}
+        if filters[-1] in ('/DCTDecode','/DCT'):
+            image = Image.open(io.BytesIO(data))
+            if draft_scale:
+                image.draft('L',(max(1,int(width*draft_scale)),max(1,int(height*draft_scale))))
+            else:
+                image.draft('L',(width,height))
+        else:
+            image = Image.open(io.BytesIO(ccitt_tiff(data,width,height,parms)))
+    else:
+        image = decode_raw_image_xobject(image_xobject,image_xobject.getData(),width,height)
+        if image is None:
+            return None
+    image.load()
+    if image.mode not in ('L','1'):
+        image = image.convert('L')
+    decode = image_xobject.get('/Decode')
+    if decode is not None and [float(value) for value in decode.getObject()] == [1.0,0.0]:
+        image = ImageOps.invert(image.convert('L'))
+    return image
+
+def decode_raw_image_xobject(image_xobject,data,width,height):
+    """
+    Return a PIL image given DATA, the decoded (e.g., inflated) samples
+    of the PyPDF2 image XObject IMAGE_XOBJECT, WIDTH pixels wide and
+    HEIGHT pixels high. Return None if the color space or number of
+    bits per component is not supported.
+    """
+    from PIL import Image
+    if pdf_boolean(image_xobject.get('/ImageMask',False)):
+        bits_per_component = 1
+        color_space = PyPDF2.generic.NameObject('/DeviceGray')
+    else:
+        bits_per_component = int(image_xobject.get('/BitsPerComponent',8))
+        color_space = image_xobject.get('/ColorSpace',PyPDF2.generic.NameObject('/DeviceGray'))
+    color_space = color_space.getObject()
+    lookup = None
+    if isinstance(color_space,list):
+        family = color_space[0].getObject()
+        if family == '/ICCBased':
+            components = int(color_space[1].getObject().get('/N',1))
+            color_space = {1: '/DeviceGray', 3: '/DeviceRGB', 4: '/DeviceCMYK'}.get(components)
+        elif family == '/Indexed':
+            base = color_space[1].getObject()
+            if isinstance(base,list) and base[0].getObject() == '/ICCBased':
+                base = {1: '/DeviceGray', 3: '/DeviceRGB'}.get(
+                    int(base[1].getObject().get('/N',1)))
+            lookup = color_space[3].getObject()
+            if isinstance(lookup,PyPDF2.generic.StreamObject):
+                lookup = lookup.getData()
+            elif not isinstance(lookup,bytes):
+                lookup = lookup.original_bytes
+            color_space = '/Indexed'
+        else:
+            color_space = family
+    if color_space == '/DeviceGray' and bits_per_component == 1:
+        return Image.frombytes('1',(width,height),data)
+    if bits_per_component != 8:
+        return None
+    if color_space == '/DeviceGray':
+        return Image.frombytes('L',(width,height),data)
+    if color_space == '/DeviceRGB':
+        return Image.frombytes('RGB',(width,height),data)
+    if color_space == '/DeviceCMYK':
+        return Image.frombytes('CMYK',(width,height),data)
+    if color_space == '/Indexed' and base in ('/DeviceGray','/DeviceRGB'):
+        image = Image.frombytes('P',(width,height),data)
+        if base == '/DeviceGray':
+            lookup = bytes(value for gray in lookup for value in (gray,gray,gray))
+        image.putpalette(lookup[:768])
+        return image
+    return None
+
+def pdf_boolean(obj):
+    """
+    Return the truth value of OBJ, a PDF boolean (a PyPDF2
+    BooleanObject, which is itself always true) or a Python value.
+    """
+    obj = obj.getObject() if isinstance(obj,PyPDF2.generic.IndirectObject) else obj
+    if isinstance(obj,PyPDF2.generic.BooleanObject):
+        return obj.value
+    return bool(obj)
+
+def ccitt_tiff(data,width,height,parms):
+    """
+    Return a TIFF file, as bytes, wrapping DATA, the CCITT fax encoded
+    data of an image WIDTH pixels wide and HEIGHT pixels high with the
+    CCITTFaxDecode parameters PARMS, so that PIL can decode it.
+    """
+    k = int(parms.get('/K',0))
+    columns = int(parms.get('/Columns',width))
+    rows = int(parms.get('/Rows',height)) or height
+    # T.6 (group 4) if K is negative, T.4 (group 3) otherwise
+    compression = 4 if k < 0 else 3
+    # WhiteIsZero unless 1 bits represent black pixels
+    photometric = 1 if pdf_boolean(parms.get('/BlackIs1',False)) else 0
+    tags = [
+        (256,4,columns),        # ImageWidth
+        (257,4,rows),           # ImageLength
+        (258,3,1),              # BitsPerSample
+        (259,3,compression),    # Compression
+        (262,3,photometric),    # PhotometricInterpretation
+        (273,4,0),              # StripOffsets (set below)
+        (277,3,1),              # SamplesPerPixel
+        (278,4,rows),           # RowsPerStrip
+        (279,4,len(data))       # StripByteCounts
+    ]
+    if compression == 3:
+        # 2-D coding if K is positive
+        tags.append((292,4,1 if k > 0 else 0)) # T4Options
+    header_length = 8 + 2 + 12*len(tags) + 4
+    ifd = struct.pack('<H',len(tags))
+    for tag, field_type, value in tags:
+        if tag == 273:
+            value = header_length
+        if field_type == 3:
+            ifd = ifd + struct.pack('<HHIHH',tag,field_type,1,value,0)
+        else:
+            ifd = ifd + struct.pack('<HHII',tag,field_type,1,value)
+    return struct.pack('<2sHI',b'II',42,8) + ifd + struct.pack('<I',0) + data
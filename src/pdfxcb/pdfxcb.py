@@ -1,6 +1,10 @@
 import argparse
-import imp
+import collections
+import concurrent.futures
+import contextlib
+import importlib.util
 import json
+import glob
 import math
 import os
 import os.path
@@ -9,6 +13,7 @@ import shutil
 import signal
 import sys
 import tempfile
+import time
 import uuid
 
 import logging
@@ -24,7 +29,10 @@ lg.basicConfig(format=json_log_format,stream=sys.stdout)
 
 
 import pdfxcb.barScan as barScan
+import pdfxcb.cache as cache
+import pdfxcb.checkpoint as checkpoint
 import pdfxcb.json1 as json1
+import pdfxcb.jsonlog as jsonlog
 import pdfxcb.pdf as pdf
 
 
@@ -44,46 +52,432 @@ signal.signal(signal.SIGTERM, signal_handler)
 #
 # function definitions
 #
-def locate_cover_sheets (png_file_tuples,containing_dir,match_re,scan_region):
+def timed_iter (iterable,timing,key):
     """
-    Given the list of files specified by PNG_FILE_TUPLES (a set of
+    Yield the members of ITERABLE, adding the time spent obtaining each
+    member to the KEY member of the dictionary TIMING.
+    """
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        finally:
+            timing[key] = timing[key] + time.perf_counter() - start
+        yield item
+
+def throughput (number_of_pages,seconds):
+    """
+    Return a dictionary describing the processing of NUMBER_OF_PAGES
+    pages in SECONDS seconds.
+    """
+    return {
+        'pages': number_of_pages,
+        'seconds': seconds,
+        'pages_per_second': number_of_pages/seconds if seconds else None
+    }
+
+def burst_timing (timing,start,number_of_pages,bytes_written,stats):
+    """
+    Return the timing block of the code 40 log record given TIMING, a
+    dictionary of stage durations, START, the value of
+    time.perf_counter() when processing began, the NUMBER_OF_PAGES of
+    the PDF, the number of BYTES_WRITTEN to output files, and STATS
+    (see LOCATE_COVER_SHEETS), from which the zbar_calls,
+    learned_zbar_calls, and scan_seconds members are moved to the
+    timing block.
+    """
+    total = time.perf_counter() - start
+    return dict(timing,
+                total=total,
+                pages=number_of_pages,
+                pages_per_second=number_of_pages/total if total else None,
+                bytes_written=bytes_written,
+                zbar_calls=stats.pop('zbar_calls',0),
+                learned_zbar_calls=stats.pop('learned_zbar_calls',0),
+                page_scan_seconds=stats.pop('scan_seconds',0.0))
+
+def image_file_specs (png_file_tuples,containing_dir,submitted=None):
+    """
+    Yield, for each member of PNG_FILE_TUPLES, the argument expected
+    by barScan.barcodeScan: the path to the PNG file in CONTAINING_DIR
+    or the in-memory image. If SUBMITTED is a deque, append each member
+    of PNG_FILE_TUPLES to it as the corresponding value is yielded.
+    """
+    for png_file_tuple in png_file_tuples:
+        if submitted is not None:
+            submitted.append(png_file_tuple)
+        if isinstance(png_file_tuple[0],str):
+            image_file_spec = os.path.join(containing_dir,png_file_tuple[0])
+            lg.debug(image_file_spec)
+            yield image_file_spec
+        else:
+            yield png_file_tuple[0]
+
+def locate_cover_sheets (png_file_tuples,containing_dir,match_re,scan_region,
+                         number_of_images=None,jobs=1,
+                         prefilter_threshold=None,stats=None,
+                         known_results=None,scan_cache=None,cache_keys=None,
+                         journal=None):
+    """
+    Given the files specified by PNG_FILE_TUPLES (a sequence of
     tuples where the first member of each tuple specifies the name of
     the PNG file) and CONTAINING_DIR, identify those files containing
     a barcode. Return multiple values: a list of the corresponding
     barcodes and a list of the corresponding indices.
+
+    The first member of a tuple may instead be an in-memory PIL
+    image. PNG_FILE_TUPLES may then be an iterator (e.g., one returned
+    by pdf.pdf_to_images) in which case NUMBER_OF_IMAGES should
+    specify its length for progress reporting.
+
+    Images are scanned by up to JOBS worker processes (None indicates
+    one per core). The return values do not depend on JOBS. In
+    adaptive region mode, the box is learned in this process from the
+    scan results, in order (see SCAN_IMAGES).
+
+    If PREFILTER_THRESHOLD is an integer, images rejected by
+    barScan.barcode_like_p are not scanned by zbar. If STATS is a
+    dictionary, the number of images so skipped is added to its
+    skipped_pages member, the number of zbar scans to its zbar_calls
+    member, the number of those scanning the learned box (see
+    barScan.learn_region) to its learned_zbar_calls member, and the
+    time spent scanning to its scan_seconds member.
+
+    KNOWN_RESULTS, if specified, is a dictionary mapping indices to
+    (<tuple>, <scan result>) pairs for images which need not be
+    scanned (e.g., results retrieved from a cache.ScanCache); the
+    indices then refer to the sequence obtained by merging these
+    tuples with PNG_FILE_TUPLES. If SCAN_CACHE is a cache.ScanCache,
+    the result of scanning the image at index I is stored under
+    CACHE_KEYS[I], if present. If JOURNAL is a checkpoint.Journal, the
+    result of scanning each image is recorded in it.
     """
     barcodes = []
     indices = []
-    # I: index in IMAGE_FILES
-    i = 0
-    i_max = len(png_file_tuples)
-    while (i<i_max):
-        # log progress by default (otherwise, this can be a long period of silence...)
-        lg.info(
-            json1.json_progress(
-                f'looking for barcode on {i} of {i_max} PNG files')
-            )
-        lg.info(containing_dir)
-        lg.info(png_file_tuples[i][0])
-        image_file_spec = os.path.join(containing_dir,png_file_tuples[i][0])
-        lg.debug(image_file_spec)
-        maybe_barcode = barScan.barcodeScan(
-            image_file_spec,
-            scan_region         # None
-        )
-        # don't ignore barcode if consider is true
-        consider = True
-        if maybe_barcode:
-            if match_re:
-                consider = match_re.match(maybe_barcode)
-            if consider:
-                barcodes.append(maybe_barcode)
-                indices.append(i)
-        i = i+1
+    for i, png_file_tuple, barcode in locate_cover_sheets_iter(
+            png_file_tuples,containing_dir,match_re,scan_region,
+            number_of_images,jobs,prefilter_threshold,stats,
+            known_results,scan_cache,cache_keys,journal):
+        if barcode:
+            barcodes.append(barcode)
+            indices.append(i)
         #lg.debug(barcodes)
         #lg.debug(indices)
     return barcodes,indices
 
+def locate_cover_sheets_iter (png_file_tuples,containing_dir,match_re,scan_region,
+                              number_of_images=None,jobs=1,
+                              prefilter_threshold=None,stats=None,
+                              known_results=None,scan_cache=None,cache_keys=None,
+                              journal=None):
+    """
+    See LOCATE_COVER_SHEETS. Yield, as soon as each member of
+    PNG_FILE_TUPLES has been scanned and in the order of
+    PNG_FILE_TUPLES, multiple values: the index of the member, the
+    member, and the barcode (None unless a barcode was found and, if
+    MATCH_RE is defined, matches MATCH_RE).
+    """
+    if known_results is None:
+        known_results = {}
+    if cache_keys is None:
+        cache_keys = {}
+    if number_of_images is None:
+        number_of_images = len(png_file_tuples) + len(known_results)
+    i_max = number_of_images
+    submitted = collections.deque()
+    skipped_pages = 0
+    zbar_calls = 0
+    learned_zbar_calls = 0
+    scan_seconds = 0.0
+    progress = {}
+    log_pages_p = lg.getLogger().isEnabledFor(logging.INFO)
+    scan_results = scan_images(image_file_specs(png_file_tuples,containing_dir,submitted),
+                               scan_region,
+                               jobs,
+                               prefilter_threshold)
+    try:
+        # I: index in the merged sequence
+        for i in range(number_of_images):
+            if i in known_results:
+                png_file_tuple, scan_result = known_results[i]
+            else:
+                scan_result = next(scan_results,None)
+                if scan_result is None:
+                    break
+                png_file_tuple = submitted.popleft()
+                if scan_result['skipped']:
+                    skipped_pages = skipped_pages + 1
+                zbar_calls = zbar_calls + scan_result['zbar_calls']
+                learned_zbar_calls = learned_zbar_calls + scan_result['learned_zbar_calls']
+                scan_seconds = scan_seconds + scan_result['seconds']
+                barScan.learn_region(scan_result['box'])
+                if scan_cache is not None and i in cache_keys:
+                    scan_cache.put(cache_keys[i],scan_result)
+                if journal is not None:
+                    journal.record_scan(i,png_file_tuple[1],scan_result)
+            # log progress by default (otherwise, this can be a long period of
+            # silence...), but not for every page (see jsonlog.progress_due)
+            if jsonlog.progress_due(progress,i+1,i_max):
+                lg.info(
+                    json1.json_progress(
+                        f'looking for barcode on {i} of {i_max} PNG files')
+                    )
+            if log_pages_p:
+                lg.info(json1.json_page_scanned(png_file_tuple[1],scan_result,
+                                                i in known_results))
+            maybe_barcode = scan_result['barcode']
+            # don't ignore barcode if consider is true
+            consider = True
+            if maybe_barcode:
+                if match_re:
+                    consider = match_re.match(maybe_barcode)
+                if not consider:
+                    maybe_barcode = None
+            yield i, png_file_tuple, maybe_barcode
+    finally:
+        scan_results.close()
+        if stats is not None:
+            stats['skipped_pages'] = stats.get('skipped_pages',0) + skipped_pages
+            stats['zbar_calls'] = stats.get('zbar_calls',0) + zbar_calls
+            stats['learned_zbar_calls'] = stats.get('learned_zbar_calls',0) + learned_zbar_calls
+            stats['scan_seconds'] = stats.get('scan_seconds',0.0) + scan_seconds
+
+def coarse_scan (session,page_numbers,resolution,region,jobs=None,
+                 prefilter_threshold=None,stats=None):
+    """
+    Render, in memory, the pages PAGE_NUMBERS (an ascending list) of
+    the PDF of the pdf.PdfSession SESSION at RESOLUTION, in DPI,
+    cropped to REGION, and scan them with up to JOBS worker processes,
+    rejecting images without barcode-like structure (see
+    barScan.barcode_like_p; PREFILTER_THRESHOLD defaults to
+    barScan.PREFILTER_THRESHOLD). Return a dictionary mapping the
+    number of each page settled by this scan, i.e., with a barcode
+    decoded or without barcode-like structure, to its scan result.
+    The other pages are candidates for a scan at a higher resolution.
+    STATS is updated as by LOCATE_COVER_SHEETS except that the number
+    of pages without barcode-like structure is added to its
+    coarse_rejected_pages member rather than to skipped_pages.
+    """
+    if prefilter_threshold is None:
+        prefilter_threshold = barScan.PREFILTER_THRESHOLD
+    images = pdf.pdf_to_images(session,session.number_of_pages(),jobs,
+                               region=region,
+                               resolution=resolution,
+                               page_numbers=page_numbers)
+    submitted = collections.deque()
+    settled = {}
+    rejected_pages = 0
+    zbar_calls = 0
+    learned_zbar_calls = 0
+    scan_seconds = 0.0
+    for scan_result in scan_images(image_file_specs(images,None,submitted),
+                                   None,jobs,prefilter_threshold):
+        png_file_tuple = submitted.popleft()
+        if scan_result['skipped']:
+            rejected_pages = rejected_pages + 1
+        zbar_calls = zbar_calls + scan_result['zbar_calls']
+        learned_zbar_calls = learned_zbar_calls + scan_result['learned_zbar_calls']
+        scan_seconds = scan_seconds + scan_result['seconds']
+        barScan.learn_region(scan_result['box'])
+        if scan_result['barcode'] or scan_result['skipped']:
+            settled[png_file_tuple[1]] = scan_result
+    if stats is not None:
+        stats['coarse_rejected_pages'] = stats.get('coarse_rejected_pages',0) + rejected_pages
+        stats['zbar_calls'] = stats.get('zbar_calls',0) + zbar_calls
+        stats['learned_zbar_calls'] = stats.get('learned_zbar_calls',0) + learned_zbar_calls
+        stats['scan_seconds'] = stats.get('scan_seconds',0.0) + scan_seconds
+    return settled
+
+def select_page_engines (session,page_numbers=None):
+    """
+    Determine, for each page of the PDF of the pdf.PdfSession SESSION
+    (or each of the pages PAGE_NUMBERS, if specified), whether the page is drawn solely by a single full-page image (see
+    pdf.page_image_only) and log the engine chosen for each page
+    ('extract' for such pages, 'rasterize' otherwise). Return a
+    dictionary mapping the number of each such page to the values
+    returned by pdf.page_image_only.
+    """
+    if page_numbers is None:
+        page_numbers = range(1,session.number_of_pages()+1)
+    image_only_pages = {}
+    for page_number in page_numbers:
+        try:
+            image_only = pdf.page_image_only(session.page(page_number))
+        except Exception as e:
+            # the rasterizer copes with whatever the analysis cannot
+            lg.debug(str(e))
+            image_only = None
+        if image_only:
+            image_only_pages[page_number] = image_only
+    lg.info(json1.json_page_engines(
+        session.path,
+        {
+            'extract': sorted(image_only_pages),
+            'rasterize': [page_number for page_number in page_numbers
+                          if page_number not in image_only_pages]
+        }))
+    return image_only_pages
+
+def merge_page_images (page_numbers,extract_page_numbers,
+                       extracted_images,rasterized_images):
+    """
+    Yield, for each of the ascending page numbers PAGE_NUMBERS, the
+    next member of the iterator EXTRACTED_IMAGES, if the page number
+    is a member of EXTRACT_PAGE_NUMBERS, or of the iterator
+    RASTERIZED_IMAGES.
+    """
+    extract_page_numbers = set(extract_page_numbers)
+    for page_number in page_numbers:
+        if page_number in extract_page_numbers:
+            yield next(extracted_images)
+        else:
+            yield next(rasterized_images)
+
+def resume_scan_results (records,png_file_page_number_tuples,known_results,
+                         cache_keys):
+    """
+    Add to KNOWN_RESULTS (see LOCATE_COVER_SHEETS) the scan results
+    recorded by RECORDS, a list of checkpoint.Journal and
+    checkpoint.IncrementalState objects, for members of
+    PNG_FILE_PAGE_NUMBER_TUPLES, removing their indices from
+    CACHE_KEYS (see SCAN_CACHE_LOOKUP). Return the number of scan
+    results added.
+    """
+    recorded_results = {}
+    for record in records:
+        recorded_results.update(record.scan_results(png_file_page_number_tuples))
+    for i in recorded_results:
+        cache_keys.pop(i,None)
+    known_results.update(recorded_results)
+    return len(recorded_results)
+
+def resume_output_file_names (records,cover_sheet_barcodes,cover_sheet_indices,
+                              page_ranges,output_dir):
+    """
+    Return the output file names for PAGE_RANGES: the name recorded
+    for a page range by the first of RECORDS (see
+    RESUME_SCAN_RESULTS) recording one, if any, or else a new name
+    (see GENERATE_OUTPUT_FILE_NAMES).
+    """
+    output_file_names = [next((record.planned_output(page_range) for record in records
+                               if record.planned_output(page_range)),
+                              None)
+                         for page_range in page_ranges]
+    new = [k for k, output_file_name in enumerate(output_file_names)
+           if output_file_name is None]
+    for k, output_file_name in zip(new,generate_output_file_names(
+            [cover_sheet_barcodes[k] for k in new],
+            [cover_sheet_indices[k] for k in new],
+            output_dir)):
+        output_file_names[k] = output_file_name
+    return output_file_names
+
+def scan_cache_lookup (session,scan_cache,png_file_page_number_tuples,
+                       scan_parameters):
+    """
+    Look up, in the cache.ScanCache SCAN_CACHE, the scan result for
+    each member of PNG_FILE_PAGE_NUMBER_TUPLES (ordered with respect
+    to page number) given SESSION, the pdf.PdfSession for the PDF, and
+    SCAN_PARAMETERS, a dictionary describing how images are derived
+    and scanned. Images on the same page are distinguished by their
+    order. Return multiple values: a dictionary mapping the index of
+    each hit to a (<tuple>, <scan result>) pair and a dictionary
+    mapping the index of each miss to its cache key.
+    """
+    known_results = {}
+    cache_keys = {}
+    page_sizes = session.page_sizes()
+    ordinal = 0
+    for i, png_file_tuple in enumerate(png_file_page_number_tuples):
+        page_number = png_file_tuple[1]
+        if i > 0 and png_file_page_number_tuples[i-1][1] == page_number:
+            ordinal = ordinal + 1
+        else:
+            ordinal = 0
+        key = cache.scan_cache_key(session.page_digest(page_number),
+                                   dict(scan_parameters,
+                                        page_size=page_sizes[page_number-1],
+                                        image=ordinal))
+        scan_result = scan_cache.get(key)
+        if scan_result is None:
+            cache_keys[i] = key
+        else:
+            known_results[i] = (png_file_tuple,scan_result)
+    return known_results, cache_keys
+
+def scan_image (image_file_spec,scan_region,prefilter_threshold=None,
+                learned_box=None):
+    """
+    Scan a single image for a barcode. This is the unit of work
+    handed to scan worker processes. Return the dictionary returned by
+    barScan.barcode_scan_image.
+    """
+    return barScan.barcode_scan_image(
+        image_file_spec,
+        scan_region,        # None
+        prefilter_threshold,
+        learned_box
+    )
+
+def scan_images (image_file_specs,scan_region,jobs=1,prefilter_threshold=None):
+    """
+    Yield the result of scanning (see SCAN_IMAGE) each member of the
+    iterable IMAGE_FILE_SPECS, in order. If JOBS is 1, scan in this
+    process. Otherwise, scan with a pool of JOBS worker processes
+    (None indicates one per core), each reusing a single zbar scanner.
+    The number of images submitted but not yet yielded is bounded so
+    that IMAGE_FILE_SPECS may be a lazily rendered sequence of pages.
+
+    Each image is handed out with the box learned, in this process,
+    so far (see barScan.learned_region); the caller learns from each
+    result (see barScan.learn_region) before the next is yielded. The
+    box used for an image thus depends only on the results of the
+    images before it, the last 4*JOBS of which are still being scanned
+    when it is handed out.
+
+    If the generator is closed before it is exhausted, the pool is shut
+    down once the images being scanned have been scanned.
+    """
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if jobs <= 1:
+        for image_file_spec in image_file_specs:
+            yield scan_image(image_file_spec,scan_region,prefilter_threshold,
+                             barScan.learned_region())
+        return
+    window = 4*jobs
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=scan_worker_init,
+        initargs=(barScan.scanner_config(),jsonlog.worker_config()))
+    try:
+        pending = collections.deque()
+        for image_file_spec in image_file_specs:
+            pending.append(executor.submit(scan_image,image_file_spec,scan_region,
+                                           prefilter_threshold,
+                                           barScan.learned_region()))
+            if len(pending) >= window:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # the consumer may stop early (e.g., on an error): images not
+        # yet handed to a worker are not scanned
+        executor.shutdown(wait=True,cancel_futures=True)
+
+def scan_worker_init (scanner_config,log_config=None):
+    """
+    Prepare a scan worker process. SCANNER_CONFIG is the value of
+    barScan.scanner_config() and LOG_CONFIG the value of
+    jsonlog.worker_config() in the parent process.
+    """
+    jsonlog.worker_init(log_config)
+    barScan.configure_scanner(**scanner_config)
+    barScan.zbar_scanner()
+
 def executable_sanity_checks (executables):
     """
     Check for availability of executables specified in the list of
@@ -165,23 +559,29 @@ def generate_page_ranges_split_after(split_after,number_of_pages):
     page_ranges[len(page_ranges)-1] = (last_tuple[0],number_of_pages)
     return page_ranges
 
-def pdfxcb_sanity_checks (output_dir,pdf_file_spec,rasterize_p,region):
+def pdfxcb_sanity_checks (output_dir,pdf_file_spec,region):
     # file and dir sanity checks
     if (not output_dir):
         sys.exit("The output directory must be specified.")
     directory_sanity_checks ([output_dir],True)
     file_sanity_checks ([pdf_file_spec],True)
-    # region/rasterize sanity check
-    if (not rasterize_p and region):
-        sys.exit("If REGION is specified, then RASTERIZE_P should be true.")
+    # region sanity check; every engine honors REGION (rendered pages
+    # are cropped by pdftoppm, decoded images by pdf.pdf_images)
+    if (region and
+        (len(region) != 4 or not all(0 <= value <= 1 for value in region))):
+        sys.exit("REGION should be four values between 0 and 1.")
     # executables sanity check
     required_executables = [
         'gs'
         #'pdftoppm'
     ]
     executable_sanity_checks(required_executables)
+    # the scanning stack is imported on first use (see
+    # barScan.scanning_modules); check for it up front
     required_modules = [
-        'PyPDF2'
+        'PyPDF2',
+        'zbar',
+        'PIL'
         #'cv2'
     ]
     module_sanity_checks (required_modules,True)
@@ -191,111 +591,579 @@ def file_and_dir_sanity_checks (dirs,files):
     file_sanity_checks (files,True)
 
 def pdfxcb (pdf_file_spec,output_dir,match_re,rasterize_p,region,
-            clean_up_png_files_p=True
+            clean_up_png_files_p=True,
+            jobs=None,
+            in_memory_p=False,
+            prefilter_threshold=None,
+            streaming_p=False,
+            window=32,
+            scan_cache=None,
+            scan_cache_size=None,
+            extract_scale=None,
+            engine=None,
+            resume_p=False,
+            incremental_p=False,
+            coarse_dpi=None,
+            fine_dpi=None
             ):
     """
     Given the file specified by PDF_FILE_SPEC, look for cover sheets
     and split the PDF at each coversheet. Name output file(s) based on
     cover sheet content. Write files to directory specified by
-    OUTPUT_DIR. Return True. If MATCH_RE is defined, ignore barcodes
+    OUTPUT_DIR. Return the code 40 log record (see
+    json1.json_burst_completed_obj). If MATCH_RE is defined, ignore barcodes
     unless the corresponding string matches the regex MATCH_RE. Use
     RASTERIZE_P = False if the PDF does not contain vector graphics
     but is solely bitmap data (e.g., the PDF was generated from a
-    scanned document). If REGION has the form [ float1, float2,
+    scanned document); the images embedded in the PDF are then
+    decoded in process (see pdf.pdf_images), JPEG images downscaled
+    by the decoder to EXTRACT_SCALE (0 to 1.0) times their size if
+    EXTRACT_SCALE is specified. If REGION has the form [ float1, float2,
     float3, float4 ], use the region specified by REGION when scanning
-    for a barcode or other indicator of a cover sheet.
+    for a barcode or other indicator of a cover sheet. JOBS is the
+    maximum number of concurrent worker processes (None indicates one
+    per core). If IN_MEMORY_P is true (and RASTERIZE_P is true), pages
+    are rasterized straight into memory and scanned without writing
+    intermediate PNG files. If PREFILTER_THRESHOLD is an integer, skip
+    images without barcode-like structure (see barScan.barcode_like_p)
+    and report the number skipped.
+
+    If STREAMING_P is true (and RASTERIZE_P is true), rasterization,
+    scanning, and splitting overlap: pages are scanned as soon as they
+    are rendered, and each output file is written as soon as the next
+    cover sheet is found. At most about WINDOW rendered pages are held
+    (on disk or in memory) at any time.
+
+    If SCAN_CACHE is a cache.ScanCache or the path to the database of
+    one (holding at most SCAN_CACHE_SIZE entries), pages (or, if
+    RASTERIZE_P is false, images) whose scan result is cached are
+    neither rasterized nor scanned, and the cache hit and miss counts
+    are reported. The cache is not used when STREAMING_P is true.
+
+    ENGINE, if specified, overrides RASTERIZE_P: 'rasterize' renders
+    every page, 'extract' decodes the images embedded in the PDF, and
+    'auto' decodes the image of each page drawn solely by a single
+    full-page image (see pdf.page_image_only), cropped to REGION, and
+    renders the remaining pages. The engine chosen for each page is
+    logged. With STREAMING_P, 'auto' renders every page.
+
+    Unless STREAMING_P is true, the scan results and the output files
+    are recorded as they are obtained and written in a checkpoint
+    journal (see checkpoint.Journal) in OUTPUT_DIR, removed once
+    processing is complete. If RESUME_P is true, the pages whose scan
+    results are recorded by the journal of an earlier, interrupted,
+    run with the same PDF file and parameters are neither rasterized
+    nor scanned, and the output files recorded as written are not
+    written again.
+
+    If INCREMENTAL_P is true (and STREAMING_P is not), the state of
+    the run (see checkpoint.IncrementalState) is kept in OUTPUT_DIR.
+    If pages have since been appended to the PDF file, only those
+    pages are rasterized and scanned on the next run, and only the
+    output files whose page ranges changed (e.g., that of the last
+    cover sheet of the previous run) or are new are written.
+
+    When pages are rasterized (and STREAMING_P is false), they are
+    rendered at FINE_DPI (None indicates pdf.PDFTOPPM_RESOLUTION). If
+    COARSE_DPI is specified, pages are first rendered at COARSE_DPI
+    and scanned (see COARSE_SCAN); only the pages with barcode-like
+    structure but without a barcode decoded are rendered again, at
+    FINE_DPI, and scanned.
     """
     global lg
-    pdfxcb_sanity_checks(output_dir,pdf_file_spec,rasterize_p,region)
-    # If confident that the PDF under analysis is derived from a scan
-    # (i.e., contains only bitmap data), then the images embedded in
-    # the PDF can be analyzed directly. If the PDF may contain vector
-    # data on the cover sheet pages, then rasterization is indicated.
-    # See doc/optimization.md for notes on time implications.
-
-    # PNG_FILE_PAGE_NUMBER_TUPLES is an array where each member has
-    # the form (<PNG file name>, <PDF page number>). There is no
-    # guarantee that all pages in the original PDF document are
-    # represented. Furthermore, there may be multiple PNG images per
-    # PDF page -- i.e., the array might include ("flurpies.png",1) and
-    # ("glurpies.png",1).
-
-    # FIXME: consider having a single call here -- FOO -- that specializes on rasterize_p
-    if rasterize_p:
-        # extract PDF pages as image data (PNG files)
-        png_file_page_number_tuples = split_pdf_to_png_files(pdf_file_spec,output_dir)
-        # Once rasterized pages are generated, optionally scan for cue marks
-        # CUE_INDICES = array where each member is an integer indicating index of member of png_file_page_number_tuples where the corresponding bitmap has a cue mark
-        # cue_indices = scan_for_cue_marks(png_file_page_number_tuples) <-- use urh_corner_mean w/reasonable threshold (10? 20? 50?) for "black"
-    else:
-        # extract images directly from PDF
-        png_file_page_number_tuples = invoke_pdfimages_on(pdf_file_spec,output_dir)
-    # Code below expects png_file_page_number_tuples to be ordered with respect to page number.
-    # Note that sorted default is ascending order.
-    png_file_page_number_tuples = sorted(png_file_page_number_tuples,
-                                         key=lambda tuple: tuple[1])
-    #
-    # locate cover sheets
-    #
-    lg.info("Locating cover sheets")
-    if rasterize_p:
-        # possibilities:
-        # 1. png files represent rasterized pages
-        if region:
-            scan_region = region
+    if engine is None:
+        engine = 'rasterize' if rasterize_p else 'extract'
+    rasterize_p = (engine != 'extract')
+    pdfxcb_sanity_checks(output_dir,pdf_file_spec,region)
+    barScan.reset_scale_history()
+    barScan.reset_learned_region()
+    if isinstance(scan_cache,str):
+        with cache.ScanCache(scan_cache,scan_cache_size or cache.default_max_entries) as scan_cache:
+            return pdfxcb(pdf_file_spec,output_dir,match_re,rasterize_p,region,
+                          clean_up_png_files_p,jobs,in_memory_p,prefilter_threshold,
+                          streaming_p,window,scan_cache,
+                          extract_scale=extract_scale,
+                          engine=engine,
+                          resume_p=resume_p,
+                          incremental_p=incremental_p,
+                          coarse_dpi=coarse_dpi,
+                          fine_dpi=fine_dpi)
+    with pdf.PdfSession(pdf_file_spec) as session, contextlib.ExitStack() as exit_stack:
+        # If confident that the PDF under analysis is derived from a scan
+        # (i.e., contains only bitmap data), then the images embedded in
+        # the PDF can be analyzed directly. If the PDF may contain vector
+        # data on the cover sheet pages, then rasterization is indicated.
+        # See doc/optimization.md for notes on time implications.
+
+        # PNG_FILE_PAGE_NUMBER_TUPLES is an array where each member has
+        # the form (<PNG file name>, <PDF page number>). There is no
+        # guarantee that all pages in the original PDF document are
+        # represented. Furthermore, there may be multiple PNG images per
+        # PDF page -- i.e., the array might include ("flurpies.png",1) and
+        # ("glurpies.png",1).
+
+        if rasterize_p:
+            # possibilities:
+            # 1. png files represent rasterized pages
+            if region:
+                scan_region = region
+            else:
+                scan_region = ([0,0,0.7,0.5])
+        else:
+            # 2. images embedded in the PDF (see pdf.pdf_images),
+            # cropped to REGION, if specified, as they are decoded
+            scan_region = region # None is not treated as the equivalent of ([0,0,1,1]). ([0,0,1,1]) triggers cropping by barcodeScan.
+        if rasterize_p and streaming_p:
+            stats = {}
+            timing = {'rasterize': 0.0, 'split': 0.0, 'bytes_written': 0}
+            start = time.perf_counter()
+            cover_sheet_barcodes, cover_sheet_indices, output_file_names = \
+                pdfxcb_streaming(session,output_dir,match_re,scan_region,
+                                 clean_up_png_files_p,jobs,in_memory_p,
+                                 prefilter_threshold,window,stats,timing)
+            # rasterization, scanning, and splitting overlap
+            timing['scan'] = (time.perf_counter() - start -
+                              timing['rasterize'] - timing['split'])
+            lg.info(json1.json_rasterization_completed(
+                pdf_file_spec,
+                throughput(session.number_of_pages(),timing['rasterize'])))
+            timing = burst_timing(timing,start,session.number_of_pages(),
+                                  timing.pop('bytes_written'),stats)
+            lg.info(json1.json_burst_timing(pdf_file_spec,timing))
+            burst_completed = json1.json_burst_completed_obj(
+                output_file_names,
+                pdf_file_spec,
+                dict({
+                    'barcodes': cover_sheet_barcodes,
+                    'indices': cover_sheet_indices,
+                    'timing': timing
+                },**stats))
+            lg.info(json.dumps(burst_completed))
+            return burst_completed
+        # FIXME: consider having a single call here -- FOO -- that specializes on rasterize_p
+        # PAGE_IMAGES yields the images to scan in the order of
+        # PNG_FILE_PAGE_NUMBER_TUPLES
+        page_images = None
+        # TIMING: duration, in seconds, of each stage
+        timing = {'rasterize': 0.0}
+        start = time.perf_counter()
+        # KNOWN_RESULTS maps indices in PNG_FILE_PAGE_NUMBER_TUPLES to
+        # cached scan results; CACHE_KEYS maps the remaining indices to
+        # the keys under which their scan results are to be cached
+        known_results = {}
+        cache_keys = {}
+        # STATS of the coarse scan (see COARSE_DPI)
+        coarse_stats = {}
+        resolution = fine_dpi or pdf.PDFTOPPM_RESOLUTION
+        scan_parameters = {
+            'rasterize_p': rasterize_p,
+            'region': scan_region,
+            'resolution': resolution,
+            'coarse_dpi': coarse_dpi,
+            'prefilter_threshold': prefilter_threshold,
+            'extract_scale': extract_scale,
+            'engine': engine,
+            'scanner': barScan.scanner_config()
+        }
+        journal = exit_stack.enter_context(
+            checkpoint.Journal(output_dir,pdf_file_spec,scan_parameters,resume_p))
+        state = None
+        if incremental_p:
+            state = checkpoint.IncrementalState(output_dir,session,scan_parameters)
+        # RECORDS: the records of earlier runs
+        records = [journal] if state is None else [state,journal]
+        if rasterize_p:
+            number_of_pages = session.number_of_pages()
+            png_file_page_number_tuples = [(None,page_number)
+                                           for page_number in range(1,number_of_pages+1)]
+            if scan_cache is not None:
+                known_results, cache_keys = scan_cache_lookup(session,
+                                                              scan_cache,
+                                                              png_file_page_number_tuples,
+                                                              scan_parameters)
+            resumed_pages = resume_scan_results(records,png_file_page_number_tuples,
+                                                known_results,cache_keys)
+            page_numbers = [png_file_tuple[1]
+                            for i, png_file_tuple in enumerate(png_file_page_number_tuples)
+                            if i not in known_results]
+            # image-only pages (see pdf.page_image_only) -> (<image>, <rotation>)
+            image_only_pages = {}
+            if engine == 'auto':
+                image_only_pages = select_page_engines(session,page_numbers)
+            rasterize_page_numbers = [page_number for page_number in page_numbers
+                                      if page_number not in image_only_pages]
+            extract_page_numbers = [page_number for page_number in page_numbers
+                                    if page_number in image_only_pages]
+            if coarse_dpi:
+                coarse_start = time.perf_counter()
+                coarse_results = coarse_scan(session,rasterize_page_numbers,coarse_dpi,
+                                             scan_region,jobs,prefilter_threshold,
+                                             coarse_stats)
+                for i, png_file_tuple in enumerate(png_file_page_number_tuples):
+                    if png_file_tuple[1] in coarse_results:
+                        known_results[i] = (png_file_tuple,coarse_results[png_file_tuple[1]])
+                        # the cache key covers COARSE_DPI (see SCAN_PARAMETERS)
+                        if scan_cache is not None and i in cache_keys:
+                            scan_cache.put(cache_keys.pop(i),coarse_results[png_file_tuple[1]])
+                        journal.record_scan(i,png_file_tuple[1],coarse_results[png_file_tuple[1]])
+                page_numbers = [page_number for page_number in page_numbers
+                                if page_number not in coarse_results]
+                rasterize_page_numbers = [page_number for page_number in rasterize_page_numbers
+                                          if page_number not in coarse_results]
+                coarse_stats['coarse_pages'] = len(coarse_results) + len(rasterize_page_numbers)
+                coarse_stats['fine_pages'] = len(rasterize_page_numbers)
+                timing['coarse'] = time.perf_counter() - coarse_start
+            extracted_images = pdf.pdf_images(
+                session,
+                [(image_only_pages[page_number][0],page_number)
+                 for page_number in extract_page_numbers],
+                extract_scale,
+                resolution=resolution,
+                region=scan_region,
+                rotations={page_number: image_only_pages[page_number][1]
+                           for page_number in extract_page_numbers})
+        if rasterize_p and in_memory_p:
+            lg.info(json1.json_pdf_info(number_of_pages))
+            rasterized_images = pdf.pdf_to_images(session,number_of_pages,jobs,
+                                                  region=scan_region,
+                                                  resolution=resolution,
+                                                  page_numbers=rasterize_page_numbers)
+            page_images = merge_page_images(page_numbers,extract_page_numbers,
+                                            extracted_images,rasterized_images)
+        elif rasterize_p:
+            # extract PDF pages as image data (PNG files)
+            rasterize_start = time.perf_counter()
+            rendered_tuples = split_pdf_to_png_files(pdf_file_spec,output_dir,jobs,
+                                                     scan_region,
+                                                     session,
+                                                     rasterize_page_numbers,
+                                                     resolution)
+            timing['rasterize'] = time.perf_counter() - rasterize_start
+            rendered_pages = dict((png_file_tuple[1],png_file_tuple)
+                                  for png_file_tuple in rendered_tuples)
+            png_file_page_number_tuples = [
+                rendered_pages.get(png_file_tuple[1],png_file_tuple)
+                for png_file_tuple in png_file_page_number_tuples]
+            page_images = merge_page_images(page_numbers,extract_page_numbers,
+                                            extracted_images,iter(rendered_tuples))
+            # Pages without barcode-like structure can be skipped prior to
+            # the zbar scan (see PREFILTER_THRESHOLD).
+        else:
+            # decode images embedded in the PDF in process; the images
+            # are listed (in page order) up front but decoded lazily
+            image_xobjects = locate_embedded_images(session)
+            png_file_page_number_tuples = [(None,page_number)
+                                           for image_xobject, page_number in image_xobjects]
+            if scan_cache is not None:
+                known_results, cache_keys = scan_cache_lookup(session,
+                                                              scan_cache,
+                                                              png_file_page_number_tuples,
+                                                              scan_parameters)
+            resumed_pages = resume_scan_results(records,png_file_page_number_tuples,
+                                                known_results,cache_keys)
+            page_images = pdf.pdf_images(session,
+                                         [image_xobject_tuple
+                                          for i, image_xobject_tuple in enumerate(image_xobjects)
+                                          if i not in known_results],
+                                         extract_scale,
+                                         region=scan_region)
+        # Code below expects png_file_page_number_tuples to be ordered with respect to page number.
+        # Note that sorted default is ascending order.
+        png_file_page_number_tuples = sorted(png_file_page_number_tuples,
+                                             key=lambda tuple: tuple[1])
+        #
+        # locate cover sheets
+        #
+        lg.info("Locating cover sheets")
+        # only the scan region was rendered or decoded
+        scan_region = None
+        stats = coarse_stats
+        # pages are rendered or decoded lazily as they are scanned
+        scan_start = time.perf_counter()
+        rasterize_before_scan = timing['rasterize']
+        cover_sheet_barcodes, cover_sheet_indices = locate_cover_sheets(
+            timed_iter(page_images,timing,'rasterize'),
+            output_dir,match_re,scan_region,
+            number_of_images=len(png_file_page_number_tuples),
+            jobs=jobs,
+            prefilter_threshold=prefilter_threshold,
+            stats=stats,
+            known_results=known_results,
+            scan_cache=scan_cache,
+            cache_keys=cache_keys,
+            journal=journal)
+        timing['scan'] = (time.perf_counter() - scan_start -
+                          (timing['rasterize'] - rasterize_before_scan))
+        lg.info(json1.json_rasterization_completed(
+            pdf_file_spec,
+            throughput(len(png_file_page_number_tuples)-len(known_results),
+                       timing['rasterize'])))
+        if scan_cache is not None:
+            stats.update(scan_cache.stats())
+        print(cover_sheet_barcodes)
+        if clean_up_png_files_p:
+            for png_file_tuple in png_file_page_number_tuples:
+                if png_file_tuple[0] is None:
+                    continue
+                os.remove(os.path.join(output_dir,png_file_tuple[0]))
+        pdf_length = session.number_of_pages()
+        page_ranges = generate_page_ranges(cover_sheet_indices,
+                                           png_file_page_number_tuples,
+                                           pdf_length)
+        output_file_names = resume_output_file_names(records,
+                                                     cover_sheet_barcodes,
+                                                     cover_sheet_indices,
+                                                     page_ranges,
+                                                     output_dir)
+        journal.record_outputs(output_file_names,page_ranges)
+        pending = [k for k, output_file_name in enumerate(output_file_names)
+                   if not any(record.written_p(output_file_name,page_ranges[k])
+                              for record in records)]
+        if journal.resumed:
+            stats['resumed_pages'] = resumed_pages
+            stats['resumed_outputs'] = len(output_file_names) - len(pending)
+        if state is not None:
+            stats['incremental_pages'] = state.pages
+            stats['unchanged_outputs'] = len(output_file_names) - len(pending)
+        split_start = time.perf_counter()
+        stats['outputs'] = pdf.pdf_split(session,
+                                         [output_file_names[k] for k in pending],
+                                         [page_ranges[k] for k in pending],
+                                         jobs,
+                                         journal.record_written)
+        timing['split'] = time.perf_counter() - split_start
+        timing = burst_timing(timing,start,pdf_length,
+                              sum(output['bytes'] for output in stats['outputs']),
+                              stats)
+        lg.info(json1.json_burst_timing(pdf_file_spec,timing))
+        burst_completed = json1.json_burst_completed_obj(
+            output_file_names,
+            pdf_file_spec,
+            dict({
+                'barcodes': cover_sheet_barcodes,
+                'indices': cover_sheet_indices,
+                'timing': timing
+            },**stats))
+        lg.info(json.dumps(burst_completed))
+        if state is not None:
+            scan_results = dict((i,(png_file_tuple[1],scan_result))
+                                for i, (png_file_tuple, scan_result) in known_results.items())
+            scan_results.update(journal.scans)
+            state.save(session,scan_results,output_file_names,page_ranges)
+        journal.remove()
+        return burst_completed
+
+def pdfxcb_batch (pdf_file_specs,output_dir,split_after_n_pp,pdfxcb_args,
+                  jobs=None):
+    """
+    Process each of the PDF files specified by PDF_FILE_SPECS with
+    PDFXCB_SPLIT_AFTER (if SPLIT_AFTER_N_PP is positive) or PDFXCB,
+    distributing the files across a pool of JOBS worker processes
+    (None indicates one per core). The output files for a given PDF
+    file are written to a subdirectory of OUTPUT_DIR named after the
+    PDF file (see BATCH_OUTPUT_DIRS). PDFXCB_ARGS is a dictionary of
+    keyword arguments for PDFXCB (other than PDF_FILE_SPEC and
+    OUTPUT_DIR); each file is processed by a single worker, so JOBS is
+    forced to 1 within PDFXCB. Return a dictionary mapping each PDF
+    file to True (success) or False (failure).
+    """
+    if (not output_dir):
+        sys.exit("The output directory must be specified.")
+    directory_sanity_checks([output_dir],True)
+    file_sanity_checks(pdf_file_specs,True)
+    pdfxcb_args = dict(pdfxcb_args,jobs=1)
+    file_output_dirs = batch_output_dirs(pdf_file_specs,output_dir)
+    results = {}
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=max(1,min(jobs,len(pdf_file_specs))),
+            initializer=batch_worker_init,
+            initargs=(barScan.scanner_config(),split_after_n_pp > 0,
+                      jsonlog.worker_config())) as executor:
+        futures = {}
+        for pdf_file_spec, file_output_dir in zip(pdf_file_specs,file_output_dirs):
+            future = executor.submit(pdfxcb_batch_job,
+                                     pdf_file_spec,
+                                     file_output_dir,
+                                     split_after_n_pp,
+                                     pdfxcb_args)
+            futures[future] = pdf_file_spec
+        for future in concurrent.futures.as_completed(futures):
+            results[futures[future]] = future.result()
+    lg.info(json1.json_batch_completed(
+        [pdf_file_spec for pdf_file_spec in pdf_file_specs
+         if results[pdf_file_spec]],
+        [pdf_file_spec for pdf_file_spec in pdf_file_specs
+         if not results[pdf_file_spec]]))
+    return results
+
+def pdfxcb_batch_job (pdf_file_spec,output_dir,split_after_n_pp,pdfxcb_args):
+    """
+    Process a single PDF file on behalf of PDFXCB_BATCH. Return True
+    on success and False on failure. Failures are logged rather than
+    terminating the worker.
+    """
+    try:
+        if not os.path.isdir(output_dir):
+            os.makedirs(output_dir)
+        if (split_after_n_pp > 0):
+            return bool(pdfxcb_split_after(pdf_file_spec,output_dir,split_after_n_pp,
+                                           jobs=1))
         else:
-            scan_region = ([0,0,0.7,0.5])
+            return bool(pdfxcb(pdf_file_spec,output_dir,**pdfxcb_args))
+    except (Exception,SystemExit) as e:
+        lg.error(json1.json_failed_to_process_pdf(e,pdf_file_spec))
+        return False
+
+def batch_output_dirs (pdf_file_specs,output_dir):
+    """
+    Return a list of output directories, one for each of the PDF files
+    specified by PDF_FILE_SPECS: the subdirectory of OUTPUT_DIR named
+    after the file (without suffix). Distinct files with the same name
+    are assigned distinct subdirectories.
+    """
+    file_output_dirs = []
+    for pdf_file_spec in pdf_file_specs:
+        input_file_sans_suffix, input_file_suffix = os.path.splitext(pdf_file_spec)
+        maybe_dir, input_file_name_only = os.path.split(input_file_sans_suffix)
+        file_output_dir = os.path.join(output_dir,input_file_name_only)
+        version = 0
+        while file_output_dir in file_output_dirs:
+            version = version + 1
+            file_output_dir = os.path.join(output_dir,f'{input_file_name_only}-{version}')
+        file_output_dirs.append(file_output_dir)
+    return file_output_dirs
+
+def batch_worker_init (scanner_config,split_after_p,log_config=None):
+    """
+    Prepare a batch worker process. SCANNER_CONFIG is the value of
+    barScan.scanner_config() and LOG_CONFIG the value of
+    jsonlog.worker_config() in the parent process. Unless
+    SPLIT_AFTER_P is true, create the zbar scanner up front.
+    """
+    jsonlog.worker_init(log_config)
+    barScan.configure_scanner(**scanner_config)
+    if not split_after_p:
+        barScan.zbar_scanner()
+
+def expand_input_files (input_files,list_file=None):
+    """
+    Return a list of PDF file paths given INPUT_FILES, a list of paths
+    and/or glob patterns, and, optionally, LIST_FILE, the path to a
+    file listing one path per line. Patterns matching no file are kept
+    as is so that the sanity checks report them.
+    """
+    pdf_file_specs = []
+    for input_file in input_files:
+        matches = sorted(glob.glob(input_file)) if glob.has_magic(input_file) else []
+        pdf_file_specs.extend(matches or [input_file])
+    if list_file:
+        with open(list_file) as f:
+            for line in f:
+                line = line.strip()
+                if line:
+                    pdf_file_specs.append(line)
+    return pdf_file_specs
+
+def pdfxcb_streaming (session,output_dir,match_re,scan_region,
+                      clean_up_png_files_p,jobs,in_memory_p,
+                      prefilter_threshold,window,stats,timing):
+    """
+    Helper for PDFXCB when STREAMING_P is true. SESSION is the
+    pdf.PdfSession for the input PDF. Rasterize only
+    SCAN_REGION of each page. Add the time spent rasterizing and
+    splitting, and the number of bytes written, to the rasterize,
+    split, and bytes_written members of the dictionary TIMING. Return multiple values: the cover sheet
+    barcodes, the cover sheet indices (as returned by
+    GENERATE_PAGE_RANGES), and the output file names.
+    """
+    number_of_pages = session.number_of_pages()
+    lg.info(json1.json_pdf_info(number_of_pages))
+    effective_jobs = jobs or os.cpu_count() or 1
+    chunk_size = max(1,window//effective_jobs)
+    if in_memory_p:
+        page_tuples = pdf.pdf_to_images(session,number_of_pages,jobs,
+                                        chunk_size=chunk_size,
+                                        region=scan_region)
     else:
-        # 2. png files represent images from PDF (via pdfimages)
-        scan_region = None # None is not treated as the equivalent of ([0,0,1,1]). ([0,0,1,1]) triggers cropping by barcodeScan.
-    cover_sheet_barcodes, cover_sheet_indices = locate_cover_sheets(png_file_page_number_tuples,output_dir,match_re,scan_region)
-    print(cover_sheet_barcodes)
-    if clean_up_png_files_p:
-        for png_file_tuple in png_file_page_number_tuples:
+        page_tuples = pdf.pdf_to_pngs_iter(session,output_dir,
+                                           number_of_pages,jobs,
+                                           chunk_size=chunk_size,
+                                           region=scan_region)
+    cover_sheet_barcodes = []
+    cover_sheet_indices = []
+    output_file_names = []
+    def split_previous (last_page):
+        # write the document begun by the most recent cover sheet
+        output_file_name = generate_output_file_names(cover_sheet_barcodes[-1:],
+                                                      cover_sheet_indices[-1:],
+                                                      output_dir)[0]
+        page_range = (cover_sheet_pages[-1],last_page)
+        split_start = time.perf_counter()
+        outputs = pdf.pdf_split(session,[output_file_name],[page_range],1)
+        timing['split'] = timing['split'] + time.perf_counter() - split_start
+        timing['bytes_written'] = timing['bytes_written'] + outputs[0]['bytes']
+        stats.setdefault('outputs',[]).extend(outputs)
+        output_file_names.append(output_file_name)
+    cover_sheet_pages = []
+    lg.info("Locating cover sheets")
+    for i, png_file_tuple, barcode in locate_cover_sheets_iter(
+            timed_iter(page_tuples,timing,'rasterize'),output_dir,match_re,None,
+            number_of_pages,jobs,prefilter_threshold,stats):
+        if clean_up_png_files_p and isinstance(png_file_tuple[0],str):
             os.remove(os.path.join(output_dir,png_file_tuple[0]))
-    pdf_length = pdf.pdf_number_of_pages(pdf_file_spec)
-    page_ranges = generate_page_ranges(cover_sheet_indices,
-                                       png_file_page_number_tuples,
-                                       pdf_length)
-    output_file_names = generate_output_file_names(cover_sheet_barcodes,
-                                                   cover_sheet_indices,
-                                                   output_dir)
-    pdf.pdf_split(pdf_file_spec,output_file_names,page_ranges)
-    lg.info(json1.json_msg(40,
-             ['Analysis and burst completed'],
-             False,
-             files=output_file_names,
-             data={
-                 'barcodes': cover_sheet_barcodes,
-                 'indices': cover_sheet_indices
-             }
-    ))
-    return True
-
-def pdfxcb_split_after (pdf_file_spec,output_dir,split_after_n_pp):
+        if barcode:
+            if cover_sheet_pages:
+                split_previous(png_file_tuple[1]-1)
+            cover_sheet_barcodes.append(barcode)
+            cover_sheet_indices.append(i)
+            cover_sheet_pages.append(png_file_tuple[1])
+    if cover_sheet_pages:
+        split_previous(number_of_pages)
+    print(cover_sheet_barcodes)
+    # as with GENERATE_PAGE_RANGES, include the imaginary cover sheet at the end
+    return (cover_sheet_barcodes,
+            cover_sheet_indices + [number_of_pages],
+            output_file_names)
+
+def pdfxcb_split_after (pdf_file_spec,output_dir,split_after_n_pp,jobs=None):
     """
     Given the file specified by PDF_FILE_SPEC, split the PDF after
     every SPLIT_AFTER pages. Name output file(s) based page ranges.
-    Write files to directory specified by OUTPUT_DIR. Return True.
+    Write files to directory specified by OUTPUT_DIR using up to JOBS
+    worker processes (see pdf.pdf_split_streaming). Return the code
+    40 log record (see json1.json_burst_completed_obj).
     """
     global lg
     file_and_dir_sanity_checks([output_dir],[pdf_file_spec])
-    pdf_length = pdf.pdf_number_of_pages(pdf_file_spec)
+    pdf_length = pdf.pdf_page_count(pdf_file_spec)
     page_ranges = generate_page_ranges_split_after(split_after_n_pp,
                                                    pdf_length)
     output_file_names = generate_output_file_names_split_after(page_ranges,
                                                                output_dir)
-    pdf.pdf_split(pdf_file_spec,output_file_names,page_ranges)
-    lg.info(json1.json_msg(40,
-             ['Analysis and burst completed'],
-             False,
-             files=output_file_names,
-             data={
-                 #'barcodes': cover_sheet_barcodes,
-                 #'indices': cover_sheet_indices
-             }
-    ))
-    return True
+    start = time.perf_counter()
+    bytes_written, peak_worker_rss = pdf.pdf_split_streaming(pdf_file_spec,
+                                                             output_file_names,
+                                                             page_ranges,
+                                                             jobs)
+    timing = burst_timing({'split': time.perf_counter() - start},
+                          start,pdf_length,sum(bytes_written),{})
+    lg.info(json1.json_burst_timing(pdf_file_spec,timing))
+    burst_completed = json1.json_burst_completed_obj(
+        output_file_names,
+        pdf_file_spec,
+        {
+            #'barcodes': cover_sheet_barcodes,
+            #'indices': cover_sheet_indices
+            'timing': timing,
+            'memory': {
+                'peak_rss_kb': pdf.peak_rss(),
+                'peak_worker_rss_kb': peak_worker_rss
+            }
+        })
+    lg.info(json.dumps(burst_completed))
+    return burst_completed
 
 def directory_sanity_check (directory_spec,exitp):
     if not os.path.isdir(directory_spec):
@@ -319,6 +1187,24 @@ def file_sanity_checks (files,exitp):
     for file in files:
         file_sanity_check(file,True)
 
+def locate_embedded_images (session):
+    """
+    Return the images embedded in the PDF of the pdf.PdfSession
+    SESSION as a list of tuples as returned by
+    pdf.pdf_image_xobjects.
+    """
+    try:
+        image_xobjects = pdf.pdf_image_xobjects(session)
+    except Exception as e:
+        lg.debug(str(e))
+        msg = json1.json_failed_to_convert_pdf(e,session.path)
+        lg.error(msg)
+        lg.info(json1.json_last_log_msg())
+        sys.exit(msg)
+    else:
+        lg.info(json1.json_pdf_to_pngs_success(session.path,None))
+        return image_xobjects
+
 def invoke_pdfimages_on (pdf_file_spec,output_dir):
     """
     Extract images in PDF file specified by PDF_FILE_SPEC into a
@@ -360,20 +1246,25 @@ def module_sanity_checks (module_names,exitp):
 
 def module_sanity_check (module_name,exitp):
     """MODULE_NAME is a string"""
-    try:
-        imp.find_module(module_name)
-    except ImportError:
+    if importlib.util.find_spec(module_name) is None:
         msg = json1.json_msg_module_not_accessible(module_name)
         lg.error(msg)
         lg.info(json1.json_last_log_msg())
         if exitp:
             sys.exit(msg)
 
-def split_pdf_to_png_files (pdf_file_spec,output_dir):
+def split_pdf_to_png_files (pdf_file_spec,output_dir,jobs=None,region=None,
+                            session=None,page_numbers=None,resolution=None):
     """
     Split the PDF file specified by PDF_FILE_SPEC into a series of
     files, each representing a single page as a PNG image. Write files
-    to the directory specified by OUTPUT_DIR.
+    to the directory specified by OUTPUT_DIR. Pages are rasterized by
+    up to JOBS concurrent processes. If REGION is a list, only that
+    region of each page is rasterized. If SESSION is a pdf.PdfSession
+    for PDF_FILE_SPEC, it is used rather than parsing the PDF again.
+    If PAGE_NUMBERS, an ascending list of page numbers, is specified,
+    only those pages are rasterized. RESOLUTION is the rendering
+    resolution in DPI.
 
     Return a list of tuples where the first member of each tuple is a
     string representing the file name and the second member of each
@@ -389,7 +1280,9 @@ def split_pdf_to_png_files (pdf_file_spec,output_dir):
             sys.exit(msg)
         else:
             # array of (<file_name>,<page_number>) tuples
-            png_specs = pdf.pdf_to_pngs(pdf_file_spec,output_dir)
+            png_specs = pdf.pdf_to_pngs(session or pdf_file_spec,output_dir,jobs,region,
+                                        resolution=resolution,
+                                        page_numbers=page_numbers)
     except Exception as e:
         msg = json1.json_failed_to_convert_pdf(e,pdf_file_spec)
         lg.error(msg)
@@ -460,19 +1353,161 @@ def main():
                         dest="region",
                         nargs=4,
                         type=float)
+    parser.add_argument("--jobs",
+                        help="maximum number of concurrent worker processes (default: one per core)",
+                        action="store",
+                        default=None,
+                        dest="jobs",
+                        type=int)
+    parser.add_argument("--in-memory",
+                        help="rasterize pages into memory rather than writing PNG files (requires -r)",
+                        action="store_true",
+                        dest="in_memory_p")
+    parser.add_argument("--symbologies",
+                        help="decode only the specified barcode symbologies (e.g., code128); default: all",
+                        action="store",
+                        dest="symbologies",
+                        nargs='+',
+                        choices=barScan.zbar_symbologies,
+                        type=str)
+    parser.add_argument("--density",
+                        help="scan every Nth pixel row and column (zbar x-density and y-density)",
+                        action="store",
+                        default=None,
+                        dest="density",
+                        type=int)
+    parser.add_argument("--scales",
+                        help="scale factors (0 to 1.0) at which to scan each image, in order (default: 1.0 0.5)",
+                        action="store",
+                        dest="scales",
+                        nargs='+',
+                        type=float)
+    parser.add_argument("--adaptive-scales",
+                        help="first try the scale factor which most recently yielded a barcode (in each scan worker)",
+                        action="store_true",
+                        dest="adaptive_scales_p")
+    parser.add_argument("--adaptive-region",
+                        help="scan first the part of the scan region where the first barcodes were found",
+                        action="store_true",
+                        dest="adaptive_region_p")
+    parser.add_argument("--prefilter",
+                        help="skip pages without barcode-like structure; optional argument: minimum number of bar edges (default: %d)" % barScan.PREFILTER_THRESHOLD,
+                        action="store",
+                        default=None,
+                        const=barScan.PREFILTER_THRESHOLD,
+                        dest="prefilter_threshold",
+                        nargs='?',
+                        type=int)
+    parser.add_argument("--streaming",
+                        help="overlap rasterization, scanning, and splitting (requires -r)",
+                        action="store_true",
+                        dest="streaming_p")
+    parser.add_argument("--window",
+                        help="with --streaming, approximate maximum number of rendered pages held at once (default: 32)",
+                        action="store",
+                        default=32,
+                        dest="window",
+                        type=int)
+    parser.add_argument("--engine",
+                        help="rasterize every page, extract embedded images, or choose per page (default: auto with -r, extract otherwise)",
+                        action="store",
+                        default=None,
+                        dest="engine",
+                        choices=['auto','rasterize','extract'],
+                        type=str)
+    parser.add_argument("--coarse-dpi",
+                        help="with -r, render every page at this resolution first and render again, at --fine-dpi, only pages with bars but no barcode decoded",
+                        action="store",
+                        default=None,
+                        dest="coarse_dpi",
+                        type=int)
+    parser.add_argument("--fine-dpi",
+                        help="with -r, resolution at which pages are rendered for scanning (default: %d)" % pdf.PDFTOPPM_RESOLUTION,
+                        action="store",
+                        default=None,
+                        dest="fine_dpi",
+                        type=int)
+    parser.add_argument("--extract-scale",
+                        help="without -r, decode embedded JPEG images downscaled to this scale factor (0 to 1.0)",
+                        action="store",
+                        default=None,
+                        dest="extract_scale",
+                        type=float)
+    parser.add_argument("--cache",
+                        help="path to a database caching barcode scan results by page content",
+                        action="store",
+                        dest="scan_cache",
+                        type=str)
+    parser.add_argument("--cache-size",
+                        help="with --cache, maximum number of cached scan results (default: %d)" % cache.default_max_entries,
+                        action="store",
+                        default=None,
+                        dest="scan_cache_size",
+                        type=int)
+    parser.add_argument("--incremental",
+                        help="keep the state of the run in the output directory and, on the next run, process only pages appended to the PDF since",
+                        action="store_true",
+                        dest="incremental_p")
+    parser.add_argument("--resume",
+                        help="resume an interrupted run from the checkpoint journal in the output directory",
+                        action="store_true",
+                        dest="resume_p")
     parser.add_argument("-l",
                         help="integer between 0 (verbose) and 51 (terse) defining logging",
                         action="store",
                         dest="log_level",
                         type=int)
+    parser.add_argument("--progress-interval",
+                        help="log progress once N seconds have passed since the previous progress message (default: %g)" % jsonlog.PROGRESS_INTERVAL,
+                        action="store",
+                        default=None,
+                        dest="progress_interval",
+                        type=float)
+    parser.add_argument("--progress-percent",
+                        help="log progress once N percent of the pages have been processed since the previous progress message (default: %g)" % jsonlog.PROGRESS_PERCENT,
+                        action="store",
+                        default=None,
+                        dest="progress_percent",
+                        type=float)
     # https://stackoverflow.com/questions/458550/standard-way-to-embed-version-into-python-package
     parser.add_argument('-v', '--version', action='version', version="0.0.3")
     parser.add_argument('--debug',
                         help="do not clean up files used during processing"
                         )
-    parser.add_argument("input_files", help="one or more input (PDF) files",
-                        # keep nargs as we may want to accept multiple PDFs as input at some point
-                        nargs=1,
+    parser.add_argument("--list-file",
+                        help="file listing additional input (PDF) files, one per line",
+                        action="store",
+                        dest="list_file",
+                        type=str)
+    parser.add_argument("--watch",
+                        help="run as a daemon processing PDF files as they arrive in the specified directory",
+                        action="store",
+                        dest="watch_dir",
+                        type=str)
+    parser.add_argument("--poll-interval",
+                        help="with --watch, seconds between checks for new PDF files (default: 2)",
+                        action="store",
+                        default=2.0,
+                        dest="poll_interval",
+                        type=float)
+    parser.add_argument("--serve",
+                        help="run as a split service listening on HOST:PORT (e.g., 127.0.0.1:8070)",
+                        action="store",
+                        dest="serve_address",
+                        type=str)
+    parser.add_argument("--serve-unix",
+                        help="run as a split service listening on the specified Unix socket",
+                        action="store",
+                        dest="serve_unix_socket",
+                        type=str)
+    parser.add_argument("--queue-depth",
+                        help="with --serve or --serve-unix, maximum number of requests waiting for a worker (default: number of jobs)",
+                        action="store",
+                        default=None,
+                        dest="queue_depth",
+                        type=int)
+    parser.add_argument("input_files", help="one or more input (PDF) files or glob patterns; with more than one file, each file's output is written to a subdirectory of the output directory",
+                        nargs='*',
                         type=str)
     args = parser.parse_args()
     #
@@ -488,44 +1523,115 @@ def main():
         logfile = args.log_file
     else:
         logfile = 'busca.log'
-    json_log_format = '%(message)s'
-    for handler in lg.getLogger().handlers:
-        lg.getLogger().removeHandler(handler)
-    formatter = logging.Formatter(json_log_format)
     # sanity check for existence of log file directory
     if (os.path.dirname(logfile) and
         not os.path.exists(os.path.dirname(logfile))):
         raise Exception(str.format("log file directory {0} not present",
                                    os.path.dirname(logfile)))
-    file_handler = logging.FileHandler(logfile,'w')
-    file_handler.setFormatter(formatter)
-    lg.getLogger().addHandler(file_handler)
-    lg.getLogger().setLevel(log_level)
+    pdf_file_specs = expand_input_files(args.input_files,args.list_file)
+    # records are written by a background thread only if worker
+    # processes log (see jsonlog.start_logging); watch, serve, and
+    # batch runs always start worker processes
+    log_jobs = args.jobs
+    if (args.watch_dir or args.serve_address or args.serve_unix_socket or
+        len(pdf_file_specs) > 1):
+        log_jobs = None
+    jsonlog.start_logging(logfile,log_level,jobs=log_jobs)
+    jsonlog.configure_progress(args.progress_interval,args.progress_percent)
     if args.identifier:
         identifier = args.identifier
     else:
         identifier = str(uuid.uuid1())
+    engine = args.engine
     rasterize_p = False
     if args.region:
         region = args.region
-        rasterize_p = True  # if region is specified, rasterize_p should be true
+        # with a region, the engine is chosen per page by default
+        rasterize_p = True
         # lg.debug("args.region: %s", args.region)
     else:
         region = None
+    if engine is None:
+        engine = 'auto' if rasterize_p else 'extract'
     # 1000[0-9][0-9][0-9]$ matches on tt user id
     match_re_string = args.match_re_string
     lg.debug(match_re_string)
     match_re = None
     if match_re_string:
         match_re = re.compile(match_re_string)
-    pdf_file_spec = args.input_files[0]
-    lg.debug(pdf_file_spec)
-    lg.info(json1.json_first_log_msg(identifier, files = [pdf_file_spec] ))
+    barScan.configure_scanner(symbologies=args.symbologies,
+                              x_density=args.density,
+                              y_density=args.density,
+                              scales=args.scales,
+                              adaptive_scales_p=args.adaptive_scales_p,
+                              adaptive_region_p=args.adaptive_region_p)
+    pdfxcb_args = {
+        'match_re': match_re,
+        'rasterize_p': rasterize_p,
+        'region': region,
+        'clean_up_png_files_p': not args.debug,
+        'in_memory_p': args.in_memory_p,
+        'prefilter_threshold': args.prefilter_threshold,
+        'streaming_p': args.streaming_p,
+        'window': args.window,
+        'scan_cache': args.scan_cache,
+        'scan_cache_size': args.scan_cache_size,
+        'extract_scale': args.extract_scale,
+        'engine': engine,
+        'resume_p': args.resume_p,
+        'incremental_p': args.incremental_p,
+        'coarse_dpi': args.coarse_dpi,
+        'fine_dpi': args.fine_dpi
+    }
+    if args.watch_dir:
+        # imported here since pdfxcb.watch imports this module
+        # (a plain import would make PDFXCB a local variable of MAIN)
+        from pdfxcb import watch
+        lg.info(json1.json_first_log_msg(identifier, files = [args.watch_dir] ))
+        # runs until terminated (see SIGNAL_HANDLER)
+        watch.watch(args.watch_dir,
+                    args.output_dir,
+                    args.split_after_n_pp,
+                    pdfxcb_args,
+                    jobs=args.jobs,
+                    poll_interval=args.poll_interval)
+        return
+    if args.serve_address or args.serve_unix_socket:
+        # imported here since pdfxcb.server imports this module
+        from pdfxcb import server
+        host, port = '127.0.0.1', 8070
+        if args.serve_address:
+            host, sep, port = args.serve_address.rpartition(':')
+            host = host or '127.0.0.1'
+            port = int(port)
+        lg.info(json1.json_first_log_msg(identifier, files = [] ))
+        # runs until terminated (see SIGNAL_HANDLER)
+        server.serve(args.output_dir,
+                     host=host,
+                     port=port,
+                     unix_socket=args.serve_unix_socket,
+                     pdfxcb_args=pdfxcb_args,
+                     jobs=args.jobs,
+                     queue_depth=args.queue_depth)
+        return
+    if not pdf_file_specs:
+        parser.error("at least one input file must be specified")
+    pdf_file_spec = pdf_file_specs[0]
+    lg.debug(pdf_file_specs)
+    lg.info(json1.json_first_log_msg(identifier, files = pdf_file_specs ))
     # generic debugging
     lg.debug(os.getcwd())         # current/working directory
     # might also want to import platform to get architecture, other details...
-    if (args.split_after_n_pp > 0):
-        pdfxcb_split_after(pdf_file_spec,args.output_dir,args.split_after_n_pp)
+    if len(pdf_file_specs) > 1:
+        pdfxcb_batch(pdf_file_specs,
+                     args.output_dir,
+                     args.split_after_n_pp,
+                     pdfxcb_args,
+                     jobs=args.jobs)
+        lg.info(json1.json_last_log_msg())
+    elif (args.split_after_n_pp > 0):
+        pdfxcb_split_after(pdf_file_spec,args.output_dir,args.split_after_n_pp,
+                           jobs=args.jobs)
     else:
         try:
             pdfxcb(pdf_file_spec,
@@ -533,7 +1639,20 @@ def main():
                    match_re,
                    rasterize_p,
                    region,
-                   not args.debug #clean_up_png_files_p
+                   not args.debug, #clean_up_png_files_p
+                   jobs=args.jobs,
+                   in_memory_p=args.in_memory_p,
+                   prefilter_threshold=args.prefilter_threshold,
+                   streaming_p=args.streaming_p,
+                   window=args.window,
+                   scan_cache=args.scan_cache,
+                   scan_cache_size=args.scan_cache_size,
+                   extract_scale=args.extract_scale,
+                   engine=engine,
+                   resume_p=args.resume_p,
+                   incremental_p=args.incremental_p,
+                   coarse_dpi=args.coarse_dpi,
+                   fine_dpi=args.fine_dpi
                    )
         except Exception as e:
             lg.error("Crash and burn")
@@ -0,0 +1,234 @@
+import concurrent.futures
+import http.server
+import json
+import os
+import os.path
+import re
+import socketserver
+import sys
+import threading
+import time
+import urllib.parse
+import uuid
+
+import logging
+
+import pdfxcb.barScan as barScan
+import pdfxcb.json1 as json1
+import pdfxcb.jsonlog as jsonlog
+import pdfxcb.pdfxcb as pdfxcb
+
+
+lg=logging
+
+
+class SplitRequestHandler(http.server.BaseHTTPRequestHandler):
+    """
+    Handle POST /split requests. The request body is the PDF file. The
+    query string may specify the split parameters region (four
+    comma-separated values, see pdfxcb.pdfxcb), match_re, and
+    split_after_n_pp. The response is the code 40 log record (see
+    json1.json_burst_completed_obj) with an additional timing slot.
+    """
+    def do_POST(self):
+        request_start = time.time()
+        url = urllib.parse.urlsplit(self.path)
+        if url.path != '/split':
+            self.send_json(404,json1.json_msg_obj(136,'Not found'))
+            return
+        try:
+            split_after_n_pp, pdfxcb_args = split_parameters(
+                urllib.parse.parse_qs(url.query),
+                self.server.pdfxcb_args)
+            content_length = int(self.headers.get('Content-Length',0))
+        except ValueError as e:
+            self.send_json(400,json1.json_msg_obj(138,['Invalid request',str(e)]))
+            return
+        if content_length <= 0:
+            self.send_json(400,json1.json_msg_obj(138,['Invalid request','empty body']))
+            return
+        # back-pressure: refuse the request rather than queue it without bound
+        if not self.server.slots.acquire(blocking=False):
+            self.send_json(503,json1.json_msg_obj(139,'Server busy'))
+            return
+        try:
+            try:
+                request_output_dir, pdf_file_spec = self.receive_pdf(content_length)
+            except ValueError as e:
+                self.send_json(400,json1.json_msg_obj(138,['Invalid request',str(e)]))
+                return
+            except OSError as e:
+                response = json1.json_msg_obj(111,['Failed to receive PDF file',str(e)])
+                lg.error(json.dumps(response))
+                self.send_json(500,response)
+                return
+            upload_end = time.time()
+            try:
+                future = self.server.executor.submit(service_job,
+                                                     pdf_file_spec,
+                                                     request_output_dir,
+                                                     split_after_n_pp,
+                                                     pdfxcb_args)
+                burst_completed, error, processing_start, processing_end = future.result()
+            except Exception as e:
+                # e.g., a worker process died
+                lg.error(json1.json_failed_to_process_pdf(e,pdf_file_spec))
+                self.send_json(500,json1.json_msg_obj(111,['Failed to process PDF file',str(e)]))
+                return
+        finally:
+            self.server.slots.release()
+        timing = {
+            'upload': upload_end - request_start,
+            'queued': processing_start - upload_end,
+            'processing': processing_end - processing_start,
+            'total': time.time() - request_start
+        }
+        lg.info(json1.json_request_completed(self.path,timing))
+        if burst_completed:
+            burst_completed['timing'] = timing
+            self.send_json(200,burst_completed)
+        else:
+            response = json1.json_msg_obj(111,['Failed to process PDF file',error])
+            response['timing'] = timing
+            self.send_json(500,response)
+
+    def receive_pdf(self, content_length):
+        """
+        Write the request body, CONTENT_LENGTH bytes, to the file
+        input.pdf in a new subdirectory of the server's output
+        directory. Return multiple values: the subdirectory and the
+        file. Raise ValueError if the body is cut short.
+        """
+        request_output_dir = os.path.join(self.server.output_dir,str(uuid.uuid1()))
+        os.makedirs(request_output_dir)
+        pdf_file_spec = os.path.join(request_output_dir,'input.pdf')
+        with open(pdf_file_spec,'wb') as f:
+            remaining = content_length
+            while remaining > 0:
+                chunk = self.rfile.read(min(remaining,1 << 20))
+                if not chunk:
+                    raise ValueError(f'body ended {remaining} bytes short of Content-Length')
+                f.write(chunk)
+                remaining = remaining - len(chunk)
+        return request_output_dir, pdf_file_spec
+
+    def send_json(self, status, obj):
+        body = json.dumps(obj).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type','application/json')
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def address_string(self):
+        # a Unix socket has no client address
+        if isinstance(self.client_address,tuple):
+            return self.client_address[0]
+        return 'unix'
+
+    def log_message(self, format, *args):
+        lg.debug(format % args)
+
+
+class SplitServer(socketserver.ThreadingMixIn, http.server.HTTPServer):
+    """HTTP server for SplitRequestHandler listening on a TCP port."""
+    daemon_threads = True
+
+
+class UnixSplitServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    """HTTP server for SplitRequestHandler listening on a Unix socket."""
+    daemon_threads = True
+
+
+def serve (output_dir,host='127.0.0.1',port=8070,unix_socket=None,
+           pdfxcb_args=None,jobs=None,queue_depth=None):
+    """
+    Serve split requests (see SplitRequestHandler) on HOST:PORT or, if
+    UNIX_SOCKET is specified, on the Unix socket at that path, until
+    the process is asked to terminate (see pdfxcb.signal_handler).
+
+    Each request is processed by one of a pool of JOBS (None indicates
+    one per core) worker processes using the keyword arguments
+    PDFXCB_ARGS for pdfxcb.pdfxcb, overridden by the request's
+    parameters. Uploaded PDF files and output files are written to a
+    new subdirectory of OUTPUT_DIR for each request. At most
+    QUEUE_DEPTH (default: JOBS) requests wait for a worker; further
+    requests are refused with status 503.
+    """
+    if (not output_dir):
+        sys.exit("The output directory must be specified.")
+    pdfxcb.directory_sanity_checks([output_dir],True)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    if queue_depth is None:
+        queue_depth = jobs
+    if unix_socket:
+        if os.path.exists(unix_socket):
+            os.remove(unix_socket)
+        server = UnixSplitServer(unix_socket,SplitRequestHandler)
+    else:
+        server = SplitServer((host,port),SplitRequestHandler)
+    server.output_dir = output_dir
+    server.pdfxcb_args = dict(pdfxcb_args or {},jobs=1)
+    server.slots = threading.BoundedSemaphore(jobs+queue_depth)
+    server.executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=pdfxcb.batch_worker_init,
+        initargs=(barScan.scanner_config(),False,jsonlog.worker_config()))
+    lg.info(json1.json_progress(f'serving on {unix_socket or (host,port)}'))
+    try:
+        server.serve_forever()
+    finally:
+        server.server_close()
+        server.executor.shutdown(wait=True,cancel_futures=True)
+        if unix_socket and os.path.exists(unix_socket):
+            os.remove(unix_socket)
+
+def service_job (pdf_file_spec,output_dir,split_after_n_pp,pdfxcb_args):
+    """
+    Process a single uploaded PDF file on behalf of SERVE. Return
+    multiple values: the code 40 log record (None on failure), a
+    string describing the failure (None on success), and the times at
+    which processing started and ended.
+    """
+    processing_start = time.time()
+    burst_completed = None
+    error = None
+    try:
+        if (split_after_n_pp > 0):
+            burst_completed = pdfxcb.pdfxcb_split_after(pdf_file_spec,output_dir,
+                                                        split_after_n_pp,
+                                                        jobs=1)
+        else:
+            burst_completed = pdfxcb.pdfxcb(pdf_file_spec,output_dir,**pdfxcb_args)
+    except (Exception,SystemExit) as e:
+        error = str(e)
+        lg.error(json1.json_failed_to_process_pdf(e,pdf_file_spec))
+    finally:
+        if os.path.exists(pdf_file_spec):
+            os.remove(pdf_file_spec)
+    return burst_completed, error, processing_start, time.time()
+
+def split_parameters (query,default_pdfxcb_args):
+    """
+    Return multiple values: the split_after_n_pp value and the keyword
+    arguments for pdfxcb.pdfxcb specified by QUERY, a dictionary as
+    returned by urllib.parse.parse_qs, and DEFAULT_PDFXCB_ARGS. Raise
+    ValueError if a value is invalid.
+    """
+    pdfxcb_args = dict(default_pdfxcb_args)
+    split_after_n_pp = 0
+    if 'split_after_n_pp' in query:
+        split_after_n_pp = int(query['split_after_n_pp'][0])
+    if 'region' in query:
+        region = [float(value) for value in query['region'][0].split(',')]
+        if len(region) != 4 or not all(0 <= value <= 1 for value in region):
+            raise ValueError('region must be four comma-separated values between 0 and 1')
+        pdfxcb_args['region'] = region
+        pdfxcb_args['rasterize_p'] = True
+    if 'match_re' in query:
+        try:
+            pdfxcb_args['match_re'] = re.compile(query['match_re'][0])
+        except re.error as e:
+            raise ValueError(str(e))
+    return split_after_n_pp, pdfxcb_args
@@ -0,0 +1,187 @@
+import concurrent.futures
+import os
+import os.path
+import shutil
+import signal
+import sys
+import time
+import uuid
+
+import logging
+
+import pdfxcb.barScan as barScan
+import pdfxcb.json1 as json1
+import pdfxcb.jsonlog as jsonlog
+import pdfxcb.pdfxcb as pdfxcb
+
+
+lg=logging
+
+# subdirectories of the watched directory receiving input files once
+# processed
+processed_subdir = 'processed'
+failed_subdir = 'failed'
+
+
+def watch (watch_dir,output_dir,split_after_n_pp,pdfxcb_args,
+           jobs=None,poll_interval=2.0):
+    """
+    Process PDF files as they arrive in the directory WATCH_DIR until
+    the process is asked to terminate (see pdfxcb.signal_handler).
+
+    Each PDF file is processed with pdfxcb.pdfxcb_split_after (if
+    SPLIT_AFTER_N_PP is positive) or pdfxcb.pdfxcb, using the keyword
+    arguments PDFXCB_ARGS, by one of a pool of JOBS (None indicates
+    one per core) worker processes started once and kept warm. Output
+    files are written to a new subdirectory of OUTPUT_DIR named after
+    the PDF file. Once processed, the PDF file is moved to the
+    processed (or failed) subdirectory of WATCH_DIR.
+
+    New files are detected with inotify when the inotify_simple module
+    is available. Otherwise, WATCH_DIR is polled every POLL_INTERVAL
+    seconds and a file is processed once its size and modification
+    time are unchanged between two polls.
+    """
+    if (not output_dir):
+        sys.exit("The output directory must be specified.")
+    pdfxcb.directory_sanity_checks([watch_dir,output_dir],True)
+    for subdir in [processed_subdir,failed_subdir]:
+        os.makedirs(os.path.join(watch_dir,subdir),exist_ok=True)
+    pdfxcb_args = dict(pdfxcb_args,jobs=1)
+    inotify = watch_inotify(watch_dir)
+    if jobs is None:
+        jobs = os.cpu_count() or 1
+    # PDF file name -> future
+    in_progress = {}
+    # PDF file name -> (size, mtime) at previous poll
+    previous_stats = {}
+    executor = concurrent.futures.ProcessPoolExecutor(
+        max_workers=jobs,
+        initializer=watch_worker_init,
+        initargs=(barScan.scanner_config(),split_after_n_pp > 0,
+                  jsonlog.worker_config()))
+    lg.info(json1.json_progress(f'watching {watch_dir}'))
+    try:
+        # with inotify, files present at start-up are processed immediately
+        ready = pdf_files_in(watch_dir) if inotify else []
+        while True:
+            for pdf_file_name in ready:
+                if pdf_file_name in in_progress:
+                    continue
+                pdf_file_spec = os.path.join(watch_dir,pdf_file_name)
+                in_progress[pdf_file_name] = executor.submit(
+                    watch_job,
+                    pdf_file_spec,
+                    unique_output_dir(output_dir,pdf_file_name),
+                    split_after_n_pp,
+                    pdfxcb_args)
+            if in_progress:
+                concurrent.futures.wait(
+                    list(in_progress.values()),
+                    timeout=0 if inotify else poll_interval,
+                    return_when=concurrent.futures.FIRST_COMPLETED)
+            for pdf_file_name, future in list(in_progress.items()):
+                if future.done():
+                    del in_progress[pdf_file_name]
+                    subdir = processed_subdir if future.result() else failed_subdir
+                    shutil.move(os.path.join(watch_dir,pdf_file_name),
+                                os.path.join(watch_dir,subdir,pdf_file_name))
+            if inotify:
+                ready = [event.name for event in inotify.read(timeout=int(poll_interval*1000))
+                         if event.name.lower().endswith('.pdf')]
+            else:
+                if not in_progress:
+                    time.sleep(poll_interval)
+                ready = stable_pdf_files_in(watch_dir,previous_stats)
+    finally:
+        # let running jobs complete; discard jobs not yet started
+        executor.shutdown(wait=True,cancel_futures=True)
+        if inotify:
+            inotify.close()
+
+def watch_inotify (watch_dir):
+    """
+    Return an inotify_simple.INotify object watching WATCH_DIR for
+    files written or moved into WATCH_DIR or, if inotify_simple is not
+    available, None.
+    """
+    try:
+        import inotify_simple
+    except ImportError:
+        return None
+    inotify = inotify_simple.INotify()
+    inotify.add_watch(watch_dir,
+                      inotify_simple.flags.CLOSE_WRITE |
+                      inotify_simple.flags.MOVED_TO)
+    return inotify
+
+def watch_job (pdf_file_spec,output_dir,split_after_n_pp,pdfxcb_args):
+    """
+    Process a single PDF file on behalf of WATCH. Log the same records
+    as a command-line invocation. Return True on success and False on
+    failure.
+    """
+    lg.info(json1.json_first_log_msg(str(uuid.uuid1()), files = [pdf_file_spec] ))
+    result = pdfxcb.pdfxcb_batch_job(pdf_file_spec,output_dir,
+                                     split_after_n_pp,pdfxcb_args)
+    lg.info(json1.json_last_log_msg())
+    return result
+
+def watch_worker_init (scanner_config,split_after_p,log_config=None):
+    """
+    Prepare a warm worker process for WATCH (see
+    pdfxcb.batch_worker_init). Workers ignore interrupts, hangups, and
+    termination requests so that, on such a request, the parent can
+    let running jobs complete; otherwise pdfxcb.signal_handler would
+    end the job with SystemExit and its PDF file would be moved to the
+    failed subdirectory.
+    """
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    pdfxcb.batch_worker_init(scanner_config,split_after_p,log_config)
+
+def pdf_files_in (directory):
+    """Return the names of the PDF files in DIRECTORY."""
+    return sorted(name for name in os.listdir(directory)
+                  if (name.lower().endswith('.pdf') and
+                      os.path.isfile(os.path.join(directory,name))))
+
+def stable_pdf_files_in (directory,previous_stats):
+    """
+    Return the names of the PDF files in DIRECTORY whose size and
+    modification time are unchanged since the previous call. Update
+    PREVIOUS_STATS, a dictionary mapping file names to (size, mtime)
+    tuples, accordingly.
+    """
+    stable = []
+    current_stats = {}
+    for name in pdf_files_in(directory):
+        try:
+            stat = os.stat(os.path.join(directory,name))
+        except FileNotFoundError:
+            continue
+        current_stats[name] = (stat.st_size,stat.st_mtime)
+        if previous_stats.get(name) == current_stats[name]:
+            stable.append(name)
+    previous_stats.clear()
+    previous_stats.update(current_stats)
+    return stable
+
+def unique_output_dir (output_dir,pdf_file_name):
+    """
+    Create and return a new subdirectory of OUTPUT_DIR named after
+    PDF_FILE_NAME. The directory is created here, rather than by the
+    job, so that two files with the same name submitted in turn are
+    never assigned the same directory.
+    """
+    input_file_name_only, input_file_suffix = os.path.splitext(pdf_file_name)
+    file_output_dir = os.path.join(output_dir,input_file_name_only)
+    version = 0
+    while True:
+        try:
+            os.mkdir(file_output_dir)
+            return file_output_dir
+        except FileExistsError:
+            version = version + 1
+            file_output_dir = os.path.join(output_dir,f'{input_file_name_only}-{version}')
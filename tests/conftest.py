@@ -0,0 +1,72 @@
+import os
+import sys
+
+import pytest
+
+
+sys.path.insert(0,os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),'src'))
+
+
+def write_pdf(path,groups,media_box=(0,0,300,400)):
+    """
+    Write a PDF file to PATH with a two-level page tree: the root
+    /Pages node, defining MEDIA_BOX and a font resource inherited by
+    every page, has one intermediate /Pages node per member of GROUPS,
+    a list of lists of page specifications. A page specification is
+    None or the page's own media box. The content stream of page N
+    shows the text "page N".
+    """
+    objects = {}
+    next_number = [4]
+    def allocate ():
+        number = next_number[0]
+        next_number[0] = number + 1
+        return number
+    objects[1] = b'<< /Type /Catalog /Pages 2 0 R >>'
+    objects[3] = b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>'
+    group_numbers = []
+    page_number = 0
+    for group in groups:
+        group_number = allocate()
+        group_numbers.append(group_number)
+        kid_numbers = []
+        for own_media_box in group:
+            page_number = page_number + 1
+            content = 'BT /F1 12 Tf 10 10 Td (page {}) Tj ET'.format(page_number).encode('ascii')
+            content_number = allocate()
+            objects[content_number] = (b'<< /Length %d >>\nstream\n' % len(content) +
+                                       content + b'\nendstream')
+            page_object_number = allocate()
+            kid_numbers.append(page_object_number)
+            media_box_entry = b''
+            if own_media_box:
+                media_box_entry = b' /MediaBox [%d %d %d %d]' % tuple(own_media_box)
+            objects[page_object_number] = (b'<< /Type /Page /Parent %d 0 R /Contents %d 0 R%s >>' %
+                                           (group_number,content_number,media_box_entry))
+        objects[group_number] = (b'<< /Type /Pages /Parent 2 0 R /Kids [%s] /Count %d >>' %
+                                 (b' '.join(b'%d 0 R' % n for n in kid_numbers),len(kid_numbers)))
+    objects[2] = (b'<< /Type /Pages /Kids [%s] /Count %d /MediaBox [%d %d %d %d] '
+                  b'/Resources << /Font << /F1 3 0 R >> >> >>' %
+                  ((b' '.join(b'%d 0 R' % n for n in group_numbers),page_number) +
+                   tuple(media_box)))
+    data = b'%PDF-1.4\n'
+    offsets = {}
+    for number in sorted(objects):
+        offsets[number] = len(data)
+        data = data + b'%d 0 obj\n' % number + objects[number] + b'\nendobj\n'
+    xref_offset = len(data)
+    size = max(objects) + 1
+    data = data + b'xref\n0 %d\n0000000000 65535 f \n' % size
+    for number in range(1,size):
+        data = data + b'%010d 00000 n \n' % offsets[number]
+    data = data + (b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' %
+                   (size,xref_offset))
+    with open(path,'wb') as stream:
+        stream.write(data)
+    return path
+
+
+@pytest.fixture
+def pdf_writer():
+    """Provide WRITE_PDF."""
+    return write_pdf
@@ -0,0 +1,180 @@
+import pytest
+
+pytest.importorskip('PyPDF2')
+Image = pytest.importorskip('PIL.Image')
+
+import pdfxcb.pdfxcb as pdfxcb_module
+from pdfxcb import barScan
+from pdfxcb import benchmark
+
+
+@pytest.fixture(autouse=True)
+def scanner(monkeypatch):
+    """Use PIL without zbar; restore the default configuration afterwards."""
+    monkeypatch.setattr(barScan,'Image',Image)
+    monkeypatch.setattr(barScan,'scanning_modules',lambda: None)
+    yield
+    barScan.configure_scanner()
+    barScan.reset_scale_history()
+    barScan.reset_learned_region()
+
+def learned_messages (caplog):
+    return [record.getMessage() for record in caplog.records
+            if record.getMessage().startswith('{"code": 52,')]
+
+def test_learn_region_combines_first_samples(caplog):
+    barScan.configure_scanner(adaptive_region_p=True)
+    caplog.set_level('INFO')
+    for box in [(0.2,0.2,0.4,0.3),(0.3,0.25,0.5,0.35),(0.25,0.2,0.45,0.4),
+                (0.9,0.9,1.0,1.0)]:
+        barScan.learn_region(box)
+    # (0.2,0.2,0.5,0.4) enlarged by half its width and height on each side
+    assert barScan.learned_region() == (0.05,0.1,0.65,0.5)
+    # the fourth box is not learned from
+    assert len(learned_messages(caplog)) == 3
+
+@pytest.mark.parametrize('box,learned_box', [((0.5,0.5,0.51,0.51),(0.405,0.405,0.605,0.605)),
+                                             ((0.0,0.0,0.02,0.02),(0.0,0.0,0.11,0.11))])
+def test_learn_region_minimum_size_and_bounds(box,learned_box):
+    barScan.configure_scanner(adaptive_region_p=True)
+    barScan.learn_region(box)
+    assert barScan.learned_region() == learned_box
+
+def test_learn_region_requires_adaptive_region():
+    barScan.learn_region((0.2,0.2,0.4,0.3))
+    assert barScan.learned_region() is None
+
+def barcode_image (angle=0):
+    """Return a white image showing a CODE-128 barcode rotated by ANGLE degrees."""
+    image = Image.new('L',(400,300),255)
+    benchmark.draw_code128(image,'1234',(0.1,0.3),2,0.3)
+    return image.rotate(angle,expand=True,fillcolor=255)
+
+@pytest.mark.parametrize('angle', [0,90,270])
+def test_prefilter_passes_barcode_at_any_right_angle(angle):
+    pytest.importorskip('numpy')
+    assert barScan.barcode_like_p(barcode_image(angle),barScan.PREFILTER_THRESHOLD)
+
+@pytest.mark.parametrize('image', [Image.new('L',(400,300),255),
+                                   Image.new('L',(1,300),255)])
+def test_prefilter_rejects_blank_page(image):
+    pytest.importorskip('numpy')
+    assert not barScan.barcode_like_p(image,barScan.PREFILTER_THRESHOLD)
+
+def test_coarse_scan_leaves_cover_sheets_for_fine_pass(tmp_path,monkeypatch,pdf_writer):
+    pytest.importorskip('numpy')
+    # cover sheets drawn at 150 DPI, rendered at 75 DPI, upright and
+    # sideways, and a blank page
+    coarse_images = [(barcode_image(angle).reduce(2),page_number)
+                     for page_number, angle in [(1,0),(2,90)]]
+    coarse_images.append((Image.new('L',(200,150),255),3))
+    monkeypatch.setattr(pdfxcb_module.pdf,'pdf_to_images',
+                        lambda *args, **kwargs: iter(coarse_images))
+    # zbar decodes nothing at the coarse resolution
+    monkeypatch.setattr(barScan,'zbar_scan_located',lambda pil: (None,None))
+    stats = {}
+    with pdfxcb_module.pdf.PdfSession(pdf_writer(tmp_path / 'in.pdf',[[None,None,None]])) as session:
+        settled = pdfxcb_module.coarse_scan(session,[1,2,3],75,None,jobs=1,stats=stats)
+    # only the blank page is settled; the cover sheets reach the fine pass
+    assert list(settled) == [3]
+    assert settled[3]['skipped']
+    assert stats['coarse_rejected_pages'] == 1
+    assert 'skipped_pages' not in stats
+
+def fake_zbar (found_size):
+    """Return a zbar_scan_located which finds a barcode only in images of FOUND_SIZE."""
+    scanned_sizes = []
+    def zbar_scan_located (pil):
+        scanned_sizes.append(pil.size)
+        if pil.size == found_size:
+            return 'A', (0.1,0.1,0.2,0.2)
+        return None, None
+    return zbar_scan_located, scanned_sizes
+
+def test_learned_box_miss_falls_back_to_whole_region(monkeypatch):
+    barScan.configure_scanner(adaptive_region_p=True)
+    zbar_scan_located, scanned_sizes = fake_zbar((200,100))
+    monkeypatch.setattr(barScan,'zbar_scan_located',zbar_scan_located)
+    result = barScan.barcode_scan_image(Image.new('L',(200,100),255),None,
+                                        learned_box=(0.0,0.0,0.5,0.5))
+    # the learned box at both scales, then the whole image
+    assert scanned_sizes == [(100,50),(50,25),(200,100)]
+    assert result['barcode'] == 'A'
+    assert not result['learned']
+    assert result['zbar_calls'] == 3
+    assert result['learned_zbar_calls'] == 2
+    assert result['box'] == (0.1,0.1,0.2,0.2)
+
+def test_learned_box_hit(monkeypatch):
+    barScan.configure_scanner(adaptive_region_p=True)
+    zbar_scan_located, scanned_sizes = fake_zbar((100,50))
+    monkeypatch.setattr(barScan,'zbar_scan_located',zbar_scan_located)
+    result = barScan.barcode_scan_image(Image.new('L',(200,100),255),None,
+                                        learned_box=(0.0,0.0,0.5,0.5))
+    assert scanned_sizes == [(100,50)]
+    assert result['learned']
+    assert (result['zbar_calls'], result['learned_zbar_calls']) == (1,1)
+    # only locations within the whole region are learned from
+    assert result['box'] is None
+
+def test_learned_box_requires_adaptive_region(monkeypatch):
+    zbar_scan_located, scanned_sizes = fake_zbar((200,100))
+    monkeypatch.setattr(barScan,'zbar_scan_located',zbar_scan_located)
+    result = barScan.barcode_scan_image(Image.new('L',(200,100),255),None,
+                                        learned_box=(0.0,0.0,0.5,0.5))
+    assert scanned_sizes == [(200,100)]
+    assert result['learned_zbar_calls'] == 0
+
+@pytest.mark.parametrize('adaptive_scales_p,last_scale,ladder', [(False,0.5,[1.0,0.5,0.33]),
+                                                                  (True,None,[1.0,0.5,0.33]),
+                                                                  (True,0.5,[0.5,1.0,0.33]),
+                                                                  (True,0.25,[1.0,0.5,0.33])])
+def test_scale_ladder_order(monkeypatch,adaptive_scales_p,last_scale,ladder):
+    barScan.configure_scanner(scales=[1.0,0.5,0.33],adaptive_scales_p=adaptive_scales_p)
+    monkeypatch.setattr(barScan,'_last_successful_scale',last_scale)
+    assert barScan.scale_ladder() == ladder
+
+@pytest.mark.parametrize('adaptive_scales_p,zbar_calls', [(False,[2,2,2]),(True,[2,1,1])])
+def test_adaptive_scales_reuse_last_successful_scale(monkeypatch,adaptive_scales_p,zbar_calls):
+    barScan.configure_scanner(adaptive_scales_p=adaptive_scales_p)
+    # barcodes are decoded only at half scale
+    zbar_scan_located, scanned_sizes = fake_zbar((100,50))
+    monkeypatch.setattr(barScan,'zbar_scan_located',zbar_scan_located)
+    results = list(pdfxcb_module.scan_images(
+        [Image.new('L',(200,100),255) for page_number in range(3)],None,jobs=1))
+    assert [result['zbar_calls'] for result in results] == zbar_calls
+    assert [result['scale'] for result in results] == [0.5]*3
+    if adaptive_scales_p:
+        assert barScan.scale_ladder() == [0.5,1.0]
+        assert scanned_sizes == [(200,100),(100,50),(100,50),(100,50)]
+
+# scan worker processes are forked, so that they see these stubs in
+# place of pdfxcb.scan_image and pdfxcb.scan_worker_init
+
+def stub_scan_image (image_file_spec,scan_region,prefilter_threshold=None,
+                     learned_box=None):
+    """Report, as the barcode, whether a learned box was handed out."""
+    return {'barcode': 'learned' if learned_box else 'region',
+            'skipped': False,'scale': 1.0,'zbar_calls': 1,
+            'learned_zbar_calls': 1 if learned_box else 0,
+            'seconds': 0.0,'learned': bool(learned_box),
+            'box': None if learned_box else (0.2,0.2,0.4,0.3)}
+
+def stub_scan_worker_init (scanner_config,log_config=None):
+    barScan.configure_scanner(**scanner_config)
+
+@pytest.mark.parametrize('jobs,unlearned', [(1,1),(2,8)])
+def test_region_is_learned_in_page_order(monkeypatch,caplog,jobs,unlearned):
+    monkeypatch.setattr(pdfxcb_module,'scan_image',stub_scan_image)
+    monkeypatch.setattr(pdfxcb_module,'scan_worker_init',stub_scan_worker_init)
+    barScan.configure_scanner(adaptive_region_p=True)
+    caplog.set_level('INFO')
+    stats = {}
+    barcodes, indices = pdfxcb_module.locate_cover_sheets(
+        [(f'{page_number}.png',page_number) for page_number in range(1,13)],
+        '',None,None,jobs=jobs,stats=stats)
+    # the box is learned from the first result; images already handed
+    # out (4*JOBS when scanning in parallel) are scanned without it
+    assert barcodes == ['region']*unlearned + ['learned']*(12-unlearned)
+    assert len(learned_messages(caplog)) == 1
+    assert stats['learned_zbar_calls'] == 12 - unlearned
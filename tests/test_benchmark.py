@@ -0,0 +1,22 @@
+import importlib.util
+import shutil
+
+import pytest
+
+pytest.importorskip('PyPDF2')
+pytest.importorskip('PIL')
+
+from pdfxcb import benchmark
+
+
+def test_run_benchmark_skips_missing_tools(tmp_path):
+    results = benchmark.run_benchmark(str(tmp_path),{'pages': 6,'document_pages': 3,
+                                                     'dpi': 50,'jobs': 1})
+    assert all(results['checks'].values())
+    if not shutil.which('pdftoppm'):
+        assert 'pdf_to_pngs' not in results['stages']
+        assert 'pdf_to_pngs' in results['skipped']
+    if not importlib.util.find_spec('zbar'):
+        assert 'locate_cover_sheets' in results['skipped']
+    assert not set(results['stages']) & set(results['skipped'])
+    assert {'pdf_split','pdfxcb_split_after'} <= set(results['stages'])
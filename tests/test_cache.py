@@ -0,0 +1,85 @@
+import itertools
+
+import pytest
+
+pytest.importorskip('PyPDF2')
+
+import pdfxcb.pdfxcb as pdfxcb_module
+from pdfxcb import cache
+from pdfxcb import pdf
+
+
+# as built by pdfxcb.pdfxcb
+parameters = {'rasterize_p': True,
+              'region': [0,0,0.7,0.5],
+              'resolution': 150,
+              'coarse_dpi': None,
+              'prefilter_threshold': None,
+              'extract_scale': None,
+              'engine': 'auto',
+              'scanner': {'symbologies': None,'x_density': None,'y_density': None,
+                          'scales': [1.0,0.5],'adaptive_scales_p': False,
+                          'adaptive_region_p': False}}
+barcode = {'barcode': 'A1','skipped': False}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Advance the time seen by the cache by one second per call."""
+    seconds = itertools.count()
+    monkeypatch.setattr(cache.time,'time',lambda: float(next(seconds)))
+
+def test_scan_cache_hit_and_miss(tmp_path):
+    with cache.ScanCache(str(tmp_path/'cache.db')) as scan_cache:
+        assert scan_cache.get('a') is None
+        scan_cache.put('a',barcode)
+        assert scan_cache.get('a') == barcode
+        assert scan_cache.stats() == {'cache_hits': 1,'cache_misses': 1}
+    # the results outlive the cache object
+    with cache.ScanCache(str(tmp_path/'cache.db')) as scan_cache:
+        assert scan_cache.get('a') == barcode
+        assert scan_cache.count == 1
+
+def test_scan_cache_evicts_least_recently_used(tmp_path,clock):
+    with cache.ScanCache(str(tmp_path/'cache.db'),max_entries=2) as scan_cache:
+        scan_cache.put('a',barcode)
+        scan_cache.put('b',barcode)
+        # A is now used more recently than B
+        scan_cache.get('a')
+        scan_cache.put('c',barcode)
+        assert scan_cache.count == 2
+        assert scan_cache.get('b') is None
+        assert scan_cache.get('a') == barcode
+        assert scan_cache.get('c') == barcode
+        # replacing a result does not add an entry
+        scan_cache.put('c',{'barcode': None,'skipped': True})
+        assert scan_cache.get('a') == barcode
+
+@pytest.mark.parametrize('changed', [{'scanner': dict(parameters['scanner'],symbologies=['code128'])},
+                                     {'scanner': dict(parameters['scanner'],scales=[0.5,1.0])},
+                                     {'region': [0,0,0.7,0.6]},
+                                     {'prefilter_threshold': 20}])
+def test_scan_cache_key_covers_parameters(changed):
+    key = cache.scan_cache_key('digest',parameters)
+    assert cache.scan_cache_key('digest',dict(parameters)) == key
+    assert cache.scan_cache_key('digest',dict(parameters,**changed)) != key
+    assert cache.scan_cache_key('other digest',parameters) != key
+
+def test_scan_cache_lookup(tmp_path,pdf_writer):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*3])
+    tuples = [(None,1),(None,2),(None,2),(None,3)]
+    with pdf.PdfSession(pdf_file) as session, \
+         cache.ScanCache(str(tmp_path/'cache.db')) as scan_cache:
+        known_results, cache_keys = pdfxcb_module.scan_cache_lookup(session,scan_cache,
+                                                                    tuples,parameters)
+        assert known_results == {}
+        # images on the same page have distinct keys
+        assert len(set(cache_keys.values())) == 4
+        scan_cache.put(cache_keys[2],barcode)
+        known_results, cache_keys = pdfxcb_module.scan_cache_lookup(session,scan_cache,
+                                                                    tuples,parameters)
+        assert known_results == {2: ((None,2),barcode)}
+        assert sorted(cache_keys) == [0,1,3]
+        known_results, cache_keys = pdfxcb_module.scan_cache_lookup(
+            session,scan_cache,tuples,dict(parameters,prefilter_threshold=20))
+        assert known_results == {}
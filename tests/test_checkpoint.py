@@ -0,0 +1,102 @@
+import os
+
+import pytest
+
+pytest.importorskip('PyPDF2')
+
+import pdfxcb.pdfxcb as pdfxcb_module
+from pdfxcb import checkpoint
+from pdfxcb import pdf
+
+
+parameters = {'region': (0,0,0.7,0.5),'resolution': 150}
+barcode = {'barcode': 'A1','skipped': False}
+no_barcode = {'barcode': None,'skipped': True}
+
+
+def interrupted_journal(output_dir,pdf_file):
+    """Record a run interrupted after writing its first output file."""
+    journal = checkpoint.Journal(output_dir,pdf_file,parameters)
+    journal.record_scan(0,1,barcode)
+    journal.record_scan(1,2,no_barcode)
+    output_file = os.path.join(output_dir,'A1.pdf')
+    journal.record_outputs([output_file],[(1,2)])
+    open(output_file,'wb').close()
+    journal.record_written({'file': output_file,'bytes': 0})
+    # an entry cut short when the process was terminated
+    journal.stream.write('{"type": "scan", "ind')
+    journal.close()
+    return output_file
+
+def test_journal_resume(tmp_path,pdf_writer):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*3])
+    output_file = interrupted_journal(str(tmp_path),pdf_file)
+    tuples = [(None,1),(None,2),(None,3)]
+    with checkpoint.Journal(str(tmp_path),pdf_file,parameters,resume_p=True) as journal:
+        assert journal.resumed
+        known_results = {}
+        cache_keys = {0: 'a',2: 'c'}
+        assert pdfxcb_module.resume_scan_results([journal],tuples,known_results,cache_keys) == 2
+        assert known_results == {0: ((None,1),barcode),1: ((None,2),no_barcode)}
+        # only the image not resumed is still to be cached
+        assert cache_keys == {2: 'c'}
+        assert journal.written_p(output_file,(1,2))
+        assert not journal.written_p(output_file,(1,3))
+        assert pdfxcb_module.resume_output_file_names(
+            [journal],['A1','B2'],[0,2],[(1,2),(3,3)],str(tmp_path)) == [
+                output_file,
+                pdfxcb_module.generate_output_file_names(['B2'],[2],str(tmp_path))[0]]
+    # the truncated entry was dropped when the journal was rewritten
+    with checkpoint.Journal(str(tmp_path),pdf_file,parameters,resume_p=True) as journal:
+        assert journal.resumed
+        assert sorted(journal.scans) == [0,1]
+
+@pytest.mark.parametrize('change',['parameters','pdf'])
+def test_journal_starts_anew(tmp_path,pdf_writer,change):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*3])
+    interrupted_journal(str(tmp_path),pdf_file)
+    resume_parameters = parameters
+    if change == 'parameters':
+        resume_parameters = dict(parameters,resolution=300)
+    else:
+        pdf_writer(pdf_file,[[None]*4])
+    with checkpoint.Journal(str(tmp_path),pdf_file,resume_parameters,resume_p=True) as journal:
+        assert not journal.resumed
+        assert journal.scan_results([(None,1),(None,2)]) == {}
+        assert journal.planned_output((1,2)) is None
+
+
+def save_state(output_dir,pdf_file):
+    """Save the state of an incremental run on PDF_FILE (three pages)."""
+    with pdf.PdfSession(pdf_file) as session:
+        state = checkpoint.IncrementalState(output_dir,session,parameters)
+        assert state.pages == 0
+        state.save(session,{0: (1,barcode),1: (2,no_barcode),2: (3,no_barcode)},
+                   [os.path.join(output_dir,'A1.pdf')],[(1,3)])
+
+def test_incremental_state_kept_when_pages_appended(tmp_path,pdf_writer):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*3])
+    save_state(str(tmp_path),pdf_file)
+    open(tmp_path/'A1.pdf','wb').close()
+    pdf_writer(pdf_file,[[None]*3,[None]*2])
+    with pdf.PdfSession(pdf_file) as session:
+        state = checkpoint.IncrementalState(str(tmp_path),session,parameters)
+        assert state.pages == 3
+        tuples = [(None,page_number) for page_number in range(1,6)]
+        assert sorted(state.scan_results(tuples)) == [0,1,2]
+        # the page range of the last cover sheet has grown
+        output_file = os.path.join(str(tmp_path),'A1.pdf')
+        assert state.planned_output((1,5)) == output_file
+        assert not state.written_p(output_file,(1,5))
+        assert state.written_p(output_file,(1,3))
+
+def test_incremental_state_discarded_when_last_page_changed(tmp_path,pdf_writer):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*3])
+    save_state(str(tmp_path),pdf_file)
+    # the same number of pages, and more, but page 3 differs
+    pdf_writer(pdf_file,[[None,None,(0,0,100,200),None]])
+    with pdf.PdfSession(pdf_file) as session:
+        state = checkpoint.IncrementalState(str(tmp_path),session,parameters)
+        assert state.pages == 0
+        assert state.scan_results([(None,1)]) == {}
+        assert state.planned_output((1,4)) is None
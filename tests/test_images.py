@@ -0,0 +1,164 @@
+import io
+import zlib
+
+import pytest
+
+PyPDF2 = pytest.importorskip('PyPDF2')
+Image = pytest.importorskip('PIL.Image')
+ImageOps = pytest.importorskip('PIL.ImageOps')
+
+from PyPDF2.generic import (ArrayObject, BooleanObject, ByteStringObject,
+                            DictionaryObject, FloatObject, NameObject,
+                            NumberObject, StreamObject)
+
+from pdfxcb import pdf
+
+
+def pdf_value(value):
+    """Return the PyPDF2 object for the Python value VALUE."""
+    if isinstance(value,bool):
+        return BooleanObject(value)
+    if isinstance(value,int):
+        return NumberObject(value)
+    if isinstance(value,float):
+        return FloatObject(value)
+    if isinstance(value,bytes):
+        return ByteStringObject(value)
+    if isinstance(value,str):
+        return NameObject(value)
+    if isinstance(value,list):
+        return ArrayObject(pdf_value(item) for item in value)
+    return DictionaryObject((NameObject(key),pdf_value(item)) for key, item in value.items())
+
+def image_xobject(data,width,height,**entries):
+    """
+    Return an image XObject WIDTH by HEIGHT pixels with the (encoded)
+    stream data DATA and ENTRIES (e.g., Filter='/FlateDecode').
+    """
+    stream = {'__streamdata__': data,'/Length': len(data),
+              NameObject('/Type'): NameObject('/XObject'),
+              NameObject('/Subtype'): NameObject('/Image'),
+              NameObject('/Width'): NumberObject(width),
+              NameObject('/Height'): NumberObject(height)}
+    for key, value in entries.items():
+        stream[NameObject('/' + key)] = pdf_value(value)
+    return StreamObject.initializeFromDictionary(stream)
+
+def bar_image():
+    """Return a bilevel 16 by 8 image: a black bar on white."""
+    image = Image.new('1',(16,8),1)
+    image.paste(0,(2,1,10,6))
+    return image
+
+def pixels(image):
+    return list(image.convert('L').tobytes())
+
+def ccitt_data(image,compression):
+    """
+    Return the CCITT fax encoded data, with 1 bits black as for the
+    CCITTFaxDecode filter by default, of the bilevel IMAGE.
+    """
+    stream = io.BytesIO()
+    # PIL writes BlackIsZero TIFF files, so that its 1 (white) pixels
+    # are encoded as black
+    ImageOps.invert(image.convert('L')).convert('1').save(stream,'TIFF',compression=compression)
+    tiff = Image.open(io.BytesIO(stream.getvalue()))
+    offset = tiff.tag_v2[273][0]
+    return stream.getvalue()[offset:offset+tiff.tag_v2[279][0]]
+
+
+@pytest.mark.parametrize('k,compression', [(-1,'group4'),(0,'group3')])
+def test_ccitt_tiff_header(k,compression):
+    data = ccitt_data(bar_image(),compression)
+    tiff = Image.open(io.BytesIO(pdf.ccitt_tiff(data,16,8,pdf_value({'/K': k}))))
+    assert tiff.size == (16,8)
+    assert tiff.info['compression'] == compression
+    # WhiteIsZero
+    assert tiff.tag_v2[262] == 0
+    assert pixels(tiff) == pixels(bar_image())
+
+@pytest.mark.parametrize('k,compression', [(-1,'group4'),(0,'group3')])
+@pytest.mark.parametrize('parms,decode,inverted', [({},None,False),
+                                                   ({'/BlackIs1': False},None,False),
+                                                   ({'/BlackIs1': True},None,True),
+                                                   ({'/BlackIs1': True},[1,0],False),
+                                                   ({},[1,0],True)])
+def test_decode_ccitt(k,compression,parms,decode,inverted):
+    entries = {'Filter': '/CCITTFaxDecode',
+               'DecodeParms': dict(parms,**{'/K': k,'/Columns': 16}),
+               'ImageMask': False,'BitsPerComponent': 1,'ColorSpace': '/DeviceGray'}
+    if decode:
+        entries['Decode'] = decode
+    image = pdf.decode_image_xobject(
+        image_xobject(ccitt_data(bar_image(),compression),16,8,**entries))
+    expected = bar_image()
+    if inverted:
+        expected = ImageOps.invert(expected.convert('L'))
+    assert pixels(image) == pixels(expected)
+
+@pytest.mark.parametrize('decode', [None,[1,0]])
+def test_decode_flate_gray(decode):
+    samples = bytes(range(0,256,2))
+    entries = {'Filter': '/FlateDecode','BitsPerComponent': 8,'ColorSpace': '/DeviceGray'}
+    if decode:
+        entries['Decode'] = decode
+    image = pdf.decode_image_xobject(image_xobject(zlib.compress(samples),16,8,**entries))
+    assert image.mode == 'L'
+    if decode:
+        samples = bytes(255 - sample for sample in samples)
+    assert image.tobytes() == samples
+
+def test_decode_flate_bilevel():
+    expected = bar_image()
+    image = pdf.decode_image_xobject(
+        image_xobject(zlib.compress(expected.tobytes()),16,8,
+                      Filter='/FlateDecode',BitsPerComponent=1,ColorSpace='/DeviceGray'))
+    assert image.mode == '1'
+    assert pixels(image) == pixels(expected)
+
+@pytest.mark.parametrize('image_mask,decode,inverted', [(True,None,False),
+                                                        (True,[1,0],True)])
+def test_decode_image_mask(image_mask,decode,inverted):
+    # 0 bits are painted (black) unless the Decode array is [1 0]
+    entries = {'ImageMask': image_mask}
+    if decode:
+        entries['Decode'] = decode
+    image = pdf.decode_image_xobject(image_xobject(bar_image().tobytes(),16,8,**entries))
+    expected = bar_image()
+    if inverted:
+        expected = ImageOps.invert(expected.convert('L'))
+    assert pixels(image) == pixels(expected)
+
+def test_image_mask_false_is_not_a_mask():
+    samples = bytes(range(128))
+    image = pdf.decode_image_xobject(
+        image_xobject(samples,16,8,ImageMask=False,BitsPerComponent=8,
+                      ColorSpace='/DeviceGray'))
+    assert image.tobytes() == samples
+
+@pytest.mark.parametrize('base,lookup', [('/DeviceRGB',b'\x00\x00\x00\xff\xff\xff\x80\x80\x80'),
+                                         ('/DeviceGray',b'\x00\xff\x80')])
+def test_decode_indexed(base,lookup):
+    indices = bytes(i % 3 for i in range(128))
+    image = pdf.decode_image_xobject(
+        image_xobject(zlib.compress(indices),16,8,Filter='/FlateDecode',BitsPerComponent=8,
+                      ColorSpace=['/Indexed',base,2,lookup]))
+    assert image.mode == 'L'
+    assert image.tobytes() == bytes((0,255,128)[i] for i in indices)
+
+def test_decode_unsupported_bits_per_component():
+    assert pdf.decode_image_xobject(
+        image_xobject(bytes(64),16,8,BitsPerComponent=4,ColorSpace='/DeviceGray')) is None
+
+@pytest.mark.parametrize('draft_scale,size', [(None,(64,48)),(0.25,(16,12)),(0.5,(32,24))])
+def test_decode_dct_draft(draft_scale,size):
+    stream = io.BytesIO()
+    Image.new('RGB',(64,48),(200,200,200)).save(stream,'JPEG')
+    image = pdf.decode_image_xobject(
+        image_xobject(stream.getvalue(),64,48,Filter='/DCTDecode',BitsPerComponent=8,
+                      ColorSpace='/DeviceRGB'),
+        draft_scale)
+    # decoded directly to grayscale, downscaled by the JPEG decoder
+    assert image.mode == 'L'
+    assert image.size == size
+    assert all(abs(value - 200) <= 2 for value in image.tobytes())
@@ -0,0 +1,66 @@
+import logging
+import logging.handlers
+import time
+
+import pytest
+
+from pdfxcb import jsonlog
+
+
+@pytest.fixture
+def root_handlers():
+    """Restore the handlers and level of the root logger afterwards."""
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    yield root
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+def test_single_process_logs_directly(tmp_path,root_handlers):
+    listener = jsonlog.start_logging(str(tmp_path/'log'),logging.INFO,jobs=1)
+    assert listener is None
+    [handler] = root_handlers.handlers
+    assert isinstance(handler,jsonlog.BatchingFileHandler)
+    assert jsonlog.worker_config()['queue'] is None
+    logging.info('{"code": 1}')
+    handler.flush()
+    assert (tmp_path/'log').read_text() == '{"code": 1}\n'
+
+def test_worker_processes_log_via_queue(tmp_path,root_handlers):
+    listener = jsonlog.start_logging(str(tmp_path/'log'),logging.INFO,jobs=2)
+    assert isinstance(listener,logging.handlers.QueueListener)
+    [handler] = root_handlers.handlers
+    assert isinstance(handler,logging.handlers.QueueHandler)
+    assert jsonlog.worker_config()['queue'] is not None
+
+def log_record(message,level=logging.INFO):
+    return logging.LogRecord('pdfxcb',level,__file__,0,message,None,None)
+
+def test_batching_handler_flushes_when_idle(tmp_path):
+    handler = jsonlog.BatchingFileHandler(str(tmp_path/'log'),'w',flush_interval=0.2)
+    try:
+        handler.emit(log_record('{"code": 51}'))
+        assert (tmp_path/'log').read_text() == ''
+        # no further record arrives
+        deadline = time.monotonic() + 5
+        while not (tmp_path/'log').read_text() and time.monotonic() < deadline:
+            time.sleep(0.05)
+        assert (tmp_path/'log').read_text() == '{"code": 51}\n'
+        assert handler.timer is None
+    finally:
+        handler.close()
+
+@pytest.mark.parametrize('message,level',[('{"code": 40, "message": "done"}',logging.INFO),
+                                          ('{"code": 2, "message": "last"}',logging.INFO),
+                                          ('{"code": 31}',logging.WARNING)])
+def test_batching_handler_flushes_at_once(tmp_path,message,level):
+    handler = jsonlog.BatchingFileHandler(str(tmp_path/'log'),'w',flush_interval=60)
+    try:
+        handler.emit(log_record('{"code": 51}'))
+        handler.emit(log_record(message,level))
+        assert (tmp_path/'log').read_text() == '{"code": 51}\n' + message + '\n'
+    finally:
+        handler.close()
@@ -0,0 +1,66 @@
+import importlib.util
+import logging
+import os
+import shutil
+import sys
+
+import pytest
+
+pytest.importorskip('PyPDF2')
+
+import pdfxcb.pdfxcb as pdfxcb_module
+from pdfxcb import pdf
+
+
+@pytest.fixture
+def run_main(monkeypatch):
+    """
+    Provide a function calling pdfxcb.main with the given command-line
+    arguments, restoring the logging configuration afterwards.
+    """
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    def run (*args):
+        monkeypatch.setattr(sys,'argv',['pdfxcb'] + [str(arg) for arg in args])
+        pdfxcb_module.main()
+    yield run
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    for handler in handlers:
+        root.addHandler(handler)
+    root.setLevel(level)
+
+
+def test_main_split_after(tmp_path,pdf_writer,run_main):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*5,[None]*2])
+    output_dir = tmp_path/'out'
+    output_dir.mkdir()
+    run_main('-e',3,'--jobs',1,'-d',output_dir,'-f',tmp_path/'log',pdf_file)
+    assert sorted(os.listdir(output_dir)) == ['001-003-0.pdf','004-006-0.pdf','007-007-0.pdf']
+    assert pdf.pdf_number_of_pages(str(output_dir/'004-006-0.pdf')) == 3
+
+
+def test_main_dispatches_barcode_run(tmp_path,pdf_writer,run_main,monkeypatch):
+    # MAIN must refer to the module-level PDFXCB function (a
+    # function-local import of a pdfxcb submodule would shadow it)
+    calls = []
+    monkeypatch.setattr(pdfxcb_module,'pdfxcb',
+                        lambda *args, **kwargs: calls.append((args,kwargs)))
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]])
+    run_main('-d',tmp_path,'-f',tmp_path/'log',pdf_file)
+    assert len(calls) == 1
+    assert calls[0][0][:2] == (pdf_file,str(tmp_path))
+    assert calls[0][1]['engine'] == 'extract'
+
+
+@pytest.mark.skipif(not (importlib.util.find_spec('zbar') and
+                         importlib.util.find_spec('PIL') and
+                         shutil.which('gs')),
+                    reason='requires zbar, PIL, and gs')
+def test_main_barcode_run(tmp_path,pdf_writer,run_main):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*2])
+    output_dir = tmp_path/'out'
+    output_dir.mkdir()
+    # blank pages: no cover sheets, hence no output files
+    run_main('-d',output_dir,'-f',tmp_path/'log',pdf_file)
+    assert os.listdir(output_dir) == []
@@ -0,0 +1,55 @@
+import pytest
+
+pytest.importorskip('PyPDF2')
+Image = pytest.importorskip('PIL.Image')
+
+import pdfxcb.pdfxcb as pdfxcb_module
+from pdfxcb import pdf
+
+
+@pytest.mark.parametrize('region', [[0,0,0.7,0.5],[0.7,0.5,0,0]])
+def test_pdftoppm_crop_scales_x_by_width(region):
+    # US letter at 150 DPI: 1275 by 1650 pixels
+    assert pdf.pdftoppm_crop((612,792),region,150) == (0,0,892,825)
+
+def test_pdftoppm_crop_offset_and_minimum_size():
+    assert pdf.pdftoppm_crop((200,100),[0.5,0.2,0.5,0.9],72) == (100,20,1,70)
+
+def test_pdftoppm_arguments_crop():
+    assert pdf.pdftoppm_arguments((3,4),(10,20,30,40),150) == [
+        '-f','3','-l','4','-gray','-r','150',
+        '-x','10','-y','20','-W','30','-H','40']
+
+@pytest.mark.parametrize('region', [[0.5,0.0,1.0,0.5],[1.0,0.5,0.5,0.0]])
+def test_pdf_images_crop_region_in_any_corner_order(monkeypatch,region):
+    monkeypatch.setattr(pdf,'decode_image_xobject',
+                        lambda image_xobject, draft_scale: Image.new('L',(100,200)))
+    [(image, page_number)] = pdf.pdf_images('unused.pdf',[(None,1)],region=region)
+    assert image.size == (50,100)
+    assert page_number == 1
+
+def test_sanity_checks_reject_insane_region(tmp_path,pdf_writer):
+    pdf_writer(tmp_path / 'in.pdf',[[None]])
+    with pytest.raises(SystemExit, match='REGION'):
+        pdfxcb_module.pdfxcb_sanity_checks(str(tmp_path),str(tmp_path / 'in.pdf'),
+                                           [0,0,1.5,1])
+
+@pytest.mark.parametrize('engine,region,size', [('extract',[0,0,0.5,0.5],(200,300)),
+                                                ('extract',None,(400,600))])
+def test_engine_crops_images_to_region(tmp_path,monkeypatch,engine,region,size):
+    pdf_file = str(tmp_path/'in.pdf')
+    Image.new('L',(400,600),255).save(pdf_file,'PDF',resolution=72)
+    output_dir = tmp_path/'out'
+    output_dir.mkdir()
+    # gs and zbar are not needed since nothing is scanned
+    monkeypatch.setattr(pdfxcb_module,'executable_sanity_checks',lambda executables: None)
+    monkeypatch.setattr(pdfxcb_module,'module_sanity_checks',lambda modules, exitp: None)
+    scanned = []
+    def scan_image (image,scan_region,prefilter_threshold=None,learned_box=None):
+        scanned.append((image.size,scan_region))
+        return {'barcode': None,'skipped': False,'scale': None,'zbar_calls': 0,
+                'learned_zbar_calls': 0,'seconds': 0.0,'learned': False,'box': None}
+    monkeypatch.setattr(pdfxcb_module,'scan_image',scan_image)
+    pdfxcb_module.pdfxcb(pdf_file,str(output_dir),None,False,region,engine=engine,jobs=1)
+    # the image handed to the scanner is already cropped
+    assert scanned == [(size,None)]
@@ -0,0 +1,56 @@
+import multiprocessing
+import os
+import time
+
+import pytest
+
+pytest.importorskip('PyPDF2')
+
+import pdfxcb.pdfxcb as pdfxcb_module
+
+
+# scan worker processes are forked, so that they see these stubs in
+# place of pdfxcb.scan_image and pdfxcb.scan_worker_init
+
+def stub_scan_image (image_file_spec,scan_region,prefilter_threshold=None,
+                     learned_box=None):
+    """
+    Scan IMAGE_FILE_SPEC, (<page number>, <seconds>, <directory>), by
+    sleeping for <seconds> and then creating a file named for the page
+    number in <directory>. Report the page number as the barcode.
+    """
+    page_number, seconds, marker_dir = image_file_spec
+    time.sleep(seconds)
+    open(os.path.join(marker_dir,str(page_number)),'w').close()
+    return {'barcode': str(page_number),'skipped': False,'scale': 1.0,'zbar_calls': 1,
+            'learned_zbar_calls': 0,'seconds': seconds,'learned': False,'box': None}
+
+def stub_scan_worker_init (scanner_config,log_config=None):
+    pass
+
+@pytest.fixture
+def stub_scanner(monkeypatch):
+    monkeypatch.setattr(pdfxcb_module,'scan_image',stub_scan_image)
+    monkeypatch.setattr(pdfxcb_module,'scan_worker_init',stub_scan_worker_init)
+
+@pytest.mark.parametrize('jobs', [1,3])
+def test_scan_images_in_order(tmp_path,stub_scanner,jobs):
+    # later pages are scanned faster
+    specs = [(page_number,(13-page_number)*0.005,str(tmp_path)) for page_number in range(1,13)]
+    results = list(pdfxcb_module.scan_images(iter(specs),None,jobs))
+    assert [result['barcode'] for result in results] == [str(n) for n in range(1,13)]
+
+def test_locate_cover_sheets_does_not_depend_on_jobs(tmp_path,stub_scanner):
+    tuples = [((page_number,0.005,str(tmp_path)),page_number) for page_number in range(1,13)]
+    assert (pdfxcb_module.locate_cover_sheets(tuples,None,None,None,jobs=1) ==
+            pdfxcb_module.locate_cover_sheets(tuples,None,None,None,jobs=3))
+
+def test_scan_pool_shuts_down_when_consumer_stops(tmp_path,stub_scanner):
+    tuples = [((page_number,0.1,str(tmp_path)),page_number) for page_number in range(1,25)]
+    located = pdfxcb_module.locate_cover_sheets_iter(tuples,None,None,None,jobs=2)
+    assert next(located) == (0,tuples[0],'1')
+    located.close()
+    assert not multiprocessing.active_children()
+    # of the 8 images submitted, those not yet handed to a worker were
+    # not scanned
+    assert len(os.listdir(tmp_path)) < 8
@@ -0,0 +1,58 @@
+import concurrent.futures
+import http.client
+import json
+import socket
+import threading
+
+import pytest
+
+pytest.importorskip('PyPDF2')
+
+from pdfxcb import server
+
+
+class FailingExecutor:
+    """An executor whose jobs fail as if the worker process died."""
+    def submit(self, fn, *args):
+        future = concurrent.futures.Future()
+        future.set_exception(concurrent.futures.process.BrokenProcessPool('worker died'))
+        return future
+
+
+@pytest.fixture
+def split_server(tmp_path):
+    """Serve SplitRequestHandler on a free port with FailingExecutor."""
+    split_server = server.SplitServer(('127.0.0.1',0),server.SplitRequestHandler)
+    split_server.output_dir = str(tmp_path)
+    split_server.pdfxcb_args = {}
+    split_server.slots = threading.BoundedSemaphore(1)
+    split_server.executor = FailingExecutor()
+    thread = threading.Thread(target=split_server.serve_forever,daemon=True)
+    thread.start()
+    yield split_server
+    split_server.shutdown()
+    split_server.server_close()
+
+def post (split_server,headers,body):
+    """Send a raw POST /split request; return the status and JSON body."""
+    with socket.create_connection(split_server.server_address) as connection:
+        connection.sendall(b'POST /split HTTP/1.0\r\n' +
+                           b''.join(f'{name}: {value}\r\n'.encode() for name, value in headers.items()) +
+                           b'\r\n' + body)
+        connection.shutdown(socket.SHUT_WR)
+        response = http.client.HTTPResponse(connection)
+        response.begin()
+        return response.status, json.loads(response.read())
+
+def test_truncated_upload_is_refused(split_server):
+    status, body = post(split_server,{'Content-Length': 100},b'%PDF-1.4\n')
+    assert status == 400
+    assert body['code'] == 138
+    # the slot is released once the response is sent
+    assert split_server.slots.acquire(timeout=5)
+
+def test_failed_worker_is_reported(split_server):
+    status, body = post(split_server,{'Content-Length': 9},b'%PDF-1.4\n')
+    assert status == 500
+    assert body['code'] == 111
+    assert split_server.slots.acquire(timeout=5)
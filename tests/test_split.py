@@ -0,0 +1,86 @@
+import contextlib
+import os
+import threading
+
+import pytest
+
+PyPDF2 = pytest.importorskip('PyPDF2')
+
+from pdfxcb import pdf
+
+
+def page_texts(pdf_file):
+    reader = PyPDF2.PdfFileReader(open(pdf_file,'rb'))
+    return [reader.getPage(i).getContents().getData().decode('ascii')
+            for i in range(reader.getNumPages())]
+
+
+def test_page_tree_index_inherits_from_ancestors_only(tmp_path,pdf_writer):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None,(0,0,100,200)],[None]])
+    with pdf.PdfSession(pdf_file) as session:
+        assert len(session.page_tree_index()) == 3
+        first = pdf.page_tree_page(session,1)
+        second = pdf.page_tree_page(session,2)
+        third = pdf.page_tree_page(session,3)
+        assert [float(v) for v in first.mediaBox] == [0,0,300,400]
+        # the page's own media box takes precedence
+        assert [float(v) for v in second.mediaBox] == [0,0,100,200]
+        assert '/F1' in third['/Resources']['/Font']
+        # page objects are not retained by the reader
+        pdf.release_resolved_objects(session.reader)
+        assert not session.reader.resolvedObjects
+
+
+@pytest.mark.parametrize('jobs',[1,2])
+def test_pdf_split_streaming(tmp_path,pdf_writer,jobs):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*4,[None,(0,0,100,200)],[None]*3])
+    output_files = [str(tmp_path/'{}.pdf'.format(n)) for n in range(4)]
+    page_ranges = [(1,3),(4,6),(7,8),(9,9)]
+    bytes_written, peak_rss = pdf.pdf_split_streaming(pdf_file,iter(output_files),
+                                                      iter(page_ranges),jobs,
+                                                      outputs_per_job=2)
+    assert bytes_written == [os.path.getsize(f) for f in output_files]
+    for output_file, (first_page, last_page) in zip(output_files,page_ranges):
+        assert page_texts(output_file) == [
+            'BT /F1 12 Tf 10 10 Td (page {}) Tj ET'.format(n)
+            for n in range(first_page,last_page+1)]
+        # each output is a valid PDF with the inherited resources
+        reader = PyPDF2.PdfFileReader(open(output_file,'rb'))
+        assert '/F1' in reader.getPage(0)['/Resources']['/Font']
+    assert [float(v) for v in PyPDF2.PdfFileReader(open(output_files[1],'rb')).getPage(2).mediaBox] == [0,0,100,200]
+    # no temporary files are left behind
+    assert sorted(os.listdir(tmp_path)) == sorted(['in.pdf'] + [os.path.basename(f) for f in output_files])
+
+
+@pytest.mark.parametrize('jobs',[1,3])
+def test_pdf_split(tmp_path,pdf_writer,jobs):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*4,[None]*3])
+    output_files = [str(tmp_path/'{}.pdf'.format(n)) for n in range(3)]
+    page_ranges = [(1,2),(3,6),(7,7)]
+    written = []
+    with pdf.PdfSession(pdf_file) as session:
+        outputs = pdf.pdf_split(session,output_files,page_ranges,jobs,written.append)
+    assert [output['file'] for output in outputs] == output_files
+    assert sorted(written,key=lambda output: output['file']) == outputs
+    for output, (first_page, last_page) in zip(outputs,page_ranges):
+        assert output['bytes'] == os.path.getsize(output['file'])
+        assert page_texts(output['file']) == [
+            'BT /F1 12 Tf 10 10 Td (page {}) Tj ET'.format(n)
+            for n in range(first_page,last_page+1)]
+    assert sorted(os.listdir(tmp_path)) == sorted(['in.pdf'] + [os.path.basename(f) for f in output_files])
+
+
+def test_pdf_split_writes_concurrently(tmp_path,pdf_writer,monkeypatch):
+    pdf_file = pdf_writer(str(tmp_path/'in.pdf'),[[None]*3])
+    output_files = [str(tmp_path/'{}.pdf'.format(n)) for n in range(3)]
+    # every write waits until all three are under way
+    barrier = threading.Barrier(3,timeout=5)
+    atomic_output = pdf.atomic_output
+    @contextlib.contextmanager
+    def slow_output (output_file):
+        barrier.wait()
+        with atomic_output(output_file) as stream:
+            yield stream
+    monkeypatch.setattr(pdf,'atomic_output',slow_output)
+    outputs = pdf.pdf_split(pdf_file,output_files,[(1,1),(2,2),(3,3)],3)
+    assert [output['file'] for output in outputs] == output_files
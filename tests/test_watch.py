@@ -0,0 +1,25 @@
+import os
+import signal
+
+import pytest
+
+pytest.importorskip('PyPDF2')
+
+from pdfxcb import watch
+
+
+def test_unique_output_dir_creates_distinct_directories(tmp_path):
+    first = watch.unique_output_dir(str(tmp_path),'scan.pdf')
+    second = watch.unique_output_dir(str(tmp_path),'scan.pdf')
+    assert first == str(tmp_path / 'scan')
+    assert second == str(tmp_path / 'scan-1')
+    assert os.path.isdir(first) and os.path.isdir(second)
+
+def test_watch_worker_init_ignores_termination(monkeypatch):
+    handlers = {}
+    monkeypatch.setattr(signal,'signal',
+                        lambda signum, handler: handlers.__setitem__(signum,handler))
+    monkeypatch.setattr(watch.pdfxcb,'batch_worker_init',lambda *args: None)
+    watch.watch_worker_init({},True)
+    for signum in [signal.SIGINT,signal.SIGHUP,signal.SIGTERM]:
+        assert handlers[signum] is signal.SIG_IGN